@@ -0,0 +1,32 @@
+"""Utilidades de la API JSON de solo lectura.
+
+Cada respuesta lleva un ETag fuerte calculado a partir de una marca de agua
+barata (maximo de ``fecha_actualizacion`` y cantidad de filas, resueltos con
+un solo aggregate). Si el cliente manda ``If-None-Match`` con ese ETag se
+responde 304 sin leer ni serializar las filas.
+"""
+import hashlib
+
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+
+def etag(*partes):
+    """ETag fuerte a partir de las partes que identifican el contenido."""
+    return quote_etag(hashlib.sha1(repr(partes).encode('utf-8')).hexdigest()[:32])
+
+
+def respuesta_condicional(request, etag_actual, construir):
+    """Devuelve 304 si el cliente ya tiene esta version; si no, el JSON de ``construir()``."""
+    respuesta = get_conditional_response(request, etag=etag_actual)
+    if respuesta is None:
+        respuesta = JsonResponse(construir())
+    respuesta.headers['ETag'] = etag_actual
+    # Se puede guardar, pero hay que revalidar siempre (con el ETag cuesta un 304)
+    patch_cache_control(respuesta, public=True, no_cache=True)
+    return respuesta
+
+
+def error(mensaje, estado=400, **detalle):
+    return JsonResponse({'error': mensaje, **detalle}, status=estado)
@@ -0,0 +1,116 @@
+"""Configuracion de la base de datos segun el entorno.
+
+DB_MOTOR elige el motor:
+
+- ``sqlite`` (por defecto): el archivo DB_NOMBRE (db.sqlite3 si no se da).
+  Con SQLITE_AJUSTADA=1 (por defecto) cada conexion nueva espera hasta
+  busy_timeout ms por el bloqueo en lugar de fallar con "database is
+  locked" y lee el archivo con mmap. Las transacciones empiezan con BEGIN
+  IMMEDIATE: toman el bloqueo de escritura al comenzar, asi dos
+  transacciones que leen y despues escriben no se traban al querer pasar a
+  escritura (eso busy_timeout no lo resuelve). SQLite sigue admitiendo un
+  solo escritor a la vez.
+  Con SQLITE_WAL=1 ademas se activa WAL, para que las lecturas no bloqueen
+  a la escritura, con synchronous=NORMAL (con WAL no corrompe la base ante
+  un corte, a lo sumo pierde las ultimas transacciones). Queda apagado por
+  defecto: WAL se guarda en el archivo y deja los -wal/-shm al lado, y el
+  db.sqlite3 del repositorio no debe cambiar por abrirlo en desarrollo.
+- ``postgresql``: DB_NOMBRE, DB_USUARIO, DB_CLAVE, DB_HOST y DB_PUERTO. Las
+  conexiones se reusan entre requests durante DB_CONEXION_SEGUNDOS (60 por
+  defecto) y se verifican antes de reusarlas. Con DB_POOL=min,max se usa
+  el pool de conexiones de Django en su lugar (requiere psycopg 3 con
+  psycopg_pool); cada proceso tiene su propio pool.
+
+Con DB_REPLICA_NOMBRE o DB_REPLICA_HOST (y DB_REPLICA_USUARIO, DB_REPLICA_CLAVE,
+DB_REPLICA_PUERTO si difieren) se agrega la base 'replica' para las lecturas
+de alquileres_maria.replicas.
+
+benchmarks/basedatos.py compara el throughput de escritura concurrente de
+los tres modos.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
+
+PRAGMAS_SQLITE = {
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+}
+PRAGMAS_WAL = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+}
+
+
+def configuracion(entorno, base_dir):
+    """Entrada 'default' de DATABASES a partir de las variables de entorno."""
+    motor = entorno.get('DB_MOTOR', 'sqlite')
+    if motor == 'sqlite':
+        base = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': entorno.get('DB_NOMBRE') or base_dir / 'db.sqlite3',
+        }
+        if sqlite_ajustada(entorno):
+            base['OPTIONS'] = {'transaction_mode': 'IMMEDIATE'}
+        return base
+    if motor == 'postgresql':
+        base = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': entorno.get('DB_NOMBRE', 'alquileres_maria'),
+            'USER': entorno.get('DB_USUARIO', ''),
+            'PASSWORD': entorno.get('DB_CLAVE', ''),
+            'HOST': entorno.get('DB_HOST', ''),
+            'PORT': entorno.get('DB_PUERTO', ''),
+            'CONN_MAX_AGE': int(entorno.get('DB_CONEXION_SEGUNDOS', '60')),
+            'CONN_HEALTH_CHECKS': True,
+        }
+        if entorno.get('DB_POOL'):
+            minimo, maximo = (int(valor) for valor in entorno['DB_POOL'].split(','))
+            # El pool reemplaza a las conexiones persistentes: Django exige CONN_MAX_AGE = 0
+            base['CONN_MAX_AGE'] = 0
+            base['OPTIONS'] = {'pool': {'min_size': minimo, 'max_size': maximo, 'timeout': 10}}
+        return base
+    raise ImproperlyConfigured(f"DB_MOTOR desconocido: {motor!r} (sqlite o postgresql).")
+
+
+def replica(entorno, principal):
+    """Entrada 'replica' de DATABASES (alquileres_maria.replicas), o None si no se configuro."""
+    if not (entorno.get('DB_REPLICA_NOMBRE') or entorno.get('DB_REPLICA_HOST')):
+        return None
+    # Mismo motor y opciones que la principal; en las pruebas apunta a la base de pruebas de esta
+    base = {**principal, 'OPTIONS': dict(principal.get('OPTIONS', {})), 'TEST': {'MIRROR': 'default'}}
+    for variable, clave in [
+        ('DB_REPLICA_NOMBRE', 'NAME'), ('DB_REPLICA_USUARIO', 'USER'), ('DB_REPLICA_CLAVE', 'PASSWORD'),
+        ('DB_REPLICA_HOST', 'HOST'), ('DB_REPLICA_PUERTO', 'PORT'),
+    ]:
+        if entorno.get(variable):
+            base[clave] = entorno[variable]
+    return base
+
+
+def sqlite_ajustada(entorno):
+    return entorno.get('DB_MOTOR', 'sqlite') == 'sqlite' and entorno.get('SQLITE_AJUSTADA', '1') == '1'
+
+
+def pragmas_sqlite(entorno):
+    """SQLITE_PRAGMAS segun el entorno: vacio sin SQLite ajustada, con WAL solo si SQLITE_WAL=1."""
+    if not sqlite_ajustada(entorno):
+        return {}
+    if entorno.get('SQLITE_WAL', '0') == '1':
+        return {**PRAGMAS_WAL, **PRAGMAS_SQLITE}
+    return dict(PRAGMAS_SQLITE)
+
+
+def ajustar_sqlite(sender, connection, **kwargs):
+    """Aplica SQLITE_PRAGMAS a cada conexion SQLite nueva (receptor de connection_created)."""
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+        return
+    cursor = connection.connection.cursor()
+    try:
+        for nombre, valor in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {nombre} = {valor}')
+    finally:
+        cursor.close()
+
+
+connection_created.connect(ajustar_sqlite, dispatch_uid='alquileres-maria-sqlite')
@@ -0,0 +1,304 @@
+"""Instrumentacion de los requests: tiempo, SQL y plantillas por vista.
+
+El middleware mide cada request muestreado (INSTRUMENTACION_MUESTREO, de 0 a
+1): tiempo total, cantidad y tiempo de las consultas SQL (con un
+execute_wrapper en cada conexion mientras dura el request), consultas
+duplicadas (mismo SQL con los mismos parametros, tipico de un N+1) y tiempo
+de render de plantillas (el backend PlantillasInstrumentadas de TEMPLATES).
+
+Cada medicion se guarda en un buffer circular en memoria del proceso (los
+ultimos INSTRUMENTACION_CAPACIDAD requests) y se acumula por vista para el
+formato de Prometheus; se consultan en las vistas de alquileres_maria.views.
+La respuesta lleva ademas el encabezado Server-Timing, que las herramientas
+de desarrollo del navegador muestran junto al request.
+
+Medir cuesta unos pocos microsegundos por request y por consulta (ver
+benchmarks/instrumentacion.py); los requests no muestreados solo pagan el
+sorteo. Las consultas hechas desde otros hilos (pools de imagenes y pagos)
+no se atribuyen al request.
+"""
+import random
+import threading
+import time
+from collections import deque, namedtuple
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+from django.utils.decorators import sync_and_async_middleware
+
+# Limites (en segundos) del histograma de duracion por vista
+LIMITES_HISTOGRAMA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+Registro = namedtuple('Registro', [
+    'momento', 'vista', 'metodo', 'estado', 'duracion', 'consultas', 'sql', 'duplicadas', 'plantillas',
+])
+
+_medicion_actual = ContextVar('medicion_actual', default=None)
+
+
+class Medicion:
+    """Lo medido durante un request; tiempos en segundos."""
+    __slots__ = ('inicio', 'consultas', 'sql', 'duplicadas', 'plantillas', '_vistas')
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.sql = 0.0
+        self.duplicadas = 0
+        self.plantillas = 0.0
+        self._vistas = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper de las conexiones
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql += time.perf_counter() - inicio
+            self.consultas += 1
+            if not many:
+                clave = (sql, _hashable(params))
+                if clave in self._vistas:
+                    self.duplicadas += 1
+                else:
+                    self._vistas.add(clave)
+
+
+def _hashable(params):
+    if params is None or isinstance(params, tuple):
+        return params
+    if isinstance(params, dict):
+        return tuple(sorted(params.items()))
+    return tuple(params)
+
+
+class Estadisticas:
+    """Buffer circular de registros y acumulados por vista desde que arranco el proceso."""
+
+    def __init__(self, capacidad):
+        self.registros = deque(maxlen=capacidad)
+        self.por_vista = {}
+        self._candado = threading.Lock()
+
+    def agregar(self, registro):
+        self.registros.append(registro)
+        with self._candado:
+            acumulado = self.por_vista.get(registro.vista)
+            if acumulado is None:
+                acumulado = self.por_vista[registro.vista] = {
+                    'requests': 0, 'duracion': 0.0, 'consultas': 0, 'sql': 0.0, 'duplicadas': 0, 'plantillas': 0.0,
+                    'histograma': [0] * len(LIMITES_HISTOGRAMA),
+                }
+            acumulado['requests'] += 1
+            acumulado['duracion'] += registro.duracion
+            acumulado['consultas'] += registro.consultas
+            acumulado['sql'] += registro.sql
+            acumulado['duplicadas'] += registro.duplicadas
+            acumulado['plantillas'] += registro.plantillas
+            for posicion, limite in enumerate(LIMITES_HISTOGRAMA):
+                if registro.duracion <= limite:
+                    acumulado['histograma'][posicion] += 1
+                    break
+
+    def recientes(self):
+        return list(self.registros)
+
+    def acumulados(self):
+        with self._candado:
+            return {vista: {**datos, 'histograma': list(datos['histograma'])} for vista, datos in self.por_vista.items()}
+
+
+_estadisticas = None
+_candado = threading.Lock()
+
+
+def estadisticas():
+    global _estadisticas
+    with _candado:
+        if _estadisticas is None:
+            _estadisticas = Estadisticas(settings.INSTRUMENTACION_CAPACIDAD)
+    return _estadisticas
+
+
+def reiniciar(**kwargs):
+    """Descarta lo medido (al cambiar la configuracion, o en pruebas)."""
+    global _estadisticas
+    with _candado:
+        _estadisticas = None
+
+
+def _nombre_vista(request):
+    # Sin resolver_match la URL no existia (404 del resolver)
+    coincidencia = getattr(request, 'resolver_match', None)
+    return coincidencia.view_name if coincidencia is not None else '<sin vista>'
+
+
+def _server_timing(registro):
+    return (
+        f'total;dur={registro.duracion * 1000:.1f}, '
+        f'sql;dur={registro.sql * 1000:.1f};desc="{registro.consultas} consultas, {registro.duplicadas} duplicadas", '
+        f'plantillas;dur={registro.plantillas * 1000:.1f}'
+    )
+
+
+def _sortear():
+    """Medicion para el request, o None si no le toca el muestreo."""
+    muestreo = settings.INSTRUMENTACION_MUESTREO
+    if not muestreo or (muestreo < 1 and random.random() >= muestreo):
+        return None
+    return Medicion()
+
+
+def _envolver_conexiones(medicion):
+    # Las conexiones son de cada hilo: hay que llamarla desde el hilo que hace las consultas
+    pila = ExitStack()
+    for conexion in connections.all():
+        pila.enter_context(conexion.execute_wrapper(medicion))
+    return pila
+
+
+def _terminar(request, respuesta, medicion):
+    registro = Registro(
+        time.time(), _nombre_vista(request), request.method, getattr(respuesta, 'status_code', 500),
+        time.perf_counter() - medicion.inicio, medicion.consultas, medicion.sql, medicion.duplicadas,
+        medicion.plantillas,
+    )
+    estadisticas().agregar(registro)
+    if respuesta is not None and settings.INSTRUMENTACION_SERVER_TIMING:
+        respuesta.headers['Server-Timing'] = _server_timing(registro)
+
+
+@sync_and_async_middleware
+def middleware(get_response):
+    """Mide los requests muestreados; va primero en MIDDLEWARE para abarcar a los demas."""
+    if iscoroutinefunction(get_response):
+        async def medir(request):
+            medicion = _sortear()
+            if medicion is None:
+                return await get_response(request)
+            # Bajo ASGI las consultas corren en el hilo de sync_to_async del request:
+            # los wrappers se instalan y se quitan ahi (dos saltos de hilo por request)
+            pila = await sync_to_async(_envolver_conexiones)(medicion)
+            token = _medicion_actual.set(medicion)
+            respuesta = None
+            try:
+                respuesta = await get_response(request)
+            finally:
+                _medicion_actual.reset(token)
+                await sync_to_async(pila.close)()
+                _terminar(request, respuesta, medicion)
+            return respuesta
+    else:
+        def medir(request):
+            medicion = _sortear()
+            if medicion is None:
+                return get_response(request)
+            token = _medicion_actual.set(medicion)
+            respuesta = None
+            try:
+                with _envolver_conexiones(medicion):
+                    respuesta = get_response(request)
+            finally:
+                _medicion_actual.reset(token)
+                _terminar(request, respuesta, medicion)
+            return respuesta
+    return medir
+
+
+class PlantillaInstrumentada:
+    """Plantilla del backend de Django que suma su tiempo de render a la medicion en curso."""
+
+    def __init__(self, plantilla):
+        self.plantilla = plantilla
+        self.origin = plantilla.origin
+
+    def render(self, context=None, request=None):
+        medicion = _medicion_actual.get()
+        if medicion is None:
+            return self.plantilla.render(context, request)
+        inicio = time.perf_counter()
+        try:
+            return self.plantilla.render(context, request)
+        finally:
+            medicion.plantillas += time.perf_counter() - inicio
+
+
+class PlantillasInstrumentadas(DjangoTemplates):
+    """Backend DjangoTemplates que mide el render; los {% include %} quedan dentro del tiempo del padre."""
+
+    def from_string(self, template_code):
+        return PlantillaInstrumentada(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return PlantillaInstrumentada(super().get_template(template_name))
+
+
+def _etiqueta(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus():
+    """Acumulados por vista y contadores de alquileres_maria.metricas, en el formato de texto de Prometheus."""
+    from . import metricas
+
+    acumulados = sorted(estadisticas().acumulados().items())
+    lineas = [
+        '# HELP alquileres_request_duracion_segundos Duracion de los requests medidos, por vista.',
+        '# TYPE alquileres_request_duracion_segundos histogram',
+    ]
+    for vista, datos in acumulados:
+        etiqueta = f'vista="{_etiqueta(vista)}"'
+        acumulado = 0
+        for limite, cantidad in zip(LIMITES_HISTOGRAMA, datos['histograma']):
+            acumulado += cantidad
+            lineas.append(f'alquileres_request_duracion_segundos_bucket{{{etiqueta},le="{limite}"}} {acumulado}')
+        lineas.append(f'alquileres_request_duracion_segundos_bucket{{{etiqueta},le="+Inf"}} {datos["requests"]}')
+        lineas.append(f'alquileres_request_duracion_segundos_sum{{{etiqueta}}} {datos["duracion"]:.6f}')
+        lineas.append(f'alquileres_request_duracion_segundos_count{{{etiqueta}}} {datos["requests"]}')
+
+    for nombre, clave, ayuda in [
+        ('alquileres_sql_consultas_total', 'consultas', 'Consultas SQL de los requests medidos, por vista.'),
+        ('alquileres_sql_duplicadas_total', 'duplicadas', 'Consultas repetidas con los mismos parametros en un request.'),
+        ('alquileres_sql_segundos_total', 'sql', 'Tiempo en consultas SQL de los requests medidos, por vista.'),
+        ('alquileres_plantillas_segundos_total', 'plantillas', 'Tiempo de render de plantillas, por vista.'),
+    ]:
+        lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} counter']
+        lineas += [f'{nombre}{{vista="{_etiqueta(vista)}"}} {datos[clave]}' for vista, datos in acumulados]
+
+    for nombre, valor in metricas.valores(*metricas.CONTADORES).items():
+        lineas += [
+            f'# HELP alquileres_{nombre}_total {metricas.CONTADORES[nombre]}',
+            f'# TYPE alquileres_{nombre}_total counter',
+            f'alquileres_{nombre}_total {valor}',
+        ]
+    return '\n'.join(lineas) + '\n'
+
+
+def _percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def resumen(registros):
+    """p50/p99 de duracion y promedios de SQL y plantillas por vista, de los registros dados."""
+    por_vista = {}
+    for registro in registros:
+        por_vista.setdefault(registro.vista, []).append(registro)
+    filas = []
+    for vista, propios in por_vista.items():
+        duraciones = sorted(registro.duracion for registro in propios)
+        cantidad = len(propios)
+        filas.append({
+            'vista': vista,
+            'requests': cantidad,
+            'p50_ms': round(_percentil(duraciones, 50) * 1000, 2),
+            'p99_ms': round(_percentil(duraciones, 99) * 1000, 2),
+            'consultas_promedio': round(sum(registro.consultas for registro in propios) / cantidad, 1),
+            'sql_promedio_ms': round(sum(registro.sql for registro in propios) / cantidad * 1000, 2),
+            'duplicadas_promedio': round(sum(registro.duplicadas for registro in propios) / cantidad, 1),
+            'plantillas_promedio_ms': round(sum(registro.plantillas for registro in propios) / cantidad * 1000, 2),
+        })
+    return sorted(filas, key=lambda fila: fila['p99_ms'], reverse=True)
@@ -0,0 +1,38 @@
+"""Contadores de la aplicacion.
+
+Cuentan lo que hacen los trabajos que no pasan por un request (vencimiento
+de reservas, etc.). Esos trabajos corren en procesos aparte (cron), asi
+que los contadores se guardan en la base (reportes.Contador) y no en la
+cache: con la cache en memoria cada proceso tendria los suyos y /metrics
+no veria lo que cuentan los demas. Cada incremento es un UPDATE atomico.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from reportes.models import Contador
+
+# Contadores conocidos y su descripcion; se publican en /metrics (alquileres_maria.instrumentacion)
+CONTADORES = {
+    'reservas_vencidas': "Reservas pendientes vencidas por falta de pago.",
+    'reservas_completadas': "Reservas confirmadas pasadas a Completada al terminar.",
+    'reservas_archivadas': "Reservas movidas a ReservaHistorica.",
+    'vehiculos_disponibilidad_corregida': "Vehiculos con disponibilidad actual corregida por la reconciliacion.",
+}
+
+
+def incrementar(nombre, cantidad=1):
+    """Suma ``cantidad`` al contador; la primera vez crea su fila."""
+    if Contador.objects.filter(nombre=nombre).update(valor=F('valor') + cantidad):
+        return
+    try:
+        with transaction.atomic():
+            Contador.objects.create(nombre=nombre, valor=cantidad)
+    except IntegrityError:
+        # Otro proceso la creo al mismo tiempo
+        Contador.objects.filter(nombre=nombre).update(valor=F('valor') + cantidad)
+
+
+def valores(*nombres):
+    """Valores actuales de los contadores pedidos; 0 si nunca se incrementaron."""
+    guardados = dict(Contador.objects.filter(nombre__in=nombres).values_list('nombre', 'valor'))
+    return {nombre: guardados.get(nombre, 0) for nombre in nombres}
@@ -0,0 +1,165 @@
+"""Paginacion por cursor (keyset) para los listados.
+
+El Paginator de Django hace un COUNT(*) y salta las filas anteriores con
+OFFSET, que se vuelve mas caro cuanto mas profunda es la pagina. Aqui cada
+pagina se pide "a partir de" los valores de orden de la ultima fila vista
+(``WHERE (fecha, id) < (...) ORDER BY fecha, id LIMIT n``), que con un
+indice sobre esas columnas cuesta lo mismo en la primera pagina que en la
+diez mil. A cambio no se conoce el total ni se puede saltar a una pagina
+arbitraria: solo hay pagina siguiente y anterior.
+
+El ultimo campo del ordenamiento debe ser unico (normalmente ``id``) para
+que el orden sea total. Los cursores son opacos para el cliente: base64 de
+los valores de orden de la fila limite y la direccion.
+"""
+import base64
+import binascii
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+
+class CursorInvalido(Exception):
+    pass
+
+
+def _serializable(valor):
+    # isoformat completo: DjangoJSONEncoder trunca los microsegundos y el cursor
+    # tiene que reproducir exactamente el valor de la fila
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+class Pagina:
+    """Una pagina de resultados; imita lo que las plantillas usan de ``Page``."""
+
+    def __init__(self, object_list, cursor_anterior=None, cursor_siguiente=None):
+        self.object_list = object_list
+        self.cursor_anterior = cursor_anterior
+        self.cursor_siguiente = cursor_siguiente
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, indice):
+        return self.object_list[indice]
+
+    def __repr__(self):
+        return f'<Pagina de {len(self)} filas>'
+
+    def has_next(self):
+        return self.cursor_siguiente is not None
+
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class PaginadorCursor:
+    """Pagina un queryset por los campos de ``ordenamiento`` (``'-campo'`` = descendente)."""
+
+    def __init__(self, queryset, por_pagina, ordenamiento):
+        self.por_pagina = por_pagina
+        self.campos = []
+        for nombre in ordenamiento:
+            descendente = nombre.startswith('-')
+            # Las claves foraneas se ordenan y comparan por su columna (marca -> marca_id)
+            campo = queryset.model._meta.get_field(nombre.lstrip('-'))
+            self.campos.append((campo, descendente))
+        self.queryset = queryset.order_by(*self.orden(invertido=False))
+
+    def orden(self, invertido):
+        return [
+            f"{'-' if descendente != invertido else ''}{campo.attname}"
+            for campo, descendente in self.campos
+        ]
+
+    def condicion(self, valores, hacia_atras):
+        """Filas estrictamente despues (o antes) de la fila con esos valores de orden."""
+        alternativas = Q()
+        iguales = {}
+        for (campo, descendente), valor in zip(self.campos, valores):
+            operador = 'lt' if descendente != hacia_atras else 'gt'
+            alternativas |= Q(**iguales, **{f'{campo.attname}__{operador}': valor})
+            iguales[campo.attname] = valor
+        # Cota redundante sobre la primera columna: permite recorrer el indice por rango
+        primero, descendente = self.campos[0]
+        cota = 'lte' if descendente != hacia_atras else 'gte'
+        return Q(**{f'{primero.attname}__{cota}': valores[0]}) & alternativas
+
+    def cursor(self, fila, hacia_atras=False):
+        """Cursor opaco que apunta a las filas siguientes (o anteriores) a ``fila``."""
+        # Las filas pueden ser instancias o diccionarios de .values() con las columnas de orden
+        if isinstance(fila, dict):
+            valores = [_serializable(fila[campo.attname]) for campo, _ in self.campos]
+        else:
+            valores = [_serializable(getattr(fila, campo.attname)) for campo, _ in self.campos]
+        datos = json.dumps({'v': valores, 'a': int(hacia_atras)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(datos.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def leer_cursor(self, cursor):
+        try:
+            datos = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            valores = [campo.to_python(valor) for (campo, _), valor in zip(self.campos, datos['v'], strict=True)]
+            return valores, bool(datos['a'])
+        except (ValueError, TypeError, KeyError, ValidationError, binascii.Error) as error:
+            raise CursorInvalido(cursor) from error
+
+    def pagina(self, cursor=None):
+        """Devuelve la pagina indicada por el cursor (la primera si no hay cursor)."""
+        if not cursor:
+            filas = list(self.queryset[:self.por_pagina + 1])
+            return self._armar(filas[:self.por_pagina], hay_anterior=False, hay_siguiente=len(filas) > self.por_pagina)
+
+        valores, hacia_atras = self.leer_cursor(cursor)
+        queryset = self.queryset.filter(self.condicion(valores, hacia_atras))
+        if not hacia_atras:
+            filas = list(queryset[:self.por_pagina + 1])
+            return self._armar(filas[:self.por_pagina], hay_anterior=True, hay_siguiente=len(filas) > self.por_pagina)
+
+        # Hacia atras se recorre en orden inverso y se da vuelta el resultado
+        filas = list(queryset.order_by(*self.orden(invertido=True))[:self.por_pagina + 1])
+        hay_anterior = len(filas) > self.por_pagina
+        return self._armar(filas[:self.por_pagina][::-1], hay_anterior=hay_anterior, hay_siguiente=True)
+
+    def _armar(self, filas, hay_anterior, hay_siguiente):
+        return Pagina(
+            filas,
+            cursor_anterior=self.cursor(filas[0], hacia_atras=True) if filas and hay_anterior else None,
+            cursor_siguiente=self.cursor(filas[-1]) if filas and hay_siguiente else None,
+        )
+
+
+class PaginacionCursorMixin:
+    """Mixin de ListView que reemplaza la paginacion por OFFSET por cursores.
+
+    El cursor viaja en el parametro ``cursor`` de la URL; la plantilla arma
+    los enlaces con ``{% querystring cursor=page_obj.cursor_siguiente %}``.
+    """
+    ordenamiento = None
+    parametro_cursor = 'cursor'
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        return PaginadorCursor(queryset, per_page, self.ordenamiento)
+
+    def obtener_pagina(self, paginador, cursor):
+        return paginador.pagina(cursor)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginador = self.get_paginator(queryset, page_size)
+        try:
+            pagina = self.obtener_pagina(paginador, self.request.GET.get(self.parametro_cursor))
+        except CursorInvalido:
+            raise Http404("Cursor de paginacion invalido.")
+        return (paginador, pagina, pagina.object_list, pagina.has_other_pages())
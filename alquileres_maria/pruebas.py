@@ -0,0 +1,99 @@
+"""Utilidades compartidas por los tests de las aplicaciones."""
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from reservas.models import EstadoReserva
+from vehiculos.models import Marca, TipoVehiculo, Vehiculo
+
+# Los de sembrar_datos salvo Vencida, que reservas.vencimiento crea la primera vez
+ESTADOS_RESERVA = ['Pendiente', 'Confirmada', 'Cancelada', 'Cancelada por Admin', 'Completada']
+
+
+def plantillas_en_memoria(plantillas):
+    """override_settings que reemplaza las plantillas por las indicadas (nombre -> codigo).
+
+    Permite medir una vista con una plantilla minima que recorre los mismos
+    objetos que la real, sin depender del HTML.
+    """
+    return override_settings(TEMPLATES=[{
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'OPTIONS': {
+            'loaders': [('django.template.loaders.locmem.Loader', plantillas)],
+            'context_processors': [
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
+    }])
+
+
+class PresupuestoConsultasMixin:
+    """Mixin de TestCase para fijar un tope de consultas SQL por pagina.
+
+    Un listado que dispara una consulta por fila supera el presupuesto en
+    cuanto la pagina se llena, asi que conviene medir la misma pagina con
+    pocas filas y con la pagina completa.
+    """
+
+    @contextmanager
+    def assertPresupuestoConsultas(self, limite, using='default'):
+        with CaptureQueriesContext(connections[using]) as contexto:
+            yield contexto
+        ejecutadas = len(contexto)
+        if ejecutadas > limite:
+            detalle = '\n'.join(
+                f"{numero}. {consulta['sql']}"
+                for numero, consulta in enumerate(contexto.captured_queries, start=1)
+            )
+            self.fail(f"Se ejecutaron {ejecutadas} consultas y el presupuesto es {limite}:\n{detalle}")
+
+    def assertConsultasConstantes(self, pedir_pagina, agregar_filas, limite):
+        """Verifica que la pagina cueste lo mismo antes y despues de agregar filas."""
+        with self.assertPresupuestoConsultas(limite) as antes:
+            pedir_pagina()
+        agregar_filas()
+        with self.assertPresupuestoConsultas(limite) as despues:
+            pedir_pagina()
+        self.assertEqual(
+            len(antes), len(despues),
+            "La cantidad de consultas crece con la cantidad de filas de la pagina.",
+        )
+
+
+class DatosReservaMixin:
+    """Mixin de TestCase con lo minimo para reservar: estados, un cliente, marca y tipo.
+
+    setUpTestData deja cls.estados (nombre -> fila), cls.pendiente,
+    cls.confirmada, cls.cancelada, cls.completada, cls.usuario, cls.marca y
+    cls.tipo; las clases que necesitan mas datos llaman a super() y crean sus
+    vehiculos con crear_vehiculo(). En un TransactionTestCase, que no tiene
+    setUpTestData, se llama a crear_datos_reserva() desde setUp.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.crear_datos_reserva()
+
+    @classmethod
+    def crear_datos_reserva(cls):
+        cls.estados = {nombre: EstadoReserva.objects.create(nombre=nombre) for nombre in ESTADOS_RESERVA}
+        cls.pendiente, cls.confirmada = cls.estados['Pendiente'], cls.estados['Confirmada']
+        cls.cancelada, cls.completada = cls.estados['Cancelada'], cls.estados['Completada']
+        cls.usuario = User.objects.create_user('cliente', 'cliente@example.com', 'clave-segura-123')
+        cls.marca = Marca.objects.create(nombre='Toyota')
+        cls.tipo = TipoVehiculo.objects.create(nombre='Sedan')
+
+    @classmethod
+    def crear_vehiculo(cls, patente='AAA111', **campos):
+        """Un Corolla 2022 de 5 plazas a 50.00 por dia; ``campos`` reemplaza cualquiera de esos valores."""
+        return Vehiculo.objects.create(**{
+            'marca': cls.marca, 'tipo': cls.tipo, 'modelo': 'Corolla', 'ano': 2022, 'patente': patente,
+            'capacidad': 5, 'precio_por_dia': Decimal('50.00'), **campos,
+        })
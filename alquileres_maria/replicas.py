@@ -0,0 +1,200 @@
+"""Lecturas desde una replica de la base de datos.
+
+Con una base 'replica' en DATABASES (DB_REPLICA_NOMBRE o DB_REPLICA_HOST,
+ver alquileres_maria.basedatos) el router manda a la replica las lecturas
+de los requests GET/HEAD de vistas marcadas con @solo_lectura y de los
+visitantes sin sesion. Todo lo demas va a la principal: escrituras,
+requests que escriben, sesiones, comandos de administracion y los pools de
+hilos de imagenes y pagos (no heredan el estado del request).
+
+Para no mostrar datos viejos a quien acaba de escribir (crear una reserva,
+pagar), el request que escribe deja la cookie usar_primaria por
+REPLICA_RETRASO_TOLERADO segundos, y mientras dure ese usuario lee de la
+principal. En PostgreSQL ademas se mide el atraso de la replica cada
+VERIFICAR_CADA segundos por proceso: si supera la tolerancia, o la replica
+no responde, se lee de la principal.
+
+Las escrituras que hace otro proceso (el pago en segundo plano de
+pagos.procesamiento confirma la reserva y crea el Pago) no pasan por el
+request: la vista que informa al usuario que terminaron llama a
+recordar_escritura() y deja la misma cookie.
+
+Para probarlo en local con SQLite alcanza una copia del archivo
+(``sqlite3 db.sqlite3 ".backup replica.sqlite3"`` y
+DB_REPLICA_NOMBRE=replica.sqlite3): la copia no se actualiza, asi que se ve
+enseguida que lee cada request.
+"""
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.deprecation import MiddlewareMixin
+
+logger = logging.getLogger(__name__)
+
+REPLICA = 'replica'
+COOKIE = 'usar_primaria'
+# Aplicaciones que siempre se leen de la principal: la sesion recien creada
+# al iniciar sesion todavia puede no estar en la replica
+SIEMPRE_PRIMARIA = {'sessions'}
+VERIFICAR_CADA = 5
+
+# Atraso de la replica: 0 si no es un standby o ya aplico todo lo recibido
+SQL_RETRASO = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+class Estado:
+    """Base de la que lee el request en curso y si ya escribio."""
+    __slots__ = ('alias', 'escribio')
+
+    def __init__(self):
+        self.alias = DEFAULT_DB_ALIAS
+        self.escribio = False
+
+
+_estado = ContextVar('replicas_estado', default=None)
+
+
+def configurada():
+    return REPLICA in connections.settings
+
+
+def en_replica():
+    """Indica si las lecturas del request en curso van a la replica."""
+    estado = _estado.get()
+    return estado is not None and estado.alias == REPLICA
+
+
+@contextmanager
+def primaria():
+    """Lee de la principal dentro del bloque aunque el request use la replica."""
+    estado = _estado.get()
+    if estado is None or estado.alias != REPLICA:
+        yield
+        return
+    estado.alias = DEFAULT_DB_ALIAS
+    try:
+        yield
+    finally:
+        # Si el bloque escribio, el resto del request ya lee de la principal
+        if not estado.escribio:
+            estado.alias = REPLICA
+
+
+def recordar_escritura(request):
+    """Fija a la principal al usuario como si el request hubiera escrito.
+
+    Para cuando la escritura la hizo otro proceso y este request es el
+    primero en verla terminada.
+    """
+    estado = getattr(request, '_replicas', None)
+    if estado is not None:
+        estado.escribio = True
+
+
+def solo_lectura(vista):
+    """Marca una vista (funcion o clase) cuyos GET pueden leer de la replica."""
+    vista.solo_lectura = True
+    return vista
+
+
+_medicion = None
+_candado = threading.Lock()
+
+
+def retraso():
+    """Segundos de atraso de la replica, medidos a lo sumo cada VERIFICAR_CADA segundos."""
+    global _medicion
+    ahora = time.monotonic()
+    with _candado:
+        if _medicion is not None and ahora - _medicion[0] < VERIFICAR_CADA:
+            return _medicion[1]
+    valor = _medir_retraso()
+    with _candado:
+        _medicion = (ahora, valor)
+    return valor
+
+
+def _medir_retraso():
+    conexion = connections[REPLICA]
+    if conexion.vendor != 'postgresql':
+        return 0.0
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute(SQL_RETRASO)
+            return float(cursor.fetchone()[0] or 0)
+    except DatabaseError:
+        logger.warning("No se pudo medir el atraso de la replica; se lee de la principal.", exc_info=True)
+        return math.inf
+
+
+def reiniciar(**kwargs):
+    """Descarta la ultima medicion del atraso (en pruebas)."""
+    global _medicion
+    with _candado:
+        _medicion = None
+
+
+class Router:
+    """Router de DATABASE_ROUTERS: lecturas segun el request en curso, escrituras a la principal."""
+
+    def db_for_read(self, model, **hints):
+        estado = _estado.get()
+        if estado is None or model._meta.app_label in SIEMPRE_PRIMARIA:
+            return DEFAULT_DB_ALIAS
+        return estado.alias
+
+    def db_for_write(self, model, **hints):
+        estado = _estado.get()
+        if estado is not None:
+            # Lo que se lea despues en el mismo request tiene que ver lo escrito
+            estado.escribio = True
+            estado.alias = DEFAULT_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # La replica tiene los mismos datos que la principal
+        return True
+
+
+def _puede_usar_replica(request, vista):
+    if request.method not in ('GET', 'HEAD') or COOKIE in request.COOKIES:
+        return False
+    marcada = getattr(vista, 'solo_lectura', False) or getattr(getattr(vista, 'view_class', None), 'solo_lectura', False)
+    anonimo = settings.SESSION_COOKIE_NAME not in request.COOKIES
+    return (marcada or anonimo) and retraso() <= settings.REPLICA_RETRASO_TOLERADO
+
+
+class ReplicaMiddleware(MiddlewareMixin):
+    """Elige la base de lectura de cada request y fija a la principal a quien escribe."""
+
+    def process_request(self, request):
+        if configurada():
+            request._replicas = Estado()
+            _estado.set(request._replicas)
+
+    def process_view(self, request, vista, args, kwargs):
+        estado = getattr(request, '_replicas', None)
+        if estado is not None and _puede_usar_replica(request, vista):
+            estado.alias = REPLICA
+
+    def process_response(self, request, response):
+        estado = getattr(request, '_replicas', None)
+        if estado is None:
+            return response
+        _estado.set(None)
+        if estado.escribio:
+            response.set_cookie(
+                COOKIE, '1', max_age=math.ceil(settings.REPLICA_RETRASO_TOLERADO), httponly=True, samesite='Lax',
+            )
+        return response
@@ -1,6 +1,9 @@
 import os
+from datetime import timedelta
 from pathlib import Path
 
+from alquileres_maria import basedatos
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -25,12 +28,17 @@ INSTALLED_APPS = [
     'reservas',
     'usuarios',
     'pagos',
+    'reportes',
     # Paquetes de terceros
     'crispy_forms',
     'crispy_bootstrap5',
 ]
 
 MIDDLEWARE = [
+    # Primero, para que la medicion abarque a los demas middlewares
+    'alquileres_maria.instrumentacion.middleware',
+    # Base de lectura de cada request, si hay replica (alquileres_maria.replicas)
+    'alquileres_maria.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -44,7 +52,8 @@ ROOT_URLCONF = 'alquileres_maria.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates que mide el render (alquileres_maria.instrumentacion)
+        'BACKEND': 'alquileres_maria.instrumentacion.PlantillasInstrumentadas',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -61,12 +70,17 @@ TEMPLATES = [
 WSGI_APPLICATION = 'alquileres_maria.wsgi.application'
 
 # Database
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
+# SQLite ajustada por defecto, o PostgreSQL con DB_MOTOR=postgresql
+# (variables de entorno en alquileres_maria.basedatos).
+DATABASES = {'default': basedatos.configuracion(os.environ, BASE_DIR)}
+if replica := basedatos.replica(os.environ, DATABASES['default']):
+    DATABASES['replica'] = replica
+    DATABASE_ROUTERS = ['alquileres_maria.replicas.Router']
+# Segundos de atraso de la replica que se toleran: quien escribe lee de la
+# principal durante ese tiempo, y si el atraso medido lo supera se lee de la principal
+REPLICA_RETRASO_TOLERADO = float(os.environ.get('DB_REPLICA_RETRASO', '5'))
+# PRAGMAs que se aplican a cada conexion SQLite nueva; vacio para dejar los de SQLite
+SQLITE_PRAGMAS = basedatos.pragmas_sqlite(os.environ)
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -99,6 +113,45 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Variantes reducidas de las imagenes de vehiculos (vehiculos.imagenes)
+IMAGENES_EN_SEGUNDO_PLANO = True  # False: se generan al confirmar la transaccion, en el mismo request
+IMAGENES_HILOS = 2
+
+# Pagos con tarjeta (pagos.procesamiento). La pasarela falsa no cobra: demora
+# PAGOS_LATENCIA segundos por operacion, para desarrollo y benchmarks.
+PAGOS_PASARELA = os.environ.get('PAGOS_PASARELA', 'pagos.pasarela.PasarelaFalsa')
+PAGOS_PASARELA_OPCIONES = {'latencia': float(os.environ.get('PAGOS_LATENCIA', '0.5'))}
+PAGOS_EN_SEGUNDO_PLANO = True  # False: se cobra al confirmar la transaccion, en el mismo request
+PAGOS_HILOS = 4
+
+# Minutos que una reserva puede quedar pendiente de pago antes de vencer y
+# liberar el vehiculo (reservas.vencimiento, manage.py vencer_reservas).
+RESERVAS_PENDIENTES_TTL = timedelta(minutes=int(os.environ.get('RESERVAS_PENDIENTES_MINUTOS', '30')))
+
+# Instrumentacion de requests (alquileres_maria.instrumentacion): fraccion de
+# requests medidos (0 la apaga), cuantos se guardan en memoria por proceso y
+# token para que Prometheus lea /metrics sin sesion de staff.
+INSTRUMENTACION_MUESTREO = float(os.environ.get('INSTRUMENTACION_MUESTREO', '1'))
+INSTRUMENTACION_CAPACIDAD = 2000
+INSTRUMENTACION_SERVER_TIMING = True
+INSTRUMENTACION_TOKEN = os.environ.get('INSTRUMENTACION_TOKEN', '')
+
+# Cache (vehiculos.catalogo). En desarrollo, memoria local del proceso o un
+# directorio; en produccion, una cache compartida por todos los procesos
+# (Redis, requiere el paquete redis).
+if os.environ.get('CACHE_REDIS_URL'):
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['CACHE_REDIS_URL'],
+    }}
+elif os.environ.get('CACHE_DIRECTORIO'):
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['CACHE_DIRECTORIO'],
+    }}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -0,0 +1,231 @@
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.contrib.sessions.models import Session
+from django.db import connection
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from pagos.views import historial_pagos
+from vehiculos import catalogo
+from vehiculos.models import Marca, TipoVehiculo, Vehiculo
+from vehiculos.views import VehiculoListView
+from . import basedatos, instrumentacion, metricas, replicas
+
+
+class InstrumentacionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        marca, tipo = Marca.objects.create(nombre='Toyota'), TipoVehiculo.objects.create(nombre='Sedan')
+        cls.vehiculo = Vehiculo.objects.create(
+            marca=marca, tipo=tipo, modelo='Corolla', ano=2022, patente='AAA111',
+            capacidad=5, precio_por_dia=Decimal('50.00'),
+        )
+        cls.staff = User.objects.create_user('admin', 'admin@example.com', 'clave-segura-123', is_staff=True)
+        cls.cliente = User.objects.create_user('cliente', 'cliente@example.com', 'clave-segura-123')
+
+    def setUp(self):
+        instrumentacion.reiniciar()
+        cache.clear()
+
+    def ultimo(self):
+        return instrumentacion.estadisticas().recientes()[-1]
+
+    def test_mide_consultas_y_plantillas(self):
+        respuesta = self.client.get(reverse('vehiculos:api-detalle', args=[self.vehiculo.pk]))
+        registro = self.ultimo()
+        self.assertEqual((registro.vista, registro.metodo, registro.estado), ('vehiculos:api-detalle', 'GET', 200))
+        self.assertEqual((registro.consultas, registro.duplicadas), (1, 0))
+        self.assertGreater(registro.duracion, registro.sql)
+        self.assertEqual(registro.plantillas, 0)
+        self.assertRegex(respuesta['Server-Timing'], r'^total;dur=[\d.]+, sql;dur=[\d.]+;desc="1 consultas, 0 duplicadas"')
+
+        self.client.get(reverse('home'))
+        self.assertGreater(self.ultimo().plantillas, 0)
+        self.client.get('/no-existe/')
+        self.assertEqual((self.ultimo().vista, self.ultimo().estado), ('<sin vista>', 404))
+
+    def test_detecta_consultas_duplicadas(self):
+        medicion = instrumentacion.Medicion()
+
+        def ejecutar(sql, params, many, context):
+            return None
+
+        for params in [[1], [2], [1], [1]]:
+            medicion(ejecutar, 'SELECT * FROM vehiculos_vehiculo WHERE id = %s', params, False, {})
+        medicion(ejecutar, 'INSERT INTO vehiculos_marca (nombre) VALUES (%s)', [['A'], ['A']], True, {})
+        self.assertEqual((medicion.consultas, medicion.duplicadas), (5, 2))
+
+    def test_sin_muestreo_no_mide(self):
+        with self.settings(INSTRUMENTACION_MUESTREO=0):
+            respuesta = self.client.get(reverse('vehiculos:api-detalle', args=[self.vehiculo.pk]))
+        self.assertNotIn('Server-Timing', respuesta)
+        self.assertEqual(instrumentacion.estadisticas().recientes(), [])
+
+    async def test_mide_requests_asincronicos(self):
+        respuesta = await AsyncClient().get(reverse('vehiculos:api-detalle', args=[self.vehiculo.pk]))
+        self.assertIn('Server-Timing', respuesta)
+        self.assertEqual((self.ultimo().vista, self.ultimo().consultas), ('vehiculos:api-detalle', 1))
+
+    def test_estadisticas_solo_para_staff(self):
+        for _ in range(3):
+            self.client.get(reverse('vehiculos:api-detalle', args=[self.vehiculo.pk]))
+        self.client.force_login(self.cliente)
+        self.assertRedirects(self.client.get(reverse('instrumentacion')), reverse('home'))
+
+        self.client.force_login(self.staff)
+        datos = self.client.get(reverse('instrumentacion'), {'vista': 'vehiculos:api-detalle'}).json()
+        self.assertEqual(datos['medidos'], 3)
+        self.assertEqual(datos['vistas'][0]['vista'], 'vehiculos:api-detalle')
+        self.assertEqual(datos['vistas'][0]['consultas_promedio'], 1)
+        self.assertEqual(len(datos['recientes']), 3)
+
+    @override_settings(INSTRUMENTACION_TOKEN='secreto')
+    def test_metricas_prometheus(self):
+        self.client.get(reverse('vehiculos:api-detalle', args=[self.vehiculo.pk]))
+        metricas.incrementar('reservas_vencidas', 4)
+        self.assertEqual(self.client.get(reverse('metricas')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metricas'), HTTP_AUTHORIZATION='Bearer otro').status_code, 403)
+
+        respuesta = self.client.get(reverse('metricas'), HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(respuesta['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        texto = respuesta.content.decode()
+        self.assertIn('alquileres_request_duracion_segundos_count{vista="vehiculos:api-detalle"} 1\n', texto)
+        self.assertIn('alquileres_request_duracion_segundos_bucket{vista="vehiculos:api-detalle",le="+Inf"} 1\n', texto)
+        self.assertIn('alquileres_sql_consultas_total{vista="vehiculos:api-detalle"} 1\n', texto)
+        self.assertIn('alquileres_reservas_vencidas_total 4\n', texto)
+
+
+class MetricasTests(TestCase):
+    def test_contadores_en_la_base(self):
+        metricas.incrementar('reservas_vencidas', 2)
+        # Sin fila todavia: la crea
+        metricas.incrementar('prueba')
+        metricas.incrementar('prueba', 3)
+        # No dependen de la cache de cada proceso
+        cache.clear()
+        self.assertEqual(
+            metricas.valores('reservas_vencidas', 'prueba', 'otro'), {'reservas_vencidas': 2, 'prueba': 4, 'otro': 0},
+        )
+        with self.assertNumQueries(1):
+            metricas.incrementar('reservas_vencidas')
+
+
+class BaseDatosTests(TestCase):
+    def test_sqlite_ajustada_por_defecto(self):
+        base = basedatos.configuracion({}, Path('/app'))
+        self.assertEqual(base['NAME'], Path('/app/db.sqlite3'))
+        self.assertEqual(base['OPTIONS'], {'transaction_mode': 'IMMEDIATE'})
+        self.assertNotIn('OPTIONS', basedatos.configuracion({'SQLITE_AJUSTADA': '0'}, Path('/app')))
+
+    def test_postgresql(self):
+        entorno = {'DB_MOTOR': 'postgresql', 'DB_NOMBRE': 'alquileres', 'DB_HOST': 'db', 'DB_CONEXION_SEGUNDOS': '300'}
+        base = basedatos.configuracion(entorno, Path('/app'))
+        self.assertEqual(
+            (base['ENGINE'], base['NAME'], base['HOST'], base['CONN_MAX_AGE'], base['CONN_HEALTH_CHECKS']),
+            ('django.db.backends.postgresql', 'alquileres', 'db', 300, True),
+        )
+        self.assertFalse(basedatos.sqlite_ajustada(entorno))
+
+        base = basedatos.configuracion({**entorno, 'DB_POOL': '2,10'}, Path('/app'))
+        self.assertEqual(base['CONN_MAX_AGE'], 0)
+        self.assertEqual(base['OPTIONS']['pool'], {'min_size': 2, 'max_size': 10, 'timeout': 10})
+
+        with self.assertRaises(ImproperlyConfigured):
+            basedatos.configuracion({'DB_MOTOR': 'mysql'}, Path('/app'))
+
+    def test_replica(self):
+        principal = basedatos.configuracion({}, Path('/app'))
+        self.assertIsNone(basedatos.replica({}, principal))
+        replica = basedatos.replica({'DB_REPLICA_NOMBRE': '/app/replica.sqlite3'}, principal)
+        self.assertEqual((replica['ENGINE'], replica['NAME']), (principal['ENGINE'], '/app/replica.sqlite3'))
+        self.assertEqual(replica['TEST'], {'MIRROR': 'default'})
+
+    def test_wal_solo_si_se_pide(self):
+        self.assertEqual(basedatos.pragmas_sqlite({}), basedatos.PRAGMAS_SQLITE)
+        pragmas = basedatos.pragmas_sqlite({'SQLITE_WAL': '1'})
+        self.assertEqual((pragmas['journal_mode'], pragmas['synchronous']), ('WAL', 'NORMAL'))
+        self.assertEqual(basedatos.pragmas_sqlite({'SQLITE_AJUSTADA': '0', 'SQLITE_WAL': '1'}), {})
+        self.assertEqual(basedatos.pragmas_sqlite({'DB_MOTOR': 'postgresql'}), {})
+
+    def test_pragmas_en_cada_conexion(self):
+        if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+            self.skipTest('Sin SQLite ajustada')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], basedatos.PRAGMAS_SQLITE['busy_timeout'])
+
+
+def vista_anonima(request):
+    return HttpResponse()
+
+
+@mock.patch.object(replicas, 'retraso', return_value=0.0)
+@mock.patch.object(replicas, 'configurada', return_value=True)
+class ReplicasTests(TestCase):
+    """El middleware y el router sin una segunda base: se verifica que alias eligen."""
+
+    def setUp(self):
+        self.router = replicas.Router()
+        self.middleware = replicas.ReplicaMiddleware(lambda request: HttpResponse())
+        cache.clear()
+
+    def procesar(self, vista, metodo='get', cookies=(), durante=lambda: None):
+        """Recorre el middleware como un request; devuelve la base de lectura elegida y la respuesta."""
+        request = getattr(RequestFactory(), metodo)('/')
+        request.COOKIES.update(dict.fromkeys(cookies, '1'))
+        self.middleware.process_request(request)
+        self.middleware.process_view(request, vista, (), {})
+        try:
+            durante()
+            alias = self.router.db_for_read(Vehiculo)
+        finally:
+            respuesta = self.middleware.process_response(request, HttpResponse())
+        return alias, respuesta
+
+    def test_elige_la_replica_solo_para_lecturas(self, *mocks):
+        sesion = settings.SESSION_COOKIE_NAME
+        self.assertEqual(self.procesar(vista_anonima)[0], 'replica')
+        self.assertEqual(self.procesar(vista_anonima, cookies=[sesion])[0], 'default')
+        self.assertEqual(self.procesar(VehiculoListView.as_view(), cookies=[sesion])[0], 'replica')
+        self.assertEqual(self.procesar(historial_pagos, cookies=[sesion])[0], 'replica')
+        self.assertEqual(self.procesar(historial_pagos, metodo='post')[0], 'default')
+        self.assertEqual(self.procesar(historial_pagos, cookies=[replicas.COOKIE])[0], 'default')
+        # Fuera de un request, y las sesiones siempre, de la principal
+        self.assertEqual(self.router.db_for_read(Vehiculo), 'default')
+        alias, _ = self.procesar(vista_anonima, durante=lambda: self.assertEqual(self.router.db_for_read(Session), 'default'))
+        self.assertEqual(alias, 'replica')
+
+    def test_quien_escribe_queda_en_la_principal(self, *mocks):
+        alias, respuesta = self.procesar(vista_anonima, durante=lambda: self.router.db_for_write(Vehiculo))
+        self.assertEqual(alias, 'default')
+        self.assertEqual(respuesta.cookies[replicas.COOKIE]['max-age'], 5)
+
+        alias, respuesta = self.procesar(vista_anonima)
+        self.assertNotIn(replicas.COOKIE, respuesta.cookies)
+
+    def test_replica_atrasada(self, configurada, retraso):
+        retraso.return_value = 30.0
+        self.assertEqual(self.procesar(VehiculoListView.as_view())[0], 'default')
+
+    def test_catalogo_recien_invalidado_se_calcula_en_la_principal(self, *mocks):
+        def calcular():
+            return 'replica' if replicas.en_replica() else 'default'
+
+        self.assertEqual(self.procesar(vista_anonima, durante=lambda: self.assertEqual(
+            catalogo.obtener('prueba:1', calcular), 'replica'))[0], 'replica')
+        catalogo.invalidar('flota')
+        self.assertEqual(self.procesar(vista_anonima, durante=lambda: self.assertEqual(
+            catalogo.obtener('prueba:2', calcular), 'default'))[0], 'replica')
+
+    def test_sin_replica_no_interviene(self, configurada, retraso):
+        configurada.return_value = False
+        alias, respuesta = self.procesar(vista_anonima, durante=lambda: self.router.db_for_write(Vehiculo))
+        self.assertEqual(alias, 'default')
+        self.assertNotIn(replicas.COOKIE, respuesta.cookies)
@@ -4,6 +4,8 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import TemplateView
 
+from . import views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', TemplateView.as_view(template_name='home.html'), name='home'),
@@ -11,6 +13,9 @@ urlpatterns = [
     path('reservas/', include('reservas.urls')),
     path('usuarios/', include('usuarios.urls')),
     path('pagos/', include('pagos.urls')),
+    path('reportes/', include('reportes.urls')),
+    path('instrumentacion/', views.estadisticas, name='instrumentacion'),
+    path('metrics', views.metricas, name='metricas'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,54 @@
+"""Vistas de la instrumentacion de requests (ver alquileres_maria.instrumentacion)."""
+import hmac
+from datetime import datetime, timezone as tz
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.shortcuts import redirect
+
+from . import instrumentacion
+
+# Registros individuales que devuelve la vista de staff, los mas nuevos primero
+RECIENTES = 50
+
+
+@login_required
+def estadisticas(request):
+    """Resumen por vista de los ultimos requests medidos y los mas recientes, en JSON."""
+    # Solo para administradores
+    if not request.user.is_staff:
+        messages.error(request, "No tiene permisos para realizar esta accion.")
+        return redirect('home')
+
+    registros = instrumentacion.estadisticas().recientes()
+    if request.GET.get('vista'):
+        registros = [registro for registro in registros if registro.vista == request.GET['vista']]
+    return JsonResponse({
+        'muestreo': settings.INSTRUMENTACION_MUESTREO,
+        'capacidad': settings.INSTRUMENTACION_CAPACIDAD,
+        'medidos': len(registros),
+        'vistas': instrumentacion.resumen(registros),
+        'recientes': [
+            {
+                **registro._asdict(),
+                'momento': datetime.fromtimestamp(registro.momento, tz.utc).isoformat(),
+                'duracion': round(registro.duracion * 1000, 2),
+                'sql': round(registro.sql * 1000, 2),
+                'plantillas': round(registro.plantillas * 1000, 2),
+            }
+            for registro in reversed(registros[-RECIENTES:])
+        ],
+    })
+
+
+def metricas(request):
+    """Metricas en formato Prometheus, para staff o con el token INSTRUMENTACION_TOKEN."""
+    token = settings.INSTRUMENTACION_TOKEN
+    autorizado = request.user.is_staff or (
+        token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    )
+    if not autorizado:
+        return HttpResponseForbidden("No autorizado.")
+    return HttpResponse(instrumentacion.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
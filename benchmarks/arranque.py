@@ -0,0 +1,46 @@
+"""Benchmark del tiempo de arranque de los comandos de administracion.
+
+Ejecuta ``manage.py check`` varias veces en procesos nuevos y reporta la
+mediana y el p95 del tiempo total. Con la siembra fuera de manage.py el
+arranque no depende de la base de datos.
+
+Uso:
+    python -m benchmarks.arranque [--repeticiones 10]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks import entorno
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticiones', type=int, default=10)
+    parser.add_argument('--comando', default='check')
+    args = parser.parse_args()
+
+    def ejecutar(_):
+        subprocess.run(
+            [sys.executable, os.path.join(RAIZ, 'manage.py'), args.comando],
+            cwd=RAIZ, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+    inicio = time.perf_counter()
+    latencias = entorno.medir(ejecutar, args.repeticiones)
+    print(json.dumps({
+        'comando': f'manage.py {args.comando}',
+        'repeticiones': args.repeticiones,
+        'p50_ms': round(entorno.percentil(latencias, 50), 1),
+        'p95_ms': round(entorno.percentil(latencias, 95), 1),
+        'total_s': round(time.perf_counter() - inicio, 2),
+    }))
+
+
+if __name__ == '__main__':
+    main()
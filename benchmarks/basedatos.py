@@ -0,0 +1,168 @@
+"""Benchmark de escritura concurrente segun la configuracion de la base.
+
+Compara los modos de alquileres_maria.basedatos, cada uno en un proceso
+nuevo con sus variables de entorno:
+
+- ``sqlite``: SQLite con su configuracion por defecto (journal de rollback).
+- ``sqlite-ajustada``: WAL (SQLITE_WAL=1), synchronous=NORMAL, busy_timeout,
+  mmap y BEGIN IMMEDIATE.
+- ``postgresql``: con ``--postgresql``; toma DB_NOMBRE, DB_USUARIO, etc. del
+  entorno (y DB_POOL si esta definida) y usa la base de pruebas test_<nombre>.
+
+En cada modo ``--escritores`` hilos crean reservas por el camino de la vista
+(``disponibilidad.reservar``), cada uno sobre su propio vehiculo para que no
+haya rechazos por superposicion, mientras ``--lectores`` hilos recorren el
+catalogo sin parar. Imprime una linea JSON por modo con reservas por
+segundo, latencia de cada reserva, errores (tipicamente "database is
+locked") y lecturas por segundo.
+
+Uso:
+    python -m benchmarks.basedatos [--escritores 8] [--reservas 50] [--lectores 4] [--postgresql]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+
+from benchmarks import entorno
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODOS = {
+    'sqlite': {'DB_MOTOR': 'sqlite', 'SQLITE_AJUSTADA': '0'},
+    'sqlite-ajustada': {'DB_MOTOR': 'sqlite', 'SQLITE_AJUSTADA': '1', 'SQLITE_WAL': '1'},
+    'postgresql': {'DB_MOTOR': 'postgresql'},
+}
+
+
+def correr(modo, args):
+    """Mide un modo en el proceso actual e imprime su linea JSON."""
+    entorno.preparar(en_archivo=True)
+
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from reservas import disponibilidad
+    from reservas.forms import ReservaForm
+    from reservas.models import EstadoReserva
+    from vehiculos.models import Marca, TipoVehiculo, Vehiculo
+
+    for nombre in ['Pendiente', 'Confirmada']:
+        EstadoReserva.objects.get_or_create(nombre=nombre)
+    pendiente = EstadoReserva.objects.get(nombre='Pendiente')
+    usuario = User.objects.create_user('benchmark')
+    marca = Marca.objects.create(nombre='Toyota')
+    tipo = TipoVehiculo.objects.create(nombre='Sedan')
+    vehiculos = Vehiculo.objects.bulk_create([
+        Vehiculo(
+            marca=marca, tipo=tipo, modelo='Corolla', ano=2022, patente=f'BEN{i:03d}',
+            capacidad=5, precio_por_dia=Decimal('50.00'),
+        )
+        for i in range(args.escritores)
+    ])
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            diario = cursor.fetchone()[0]
+    else:
+        diario = None
+    connection.close()
+
+    latencias = []
+    errores = Counter()
+    lecturas = [0] * args.lectores
+    candado = threading.Lock()
+    largada = threading.Barrier(args.escritores + args.lectores)
+    terminado = threading.Event()
+    manana = date.today() + timedelta(days=1)
+
+    def escribir(vehiculo):
+        propias, fallas = [], Counter()
+        largada.wait()
+        try:
+            for i in range(args.reservas):
+                inicio = manana + timedelta(days=2 * i)
+                form = ReservaForm({'fecha_inicio': inicio, 'fecha_fin': inicio}, vehiculo=vehiculo, usuario=usuario)
+                comienzo = time.perf_counter()
+                try:
+                    if disponibilidad.reservar(form, usuario, vehiculo, pendiente) is None:
+                        fallas['rechazada'] += 1
+                except Exception as exc:
+                    fallas[str(exc) or type(exc).__name__] += 1
+                propias.append((time.perf_counter() - comienzo) * 1000)
+        finally:
+            connection.close()
+        with candado:
+            latencias.extend(propias)
+            errores.update(fallas)
+
+    def leer(posicion):
+        largada.wait()
+        try:
+            while not terminado.is_set():
+                list(Vehiculo.objects.order_by('-ano', 'marca', 'modelo', 'id')[:20])
+                lecturas[posicion] += 1
+        finally:
+            connection.close()
+
+    escritores = [threading.Thread(target=escribir, args=(vehiculo,)) for vehiculo in vehiculos]
+    lectores = [threading.Thread(target=leer, args=(posicion,)) for posicion in range(args.lectores)]
+    for hilo in escritores + lectores:
+        hilo.start()
+    inicio = time.perf_counter()
+    for hilo in escritores:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+    terminado.set()
+    for hilo in lectores:
+        hilo.join()
+
+    creadas = len(latencias) - sum(errores.values())
+    print(json.dumps({
+        'modo': modo,
+        'backend': connection.vendor,
+        'journal_mode': diario,
+        'escritores': args.escritores,
+        'lectores': args.lectores,
+        'reservas': creadas,
+        'errores': dict(errores),
+        'duracion_s': round(duracion, 3),
+        'reservas_por_segundo': round(creadas / duracion, 1),
+        'lecturas_por_segundo': round(sum(lecturas) / duracion, 1),
+        **entorno.resumen(latencias),
+    }), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--escritores', type=int, default=8)
+    parser.add_argument('--reservas', type=int, default=50, help='Reservas que crea cada escritor')
+    parser.add_argument('--lectores', type=int, default=4)
+    parser.add_argument('--postgresql', action='store_true', help='Incluir PostgreSQL (configurado con DB_*)')
+    parser.add_argument('--modo', choices=MODOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        correr(args.modo, args)
+        return
+
+    modos = ['sqlite', 'sqlite-ajustada'] + (['postgresql'] if args.postgresql else [])
+    for modo in modos:
+        # Cada modo en un proceso nuevo: DATABASES se arma al cargar la configuracion
+        subprocess.run(
+            [
+                sys.executable, '-m', 'benchmarks.basedatos', '--modo', modo,
+                '--escritores', str(args.escritores), '--reservas', str(args.reservas),
+                '--lectores', str(args.lectores),
+            ],
+            cwd=RAIZ, check=True, env={**os.environ, **MODOS[modo]},
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Benchmark de la busqueda de vehiculos disponibles por rango de fechas.
+
+Genera una flota y un historial de reservas y mide el listado filtrado de
+VehiculoListView (COUNT del paginador mas la primera pagina), combinando
+fechas con marca, tipo y capacidad minima.
+
+Uso:
+    python -m benchmarks.busqueda_vehiculos [--vehiculos 10000] [--reservas 1000000] [--consultas 200]
+"""
+import argparse
+import json
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from benchmarks import entorno
+
+
+def crear_flota(cantidad, rng):
+    from vehiculos.models import Marca, TipoVehiculo, Vehiculo
+
+    marcas = Marca.objects.bulk_create(Marca(nombre=nombre) for nombre in ['Toyota', 'Ford', 'Fiat', 'Renault'])
+    tipos = TipoVehiculo.objects.bulk_create(TipoVehiculo(nombre=nombre) for nombre in ['Sedan', 'SUV', 'Compacto'])
+    Vehiculo.objects.bulk_create(
+        (
+            Vehiculo(
+                marca=rng.choice(marcas), tipo=rng.choice(tipos), modelo=f'Modelo {i % 50}',
+                ano=rng.randrange(2010, 2025), patente=f'BEN{i:06d}', capacidad=rng.randrange(2, 9),
+                precio_por_dia=Decimal('50.00'),
+            )
+            for i in range(cantidad)
+        ),
+        batch_size=5_000,
+    )
+    return marcas, tipos, list(Vehiculo.objects.values_list('id', flat=True))
+
+
+def crear_reservas(cantidad, vehiculos, usuario, estados, rng, tamano_lote=5_000):
+    """Reservas repartidas entre el pasado y el proximo año."""
+    from reservas.models import Reserva
+
+    origen = date.today() - timedelta(days=3 * 365)
+    pendientes = cantidad
+    while pendientes:
+        lote = min(tamano_lote, pendientes)
+        reservas = []
+        for _ in range(lote):
+            inicio = origen + timedelta(days=rng.randrange(4 * 365))
+            reservas.append(Reserva(
+                usuario=usuario,
+                vehiculo_id=rng.choice(vehiculos),
+                fecha_inicio=inicio,
+                fecha_fin=inicio + timedelta(days=rng.randrange(10)),
+                estado=rng.choice(estados),
+            ))
+        Reserva.objects.bulk_create(reservas)
+        pendientes -= lote
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vehiculos', type=int, default=10_000)
+    parser.add_argument('--reservas', type=int, default=1_000_000)
+    parser.add_argument('--consultas', type=int, default=200)
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    entorno.preparar()
+
+    from django.contrib.auth.models import User
+    from django.test import RequestFactory
+    from reservas.models import EstadoReserva
+    from vehiculos.views import VehiculoListView
+
+    rng = random.Random(args.semilla)
+    estados = [EstadoReserva.objects.get_or_create(nombre=nombre)[0]
+               for nombre in ['Pendiente', 'Confirmada', 'Cancelada', 'Completada']]
+    usuario = User.objects.create_user('benchmark')
+    marcas, tipos, vehiculos = crear_flota(args.vehiculos, rng)
+    crear_reservas(args.reservas, vehiculos, usuario, estados, rng)
+
+    factory = RequestFactory()
+    hoy = date.today()
+
+    def escenarios():
+        inicio = hoy + timedelta(days=rng.randrange(300))
+        fechas = {'fecha_inicio': inicio, 'fecha_fin': inicio + timedelta(days=rng.randrange(1, 14))}
+        return {
+            'solo_fechas': fechas,
+            'fechas_marca_tipo_capacidad': {
+                **fechas, 'marca': rng.choice(marcas).id, 'tipo': rng.choice(tipos).id, 'capacidad_minima': 5,
+            },
+        }
+
+    def buscar(parametros):
+        view = VehiculoListView()
+        view.setup(factory.get('/vehiculos/', parametros))
+        queryset = view.get_queryset()
+        queryset.count()
+        list(queryset[:view.paginate_by])
+
+    for nombre in escenarios():
+        latencias = entorno.medir(lambda _: buscar(escenarios()[nombre]), args.consultas)
+        print(json.dumps({
+            'escenario': nombre, 'vehiculos': args.vehiculos, 'reservas': args.reservas,
+            **entorno.resumen(latencias),
+        }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""Benchmark de la cache del catalogo publico (vehiculos.catalogo).
+
+Simula trafico del catalogo con el cliente de pruebas de Django: la mayoria
+de las visitas pide las primeras paginas sin filtros y el resto combina
+marca, tipo, capacidad y fechas; cada tanto entra una reserva (invalida los
+listados con fechas) o se cambia el precio de un vehiculo (invalida el
+listado y ese vehiculo). Mide la misma carga sin cache y con cache, e
+informa latencias, consultas SQL por request y la tasa de aciertos.
+
+Uso:
+    python -m benchmarks.catalogo_cache [--vehiculos 2000] [--reservas 50000] [--requests 3000]
+"""
+import argparse
+import json
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from benchmarks import entorno
+from benchmarks.busqueda_vehiculos import crear_flota, crear_reservas
+
+# Cada cuantos requests entra una reserva y cada cuantos cambia un vehiculo
+CADA_RESERVA = 50
+CADA_CAMBIO_VEHICULO = 500
+
+PLANTILLAS = {
+    'vehiculos/vehiculo_list.html': (
+        "{% for vehiculo in vehiculos %}{% include 'vehiculos/_tarjeta.html' %}{% endfor %}"
+        "{% for marca in marcas %}{{ marca }}{% endfor %}{% for tipo in tipos %}{{ tipo }}{% endfor %}"
+    ),
+    'vehiculos/vehiculo_detail.html': (
+        "{{ vehiculo }} {{ vehiculo.tipo }} {{ vehiculo.politica_reembolso }} {{ vehiculo.precio_por_dia }}"
+    ),
+}
+
+
+def plantillas():
+    """Listado y detalle minimos en memoria; la tarjeta real desde templates/."""
+    from django.conf import settings
+
+    return [{
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': settings.TEMPLATES[0]['DIRS'],
+        'OPTIONS': {
+            'loaders': [
+                ('django.template.loaders.locmem.Loader', PLANTILLAS),
+                'django.template.loaders.filesystem.Loader',
+            ],
+            'context_processors': settings.TEMPLATES[0]['OPTIONS']['context_processors'],
+        },
+    }]
+
+
+def generar_carga(cantidad, marcas, tipos, vehiculos, rng):
+    """Lista de (url, parametros) con una distribucion sesgada hacia las primeras paginas."""
+    from django.urls import reverse
+
+    listado = reverse('vehiculos:lista')
+    hoy = date.today()
+    inicios = [hoy + timedelta(days=7 * semana) for semana in range(8)]
+    populares = vehiculos[:100]
+    carga = []
+    for _ in range(cantidad):
+        tirada = rng.random()
+        if tirada < 0.5:
+            carga.append((listado, {'page': min(int(rng.expovariate(0.7)) + 1, 5)}))
+        elif tirada < 0.7:
+            carga.append((listado, {'marca': rng.choice(marcas).id, 'capacidad_minima': rng.choice([2, 4, 5])}))
+        elif tirada < 0.8:
+            carga.append((listado, {'tipo': rng.choice(tipos).id, 'page': rng.randrange(1, 3)}))
+        elif tirada < 0.9:
+            inicio = rng.choice(inicios)
+            carga.append((listado, {'fecha_inicio': inicio, 'fecha_fin': inicio + timedelta(days=3)}))
+        else:
+            carga.append((reverse('vehiculos:vehiculo-detail', args=[rng.choice(populares)]), {}))
+    return carga
+
+
+def correr(nombre, carga, vehiculos, usuario, estado, semilla, desde):
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from reservas.models import Reserva
+    from vehiculos import catalogo
+    from vehiculos.models import Vehiculo
+
+    rng = random.Random(semilla)
+    contador = {'lecturas': 0, 'aciertos': 0}
+    obtener = catalogo.obtener
+
+    def obtener_contando(clave, calcular, duracion=catalogo.DURACION):
+        calculado = []
+        valor = obtener(clave, lambda: calculado.append(1) or calcular(), duracion)
+        contador['lecturas'] += 1
+        contador['aciertos'] += not calculado
+        return valor
+
+    catalogo.obtener = obtener_contando
+    cliente = Client()
+    consultas = 0
+
+    def pedir(i):
+        nonlocal consultas
+        if i and i % CADA_RESERVA == 0:
+            # Fechas nuevas en cada reserva para no chocar con las anteriores
+            inicio = desde + timedelta(days=3 * (i // CADA_RESERVA))
+            Reserva.objects.create(
+                usuario=usuario, vehiculo_id=rng.choice(vehiculos), estado=estado,
+                fecha_inicio=inicio, fecha_fin=inicio + timedelta(days=2),
+            )
+        if i and i % CADA_CAMBIO_VEHICULO == 0:
+            vehiculo = Vehiculo.objects.get(pk=rng.choice(vehiculos))
+            vehiculo.precio_por_dia += Decimal('1.00')
+            vehiculo.save()
+        url, parametros = carga[i]
+        # El registro de consultas tiene un tope: vaciarlo para que el conteo no se sature
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as contexto:
+            respuesta = cliente.get(url, parametros)
+        consultas += len(contexto)
+        assert respuesta.status_code == 200, (url, parametros, respuesta.status_code)
+
+    try:
+        latencias = entorno.medir(pedir, len(carga))
+    finally:
+        catalogo.obtener = obtener
+    return {
+        'escenario': nombre,
+        'requests': len(carga),
+        **entorno.resumen(latencias),
+        'consultas_por_request': round(consultas / len(carga), 2),
+        'tasa_aciertos': round(contador['aciertos'] / contador['lecturas'], 4) if contador['lecturas'] else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vehiculos', type=int, default=2_000)
+    parser.add_argument('--reservas', type=int, default=50_000)
+    parser.add_argument('--requests', type=int, default=3_000)
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    entorno.preparar()
+
+    from django.contrib.auth.models import User
+    from django.core.cache import cache
+    from django.test import override_settings
+    from reservas.models import EstadoReserva
+
+    rng = random.Random(args.semilla)
+    estados = [EstadoReserva.objects.get_or_create(nombre=nombre)[0]
+               for nombre in ['Pendiente', 'Confirmada', 'Cancelada', 'Completada']]
+    usuario = User.objects.create_user('benchmark')
+    marcas, tipos, vehiculos = crear_flota(args.vehiculos, rng)
+    crear_reservas(args.reservas, vehiculos, usuario, estados, rng)
+    carga = generar_carga(args.requests, marcas, tipos, vehiculos, rng)
+
+    resultados = []
+    desde = date.today() + timedelta(days=2 * 365)
+    for nombre, backend in [
+        ('sin_cache', 'django.core.cache.backends.dummy.DummyCache'),
+        ('con_cache', 'django.core.cache.backends.locmem.LocMemCache'),
+    ]:
+        with override_settings(TEMPLATES=plantillas(), CACHES={'default': {'BACKEND': backend}}):
+            cache.clear()
+            resultados.append(correr(nombre, carga, vehiculos, usuario, estados[1], args.semilla, desde))
+        print(json.dumps(resultados[-1]))
+        desde += timedelta(days=3 * args.requests // CADA_RESERVA + 3)
+
+    sin_cache, con_cache = resultados
+    print(json.dumps({
+        'reduccion_media': round(1 - con_cache['media_ms'] / sin_cache['media_ms'], 4),
+        'reduccion_p50': round(1 - con_cache['p50_ms'] / sin_cache['p50_ms'], 4),
+        'reduccion_p99': round(1 - con_cache['p99_ms'] / sin_cache['p99_ms'], 4),
+    }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Benchmark de la consulta de disponibilidad de un vehiculo.
+
+Hace crecer el historial de reservas por etapas (1k, 10k, 100k, 1M filas) y
+mide la latencia de ``disponibilidad.vehiculo_disponible`` en cada etapa. Con
+el indice compuesto la latencia debe mantenerse plana.
+
+Uso:
+    python -m benchmarks.disponibilidad [--hasta 1000000] [--vehiculos 200] [--consultas 500]
+"""
+import argparse
+import json
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from benchmarks import entorno
+
+ETAPAS = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def crear_flota(cantidad):
+    from vehiculos.models import Marca, TipoVehiculo, Vehiculo
+
+    marca = Marca.objects.create(nombre='Toyota')
+    tipo = TipoVehiculo.objects.create(nombre='Sedan')
+    Vehiculo.objects.bulk_create(
+        Vehiculo(
+            marca=marca, tipo=tipo, modelo='Corolla', ano=2022, patente=f'BEN{i:06d}',
+            capacidad=5, precio_por_dia=Decimal('50.00'),
+        )
+        for i in range(cantidad)
+    )
+    return list(Vehiculo.objects.values_list('id', flat=True))
+
+
+def crear_historial(cantidad, vehiculos, usuario, estados, rng, tamano_lote=5_000):
+    """Inserta reservas pasadas de hasta una semana de duracion."""
+    from reservas.models import Reserva
+
+    origen = date(2000, 1, 1)
+    pendientes = cantidad
+    while pendientes:
+        lote = min(tamano_lote, pendientes)
+        reservas = []
+        for _ in range(lote):
+            inicio = origen + timedelta(days=rng.randrange(9000))
+            reservas.append(Reserva(
+                usuario=usuario,
+                vehiculo_id=rng.choice(vehiculos),
+                fecha_inicio=inicio,
+                fecha_fin=inicio + timedelta(days=rng.randrange(7)),
+                estado=rng.choice(estados),
+            ))
+        Reserva.objects.bulk_create(reservas)
+        pendientes -= lote
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hasta', type=int, default=ETAPAS[-1], help='Cantidad maxima de reservas en el historial')
+    parser.add_argument('--vehiculos', type=int, default=200)
+    parser.add_argument('--consultas', type=int, default=500, help='Consultas medidas por etapa')
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    entorno.preparar()
+
+    from django.contrib.auth.models import User
+    from reservas import disponibilidad
+    from reservas.models import EstadoReserva
+
+    rng = random.Random(args.semilla)
+    estados = [EstadoReserva.objects.get_or_create(nombre=nombre)[0]
+               for nombre in ['Pendiente', 'Confirmada', 'Cancelada', 'Completada']]
+    usuario = User.objects.create_user('benchmark')
+    vehiculos = crear_flota(args.vehiculos)
+    hoy = date.today()
+
+    def consultar(_):
+        inicio = hoy + timedelta(days=rng.randrange(365))
+        disponibilidad.vehiculo_disponible(rng.choice(vehiculos), inicio, inicio + timedelta(days=rng.randrange(14)))
+
+    resultados = []
+    total = 0
+    for etapa in [e for e in ETAPAS if e <= args.hasta] or [args.hasta]:
+        crear_historial(etapa - total, vehiculos, usuario, estados, rng)
+        total = etapa
+        resultados.append({'reservas': total, **entorno.resumen(entorno.medir(consultar, args.consultas))})
+        print(json.dumps(resultados[-1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+"""Benchmark del embudo de reserva completo, de punta a punta.
+
+Genera datos sinteticos con bulk inserts (flota, usuarios y años de historial
+de reservas con sus pagos) y recorre las vistas reales con el cliente de
+pruebas de Django, una sesion por cliente simulado:
+
+    catalogo -> detalle -> formulario_reserva -> crear_reserva
+             -> formulario_pago -> procesar_pago -> historial
+
+Cada sesion reserva un vehiculo en fechas propias, sin conflictos con las
+demas, y paga con la pasarela falsa en el mismo request
+(PAGOS_EN_SEGUNDO_PLANO = False, ``--latencia`` 0 por defecto), para medir
+la aplicacion y no la pasarela. Las plantillas que no estan en el repositorio
+se reemplazan por versiones minimas que recorren los mismos objetos (como en
+los tests).
+
+Imprime una linea JSON por paso con requests, throughput, latencias p50, p95
+y p99 y consultas SQL por request, y una linea final con el total. Con
+``--guardar`` escribe el resultado en un archivo; con ``--comparar`` lo
+compara con uno guardado y termina con codigo 1 si algun paso empeoro su p95
+mas que ``--tolerancia`` o hace mas consultas. Con la misma ``--semilla`` y
+escala los datos y los pedidos son los mismos.
+
+Uso:
+    python -m benchmarks.embudo [--vehiculos 500] [--usuarios 1000] [--reservas 100000] [--anos 3]
+                                [--sesiones 300] [--clientes 1] [--guardar base.json] [--comparar base.json]
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+
+from benchmarks import entorno
+from benchmarks.busqueda_vehiculos import crear_flota
+
+PASOS = [
+    'catalogo', 'detalle', 'formulario_reserva', 'crear_reserva', 'formulario_pago', 'procesar_pago', 'historial',
+]
+
+# Plantillas que faltan en templates/: recorren los mismos objetos que las reales
+PLANTILLAS = {
+    'vehiculos/vehiculo_list.html': (
+        "{% for vehiculo in vehiculos %}{% include 'vehiculos/_tarjeta.html' %}{% endfor %}"
+        '{{ form }}{% for marca in marcas %}{{ marca }}{% endfor %}{% for tipo in tipos %}{{ tipo }}{% endfor %}'
+    ),
+    'vehiculos/vehiculo_detail.html': (
+        "{% include 'vehiculos/_imagen.html' with variante='mediana' %}"
+        '{{ vehiculo.marca }} {{ vehiculo.modelo }} {{ vehiculo.tipo }} {{ vehiculo.politica_reembolso }}'
+    ),
+    'reservas/crear_reserva.html': '{{ vehiculo }} {{ form }}',
+    'pagos/procesar_pago.html': '{{ reserva }} {{ monto_total }} {{ form }}',
+    'pagos/historial_pagos.html': (
+        '{% for pago in pagos %}{{ pago }} {{ pago.metodo_pago }} {{ pago.reserva.estado }}{% endfor %}'
+    ),
+}
+
+TARJETA = {
+    'nombre_titular': 'Cliente', 'numero_tarjeta': '4111111111111111',
+    'fecha_vencimiento': '12/99', 'codigo_seguridad': '123',
+}
+
+# Primer dia de las reservas del embudo; el historial no pasa de aca
+DIAS_HASTA_EMBUDO = 30
+
+
+def configuracion_plantillas():
+    from django.conf import settings
+
+    motor = settings.TEMPLATES[0]
+    return [{
+        'BACKEND': motor['BACKEND'],
+        'DIRS': motor['DIRS'],
+        'OPTIONS': {
+            'context_processors': motor['OPTIONS']['context_processors'],
+            'loaders': [
+                ('django.template.loaders.locmem.Loader', PLANTILLAS),
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ],
+        },
+    }]
+
+
+def crear_usuarios(cantidad):
+    """Usuarios con su perfil (bulk_create no dispara la senal que lo crea)."""
+    from django.contrib.auth.models import User
+    from usuarios.models import Perfil
+
+    User.objects.bulk_create(
+        (User(username=f'cliente{i:06d}', email=f'cliente{i}@example.com') for i in range(cantidad)),
+        batch_size=5_000,
+    )
+    usuarios = list(User.objects.order_by('pk').values_list('pk', flat=True))
+    Perfil.objects.bulk_create((Perfil(usuario_id=usuario) for usuario in usuarios), batch_size=5_000)
+    return usuarios
+
+
+def crear_historial(cantidad, vehiculos, usuarios, anos, estados, metodo, rng, tamano_lote=5_000):
+    """Reservas de los ultimos ``anos`` años hasta el embudo; las confirmadas y completadas con su pago."""
+    from pagos.models import Pago
+    from reservas.models import Reserva
+
+    hoy = date.today()
+    origen = hoy - timedelta(days=anos * 365)
+    dias = (hoy - origen).days + DIAS_HASTA_EMBUDO - 10
+    pagadas = {estados['Confirmada'].pk, estados['Completada'].pk}
+    pagos = 0
+    while cantidad:
+        lote = min(tamano_lote, cantidad)
+        reservas = []
+        for _ in range(lote):
+            inicio = origen + timedelta(days=rng.randrange(dias))
+            fin = inicio + timedelta(days=rng.randrange(10))
+            if fin < hoy:
+                estado = rng.choices(['Completada', 'Cancelada', 'Vencida'], [7, 2, 1])[0]
+            else:
+                estado = rng.choices(['Confirmada', 'Pendiente'], [4, 1])[0]
+            dias_reserva = (fin - inicio).days + 1
+            reservas.append(Reserva(
+                usuario_id=rng.choice(usuarios), vehiculo_id=rng.choice(vehiculos), estado=estados[estado],
+                fecha_inicio=inicio, fecha_fin=fin,
+                precio_por_dia=Decimal('50.00'), total=Decimal('50.00') * dias_reserva,
+            ))
+        creadas = Reserva.objects.bulk_create(reservas)
+        pagos += len(Pago.objects.bulk_create(
+            Pago(reserva=reserva, usuario_id=reserva.usuario_id, metodo_pago=metodo, monto=reserva.total)
+            for reserva in creadas if reserva.estado_id in pagadas
+        ))
+        cantidad -= lote
+    return pagos
+
+
+class Medidor:
+    """Latencias, consultas y errores por paso, compartidos por los clientes."""
+
+    def __init__(self):
+        self.latencias = defaultdict(list)
+        self.consultas = defaultdict(list)
+        self.errores = defaultdict(int)
+        self._candado = threading.Lock()
+
+    def medir(self, paso, pedir, estado_esperado):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            respuesta = pedir()
+            latencia = (time.perf_counter() - inicio) * 1000
+        with self._candado:
+            self.latencias[paso].append(latencia)
+            self.consultas[paso].append(len(consultas))
+            if respuesta.status_code != estado_esperado:
+                self.errores[paso] += 1
+        return respuesta
+
+
+def recorrer(sesion, cliente, usuario, vehiculo_id, inicio, medidor):
+    """Una sesion del embudo; devuelve False si algun paso no respondio lo esperado."""
+    from django.urls import reverse
+
+    fin = inicio + timedelta(days=2)
+    fechas = {'fecha_inicio': inicio.isoformat(), 'fecha_fin': fin.isoformat()}
+    cliente.force_login(usuario)
+
+    medidor.medir('catalogo', lambda: cliente.get(reverse('vehiculos:lista'), fechas), 200)
+    medidor.medir('detalle', lambda: cliente.get(reverse('vehiculos:vehiculo-detail', args=[vehiculo_id])), 200)
+    url_reserva = reverse('reservas:crear', args=[vehiculo_id])
+    medidor.medir('formulario_reserva', lambda: cliente.get(url_reserva), 200)
+    respuesta = medidor.medir('crear_reserva', lambda: cliente.post(url_reserva, fechas), 302)
+    if respuesta.status_code != 302:
+        return False
+
+    url_pago = respuesta['Location']
+    medidor.medir('formulario_pago', lambda: cliente.get(url_pago), 200)
+    # La clave que el formulario genera al mostrarse; unica por sesion
+    clave = f'embudo-{sesion}'
+    medidor.medir('procesar_pago', lambda: cliente.post(url_pago, {**TARJETA, 'clave_idempotencia': clave}), 302)
+    medidor.medir('historial', lambda: cliente.get(reverse('pagos:historial')), 200)
+    return True
+
+
+def resultados(medidor, clientes):
+    pasos = {}
+    for paso in PASOS:
+        latencias = medidor.latencias[paso]
+        if not latencias:
+            continue
+        consultas = medidor.consultas[paso]
+        pasos[paso] = {
+            'requests': len(latencias),
+            'errores': medidor.errores[paso],
+            # Requests por segundo que atenderian ``clientes`` clientes haciendo solo este paso
+            'por_segundo': round(len(latencias) / (sum(latencias) / 1000 / clientes), 1),
+            'p50_ms': round(entorno.percentil(latencias, 50), 3),
+            'p95_ms': round(entorno.percentil(latencias, 95), 3),
+            'p99_ms': round(entorno.percentil(latencias, 99), 3),
+            'consultas_media': round(sum(consultas) / len(consultas), 2),
+            'consultas_max': max(consultas),
+        }
+    return pasos
+
+
+def comparar(pasos, base, tolerancia):
+    """Una linea por paso contra la base; devuelve True si ninguno empeoro."""
+    correcto = True
+    for paso, actual in pasos.items():
+        anterior = base['pasos'].get(paso)
+        if anterior is None:
+            continue
+        cambio = actual['p95_ms'] / anterior['p95_ms'] - 1
+        regresion = cambio > tolerancia or actual['consultas_media'] > anterior['consultas_media']
+        correcto &= not regresion
+        print(json.dumps({
+            'comparacion': paso,
+            'p95_ms': actual['p95_ms'], 'p95_base_ms': anterior['p95_ms'], 'cambio_p95': round(cambio, 3),
+            'consultas_media': actual['consultas_media'], 'consultas_media_base': anterior['consultas_media'],
+            'regresion': regresion,
+        }))
+    return correcto
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vehiculos', type=int, default=500)
+    parser.add_argument('--usuarios', type=int, default=1_000)
+    parser.add_argument('--reservas', type=int, default=100_000, help='Reservas de historial')
+    parser.add_argument('--anos', type=int, default=3, help='Años de historial')
+    parser.add_argument('--sesiones', type=int, default=300, help='Recorridos completos del embudo')
+    parser.add_argument('--clientes', type=int, default=1, help='Sesiones a la vez (hilos)')
+    parser.add_argument('--latencia', type=float, default=0.0, help='Segundos que demora cada cobro')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--guardar', metavar='ARCHIVO', help='Guardar el resultado como base')
+    parser.add_argument('--comparar', metavar='ARCHIVO', help='Comparar con una base guardada')
+    parser.add_argument('--tolerancia', type=float, default=0.25, help='Aumento de p95 admitido al comparar')
+    args = parser.parse_args()
+
+    # Varios clientes abren conexiones propias: la base en un archivo
+    entorno.preparar(en_archivo=args.clientes > 1)
+
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client, override_settings
+    from pagos.models import MetodoPago
+    from reservas.models import EstadoReserva
+
+    rng = random.Random(args.semilla)
+    inicio_datos = time.perf_counter()
+    estados = {
+        nombre: EstadoReserva.objects.create(nombre=nombre)
+        for nombre in ['Pendiente', 'Confirmada', 'Cancelada', 'Completada', 'Vencida']
+    }
+    metodo = MetodoPago.objects.create(nombre='Tarjeta de Credito/Debito')
+    _, _, vehiculos = crear_flota(args.vehiculos, rng)
+    usuarios = crear_usuarios(args.usuarios)
+    pagos = crear_historial(args.reservas, vehiculos, usuarios, args.anos, estados, metodo, rng)
+    datos = {
+        'vehiculos': args.vehiculos, 'usuarios': args.usuarios, 'reservas': args.reservas, 'pagos': pagos,
+        'segundos': round(time.perf_counter() - inicio_datos, 1),
+    }
+
+    # Cada sesion: un usuario y un vehiculo, en fechas que no se pisan con otras sesiones
+    manana = date.today() + timedelta(days=DIAS_HASTA_EMBUDO)
+    sesiones = [
+        (
+            sesion, usuarios[rng.randrange(len(usuarios))], vehiculos[sesion % len(vehiculos)],
+            manana + timedelta(days=4 * (sesion // len(vehiculos))),
+        )
+        for sesion in range(args.sesiones)
+    ]
+    por_id = User.objects.in_bulk([usuario for _, usuario, _, _ in sesiones])
+
+    medidor = Medidor()
+    local = threading.local()
+
+    def ejecutar(sesion):
+        numero, usuario, vehiculo_id, inicio = sesion
+        if not hasattr(local, 'cliente'):
+            local.cliente = Client()
+        try:
+            return recorrer(numero, local.cliente, por_id[usuario], vehiculo_id, inicio, medidor)
+        finally:
+            if args.clientes > 1:
+                connection.close()
+
+    with override_settings(
+        TEMPLATES=configuracion_plantillas(), PAGOS_EN_SEGUNDO_PLANO=False,
+        PAGOS_PASARELA_OPCIONES={'latencia': args.latencia},
+    ):
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clientes) as pool:
+            completas = sum(pool.map(ejecutar, sesiones))
+        duracion = time.perf_counter() - inicio
+
+    pasos = resultados(medidor, args.clientes)
+    for paso, valores in pasos.items():
+        print(json.dumps({'paso': paso, **valores}))
+    resumen = {
+        'embudo': 'total', 'backend': connection.vendor, 'clientes': args.clientes, 'semilla': args.semilla,
+        'sesiones': args.sesiones, 'completas': completas,
+        'segundos': round(duracion, 3), 'sesiones_por_segundo': round(args.sesiones / duracion, 1),
+        'datos': datos,
+    }
+    print(json.dumps(resumen))
+
+    if args.guardar:
+        with open(args.guardar, 'w', encoding='utf-8') as archivo:
+            json.dump({**resumen, 'pasos': pasos}, archivo, indent=2)
+    correcto = completas == args.sesiones and not any(valores['errores'] for valores in pasos.values())
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            correcto &= comparar(pasos, json.load(archivo), args.tolerancia)
+    sys.exit(0 if correcto else 1)
+
+
+if __name__ == '__main__':
+    main()
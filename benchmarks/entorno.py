@@ -0,0 +1,60 @@
+"""Preparacion comun de los benchmarks.
+
+Cada benchmark corre contra una base de pruebas descartable (la misma que usa
+``manage.py test``), nunca contra db.sqlite3.
+"""
+import atexit
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import django
+
+
+def preparar(en_archivo=False):
+    """Configura Django y crea la base de pruebas con las migraciones aplicadas.
+
+    Con ``en_archivo`` la base SQLite de pruebas se crea en un archivo
+    temporal en lugar de en memoria, necesario cuando varios hilos abren
+    conexiones propias.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alquileres_maria.settings')
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    if en_archivo and connection.vendor == 'sqlite':
+        directorio = tempfile.mkdtemp(prefix='benchmark-')
+        atexit.register(shutil.rmtree, directorio, ignore_errors=True)
+        connection.settings_dict['TEST']['NAME'] = os.path.join(directorio, 'benchmark.sqlite3')
+    connection.creation.create_test_db(verbosity=0)
+
+
+def medir(funcion, repeticiones):
+    """Ejecuta la funcion varias veces y devuelve las latencias en milisegundos."""
+    latencias = []
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(i)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    return latencias
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) de una lista de valores."""
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+def resumen(latencias):
+    """Resumen p50/p99 de una serie de latencias en milisegundos."""
+    return {
+        'media_ms': round(statistics.mean(latencias), 4),
+        'p50_ms': round(percentil(latencias, 50), 4),
+        'p99_ms': round(percentil(latencias, 99), 4),
+    }
@@ -0,0 +1,109 @@
+"""Benchmark del cierre y archivo de reservas terminadas.
+
+Genera un historial de varios años de reservas confirmadas y canceladas, con
+un pago por reserva confirmada, y mide completar las confirmadas terminadas
+y archivar las de mas de ``--anos`` años (reservas.historial). Reporta las
+filas que quedan en la tabla de reservas y la consulta de superposicion de
+Reserva.clean antes y despues.
+
+Uso:
+    python -m benchmarks.historial [--vehiculos 1000] [--reservas 500000] [--anos 2] [--lote 500]
+"""
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from benchmarks import entorno
+from benchmarks.busqueda_vehiculos import crear_flota
+
+
+def crear_historial(cantidad, vehiculos, usuario, confirmada, cancelada, metodo, rng, tamano_lote=5_000):
+    """Reservas de los ultimos seis años y el proximo; las confirmadas con su pago."""
+    from pagos.models import Pago
+    from reservas.models import Reserva
+
+    origen = date.today() - timedelta(days=6 * 365)
+    while cantidad:
+        lote = min(tamano_lote, cantidad)
+        reservas = []
+        for _ in range(lote):
+            inicio = origen + timedelta(days=rng.randrange(7 * 365))
+            reservas.append(Reserva(
+                usuario=usuario, vehiculo_id=rng.choice(vehiculos), fecha_inicio=inicio,
+                fecha_fin=inicio + timedelta(days=rng.randrange(10)),
+                estado=confirmada if rng.random() < 0.8 else cancelada,
+                precio_por_dia=Decimal('50.00'), total=Decimal('150.00'),
+            ))
+        Pago.objects.bulk_create(
+            Pago(reserva=reserva, usuario=usuario, metodo_pago=metodo, monto=reserva.total)
+            for reserva in Reserva.objects.bulk_create(reservas) if reserva.estado == confirmada
+        )
+        cantidad -= lote
+
+
+def medir_superposicion(vehiculos, repeticiones, rng):
+    from reservas import disponibilidad
+
+    manana = date.today() + timedelta(days=1)
+    return entorno.resumen(entorno.medir(
+        lambda i: disponibilidad.reserva_conflictiva(rng.choice(vehiculos), manana, manana + timedelta(days=3)),
+        repeticiones,
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vehiculos', type=int, default=1_000)
+    parser.add_argument('--reservas', type=int, default=500_000)
+    parser.add_argument('--anos', type=int, default=2)
+    parser.add_argument('--lote', type=int, default=500)
+    parser.add_argument('--repeticiones', type=int, default=500)
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    entorno.preparar()
+
+    from django.contrib.auth.models import User
+    from pagos.models import MetodoPago, PagoHistorico
+    from reservas import historial
+    from reservas.models import EstadoReserva, Reserva, ReservaHistorica
+
+    rng = random.Random(args.semilla)
+    estados = {
+        nombre: EstadoReserva.objects.create(nombre=nombre)
+        for nombre in ['Pendiente', 'Confirmada', 'Cancelada', 'Completada']
+    }
+    usuario = User.objects.create_user('benchmark')
+    _, _, vehiculos = crear_flota(args.vehiculos, rng)
+    crear_historial(
+        args.reservas, vehiculos, usuario, estados['Confirmada'], estados['Cancelada'],
+        MetodoPago.objects.create(nombre='Efectivo'), rng,
+    )
+
+    print(json.dumps({
+        'operacion': 'superposicion', 'momento': 'antes', 'reservas': Reserva.objects.count(),
+        **medir_superposicion(vehiculos, args.repeticiones, rng),
+    }))
+    for operacion, funcion in [
+        ('completar_finalizadas', lambda: historial.completar_finalizadas(lote=args.lote)),
+        ('archivar', lambda: historial.archivar(args.anos, lote=args.lote)),
+    ]:
+        inicio = time.perf_counter()
+        cantidad = funcion()
+        segundos = time.perf_counter() - inicio
+        print(json.dumps({
+            'operacion': operacion, 'lote': args.lote, 'reservas': cantidad,
+            'segundos': round(segundos, 3), 'reservas_por_segundo': round(cantidad / segundos, 1),
+        }))
+    print(json.dumps({
+        'operacion': 'superposicion', 'momento': 'despues', 'reservas': Reserva.objects.count(),
+        'archivadas': ReservaHistorica.objects.count(), 'pagos_archivados': PagoHistorico.objects.count(),
+        **medir_superposicion(vehiculos, args.repeticiones, rng),
+    }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark del comando importar_flota.
+
+Genera un CSV de vehiculos, lo importa (todas altas) y lo vuelve a importar
+(todas actualizaciones por patente), reportando filas por segundo.
+
+Uso:
+    python -m benchmarks.importacion_flota [--filas 100000] [--lote 1000]
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks import entorno
+
+MARCAS = ['Toyota', 'Ford', 'Chevrolet', 'Volkswagen', 'Honda', 'Nissan', 'Renault', 'Fiat']
+TIPOS = ['Sedan', 'SUV', 'Camioneta', 'Compacto', 'Deportivo', 'Minivan']
+
+
+def escribir_csv(ruta, filas, rng):
+    with open(ruta, 'w', encoding='utf-8', newline='') as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(['marca', 'modelo', 'tipo', 'ano', 'patente', 'capacidad', 'precio_por_dia', 'kilometraje', 'disponible'])
+        for i in range(filas):
+            escritor.writerow([
+                rng.choice(MARCAS), f'Modelo {i % 40}', rng.choice(TIPOS), rng.randrange(2010, 2025),
+                f'IMP{i:07d}', rng.randrange(2, 9), f'{rng.randrange(20, 150)}.00', rng.randrange(100000), 'si',
+            ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, default=100_000)
+    parser.add_argument('--lote', type=int, default=1000)
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    entorno.preparar()
+
+    from django.core.management import call_command
+    from vehiculos.models import Vehiculo
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'flota.csv')
+        escribir_csv(ruta, args.filas, random.Random(args.semilla))
+
+        for etapa in ['alta', 'actualizacion']:
+            inicio = time.perf_counter()
+            call_command('importar_flota', ruta, '--lote', str(args.lote), stdout=io.StringIO(), stderr=io.StringIO())
+            duracion = time.perf_counter() - inicio
+            print(json.dumps({
+                'etapa': etapa,
+                'filas': args.filas,
+                'vehiculos': Vehiculo.objects.count(),
+                'duracion_s': round(duracion, 3),
+                'filas_por_segundo': round(args.filas / duracion),
+            }))
+
+
+if __name__ == '__main__':
+    main()
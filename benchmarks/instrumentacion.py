@@ -0,0 +1,73 @@
+"""Benchmark del costo de la instrumentacion de requests.
+
+Mide lo que agrega alquileres_maria.instrumentacion: por request, el
+middleware alrededor de una vista que no hace nada, con el muestreo apagado
+y encendido; y por consulta, el execute_wrapper alrededor de un SELECT
+trivial. Las cifras son el costo neto en microsegundos.
+
+Uso:
+    python -m benchmarks.instrumentacion [--repeticiones 20000]
+"""
+import argparse
+import json
+
+from benchmarks import entorno
+
+
+def costo(funcion, base, repeticiones):
+    """Diferencia de medianas, en microsegundos, entre ``funcion`` y ``base``."""
+    medido = entorno.resumen(entorno.medir(funcion, repeticiones))
+    referencia = entorno.resumen(entorno.medir(base, repeticiones))
+    return {
+        'p50_us': round((medido['p50_ms'] - referencia['p50_ms']) * 1000, 2),
+        'media_us': round((medido['media_ms'] - referencia['media_ms']) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticiones', type=int, default=20_000)
+    args = parser.parse_args()
+
+    entorno.preparar()
+
+    from django.db import connection
+    from django.http import HttpResponse
+    from django.test import RequestFactory, override_settings
+    from django.urls import resolve
+    from alquileres_maria import instrumentacion
+
+    request = RequestFactory().get('/vehiculos/')
+    request.resolver_match = resolve('/vehiculos/')
+    respuesta = HttpResponse()
+
+    def vista(request):
+        return respuesta
+
+    medir_request = instrumentacion.middleware(vista)
+    for muestreo in [0, 1]:
+        with override_settings(INSTRUMENTACION_MUESTREO=muestreo):
+            print(json.dumps({
+                'operacion': 'request', 'muestreo': muestreo,
+                **costo(lambda i: medir_request(request), lambda i: vista(request), args.repeticiones),
+            }))
+
+    cursor = connection.cursor()
+
+    def consultar(i):
+        cursor.execute('SELECT %s', [i % 100])
+
+    base = entorno.resumen(entorno.medir(consultar, args.repeticiones))
+    # Como en un request: el wrapper queda instalado durante todas las consultas
+    medicion = instrumentacion.Medicion()
+    with connection.execute_wrapper(medicion):
+        medido = entorno.resumen(entorno.medir(consultar, args.repeticiones))
+    print(json.dumps({
+        'operacion': 'consulta',
+        'p50_us': round((medido['p50_ms'] - base['p50_ms']) * 1000, 2),
+        'media_us': round((medido['media_ms'] - base['media_ms']) * 1000, 2),
+        'duplicadas_detectadas': medicion.duplicadas,
+    }))
+
+if __name__ == '__main__':
+    main()
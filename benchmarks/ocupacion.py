@@ -0,0 +1,110 @@
+"""Benchmark del calendario de disponibilidad con mapa de ocupacion.
+
+Genera una flota con muchas reservas y compara, para un calendario de doce
+meses de un vehiculo, el armado desde las reservas activas (lo que hacia la
+API antes del mapa) con la lectura del mapa de bits (reservas.ocupacion),
+ambos sin pasar por HTTP. Mide tambien el costo de mantener el mapa al
+cancelar una reserva frente a reconstruirlo entero.
+
+Uso:
+    python -m benchmarks.ocupacion [--vehiculos 200] [--reservas 200000] [--repeticiones 200]
+"""
+import argparse
+import json
+import random
+from datetime import timedelta
+
+from benchmarks import entorno
+from benchmarks.busqueda_vehiculos import crear_flota, crear_reservas
+
+MESES = 12
+
+
+def calendario_desde_reservas(vehiculo_id, desde, hasta):
+    from reservas import disponibilidad
+
+    ocupados = set()
+    reservas = disponibilidad.reservas_superpuestas(vehiculo_id, desde, hasta).values_list('fecha_inicio', 'fecha_fin')
+    for inicio, fin in reservas:
+        dia = max(inicio, desde)
+        while dia <= min(fin, hasta):
+            ocupados.add(dia)
+            dia += timedelta(days=1)
+    return sorted(ocupados)
+
+
+def calendario_desde_mapa(vehiculo_id, desde, hasta):
+    from reservas import api
+
+    _, mapa, _ = api.mapa_del_vehiculo(vehiculo_id, desde, hasta)
+    return mapa.ocupados(desde, hasta)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vehiculos', type=int, default=200)
+    parser.add_argument('--reservas', type=int, default=200_000)
+    parser.add_argument('--repeticiones', type=int, default=200)
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    entorno.preparar()
+
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from reservas import ocupacion
+    from reservas.models import EstadoReserva, Reserva
+    from vehiculos.models import Vehiculo
+
+    rng = random.Random(args.semilla)
+    estados = [EstadoReserva.objects.create(nombre=nombre) for nombre in ['Pendiente', 'Confirmada', 'Cancelada']]
+    usuario = User.objects.create_user('benchmark')
+    _, _, vehiculos = crear_flota(args.vehiculos, rng)
+    crear_reservas(args.reservas, vehiculos, usuario, estados, rng)
+
+    desde = timezone.localdate().replace(day=1)
+    hasta = desde + timedelta(days=365)
+    for vehiculo_id in vehiculos:
+        ocupacion.reconstruir(vehiculo_id)
+
+    # Las dos formas tienen que dar los mismos dias
+    assert calendario_desde_reservas(vehiculos[0], desde, hasta) == calendario_desde_mapa(vehiculos[0], desde, hasta)
+
+    for estrategia, funcion in [('reservas', calendario_desde_reservas), ('mapa', calendario_desde_mapa)]:
+        print(json.dumps({
+            'operacion': f'calendario_{MESES}_meses', 'estrategia': estrategia,
+            **entorno.resumen(entorno.medir(
+                lambda i: funcion(vehiculos[i % len(vehiculos)], desde, hasta), args.repeticiones,
+            )),
+        }))
+
+    # Reservas a cancelar, una por repeticion, en un vehiculo aparte: las
+    # generadas al azar se superponen y Reserva.save() las rechazaria
+    vehiculo = Vehiculo.objects.get(pk=vehiculos[0])
+    vehiculo.pk, vehiculo.patente = None, 'BENOCUP'
+    vehiculo.save()
+    manana = timezone.localdate() + timedelta(days=1)
+    reservas = Reserva.objects.bulk_create(
+        Reserva(
+            usuario=usuario, vehiculo=vehiculo, estado=estados[1],
+            fecha_inicio=manana + timedelta(days=2 * i), fecha_fin=manana + timedelta(days=2 * i),
+        )
+        for i in range(args.repeticiones)
+    )
+    ocupacion.reconstruir(vehiculo.pk)
+    cancelada = estados[2]
+
+    def cancelar(i):
+        reserva = reservas[i]
+        reserva.estado = cancelada
+        reserva.save()
+
+    for operacion, funcion in [
+        ('reconstruir', lambda i: ocupacion.reconstruir(reservas[i].vehiculo_id)),
+        ('cancelar_incremental', cancelar),
+    ]:
+        print(json.dumps({'operacion': operacion, **entorno.resumen(entorno.medir(funcion, args.repeticiones))}))
+
+
+if __name__ == '__main__':
+    main()
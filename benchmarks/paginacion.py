@@ -0,0 +1,121 @@
+"""Benchmark de la paginacion por cursor frente a la paginacion por OFFSET.
+
+Genera un usuario con muchas reservas y pagos y una flota grande, y mide para
+los tres listados (reservas del usuario, historial de pagos y catalogo de
+vehiculos) la primera pagina y la pagina ``--pagina`` con el Paginator de
+Django (COUNT mas OFFSET) y con PaginadorCursor (sin COUNT, filtrando desde
+la ultima fila de la pagina anterior). Se usan los mismos querysets que las
+vistas.
+
+Uso:
+    python -m benchmarks.paginacion [--pagina 10000] [--repeticiones 30]
+"""
+import argparse
+import json
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from benchmarks import entorno
+from benchmarks.busqueda_vehiculos import crear_flota
+
+
+def crear_historial(usuario, cantidad, vehiculos, estado, metodo, tamano_lote=5_000):
+    """Reservas del usuario, en fechas sucesivas por vehiculo, con un pago cada una."""
+    from pagos.models import Pago
+    from reservas.models import Reserva
+
+    origen = date.today() - timedelta(days=10 * 365)
+    creadas = 0
+    while creadas < cantidad:
+        lote = []
+        for i in range(creadas, min(cantidad, creadas + tamano_lote)):
+            inicio = origen + timedelta(days=3 * (i // len(vehiculos)))
+            lote.append(Reserva(
+                usuario=usuario, vehiculo_id=vehiculos[i % len(vehiculos)], estado=estado,
+                fecha_inicio=inicio, fecha_fin=inicio + timedelta(days=1),
+                precio_por_dia=Decimal('50.00'), total=Decimal('100.00'),
+            ))
+        reservas = Reserva.objects.bulk_create(lote)
+        Pago.objects.bulk_create(
+            Pago(reserva=reserva, usuario=usuario, metodo_pago=metodo, monto=Decimal('100.00'))
+            for reserva in reservas
+        )
+        creadas += len(lote)
+
+
+def medir_listado(nombre, queryset, por_pagina, ordenamiento, pagina, repeticiones):
+    from django.core.paginator import Paginator
+    from alquileres_maria.paginacion import PaginadorCursor
+
+    paginador = PaginadorCursor(queryset, por_pagina, ordenamiento)
+    # Cursor de la pagina pedida: la ultima fila de la pagina anterior (fuera de la medicion)
+    ultima_anterior = paginador.queryset[(pagina - 1) * por_pagina - 1]
+    cursor = paginador.cursor(ultima_anterior)
+
+    def offset(numero):
+        return lambda _: list(Paginator(paginador.queryset, por_pagina).page(numero).object_list)
+
+    def con_cursor(cursor):
+        return lambda _: list(paginador.pagina(cursor).object_list)
+
+    # Las dos paginaciones tienen que devolver las mismas filas
+    assert [fila.pk for fila in offset(pagina)(0)] == [fila.pk for fila in con_cursor(cursor)(0)]
+
+    for estrategia, numero, funcion in [
+        ('offset', 1, offset(1)),
+        ('offset', pagina, offset(pagina)),
+        ('cursor', 1, con_cursor(None)),
+        ('cursor', pagina, con_cursor(cursor)),
+    ]:
+        print(json.dumps({
+            'listado': nombre, 'paginacion': estrategia, 'pagina': numero,
+            **entorno.resumen(entorno.medir(funcion, repeticiones)),
+        }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pagina', type=int, default=10_000)
+    parser.add_argument('--repeticiones', type=int, default=30)
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    entorno.preparar()
+
+    from django.contrib.auth.models import User
+    from django.test import RequestFactory
+    from pagos.models import MetodoPago
+    from pagos.views import ORDEN_HISTORIAL, PAGOS_POR_PAGINA, pagos_del_usuario
+    from reservas.models import EstadoReserva
+    from reservas.views import ReservaListView
+    from vehiculos.views import VehiculoListView
+
+    rng = random.Random(args.semilla)
+    estado = EstadoReserva.objects.create(nombre='Completada')
+    metodo = MetodoPago.objects.create(nombre='Tarjeta de Credito/Debito')
+    usuario = User.objects.create_user('benchmark')
+
+    # Filas suficientes para llegar a la pagina pedida en cada listado
+    cantidad_vehiculos = (args.pagina + 1) * VehiculoListView.paginate_by
+    cantidad_reservas = (args.pagina + 1) * max(ReservaListView.paginate_by, PAGOS_POR_PAGINA)
+    _, _, vehiculos = crear_flota(cantidad_vehiculos, rng)
+    crear_historial(usuario, cantidad_reservas, vehiculos, estado, metodo)
+
+    solicitud = RequestFactory().get('/')
+    solicitud.user = usuario
+    vista_reservas = ReservaListView()
+    vista_reservas.setup(solicitud)
+    vista_vehiculos = VehiculoListView()
+    vista_vehiculos.setup(solicitud)
+
+    for nombre, queryset, por_pagina, ordenamiento in [
+        ('reservas', vista_reservas.get_queryset(), ReservaListView.paginate_by, ReservaListView.ordenamiento),
+        ('pagos', pagos_del_usuario(usuario), PAGOS_POR_PAGINA, ORDEN_HISTORIAL),
+        ('vehiculos', vista_vehiculos.get_queryset(), VehiculoListView.paginate_by, VehiculoListView.ordenamiento),
+    ]:
+        medir_listado(nombre, queryset, por_pagina, ordenamiento, args.pagina, args.repeticiones)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Benchmark del procesamiento de pagos con la pasarela falsa.
+
+Envia el formulario de pago de muchas reservas pendientes con el cliente de
+pruebas de Django, desde varios hilos a la vez, con la pasarela falsa
+demorando ``--latencia`` segundos por cobro. Compara el cobro dentro del
+request (PAGOS_EN_SEGUNDO_PLANO = False) con la intencion encolada y
+procesada por el pool de hilos: latencia del POST y tiempo hasta que todos
+los pagos quedan resueltos. Con ``--reintentos`` cada formulario se envia
+varias veces a la vez (la misma clave de idempotencia, como un doble clic o
+un reintento del navegador) y al final se verifica que haya un solo pago
+por reserva; termina con codigo 1 si no.
+
+Uso:
+    python -m benchmarks.pagos [--pagos 200] [--clientes 8] [--hilos 8] [--latencia 0.2] [--reintentos 1]
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+
+from benchmarks import entorno
+from benchmarks.busqueda_vehiculos import crear_flota
+
+TARJETA = {
+    'nombre_titular': 'Cliente', 'numero_tarjeta': '4111111111111111',
+    'fecha_vencimiento': '12/99', 'codigo_seguridad': '123',
+}
+
+
+def crear_reservas_pendientes(usuario, vehiculos, estado):
+    from reservas.models import Reserva
+
+    inicio = date.today() + timedelta(days=1)
+    return [
+        reserva.pk for reserva in Reserva.objects.bulk_create(
+            Reserva(
+                usuario=usuario, vehiculo_id=vehiculo_id, estado=estado, fecha_inicio=inicio,
+                fecha_fin=inicio + timedelta(days=2), precio_por_dia=Decimal('50.00'), total=Decimal('150.00'),
+            )
+            for vehiculo_id in vehiculos
+        )
+    ]
+
+
+def esperar_resueltas(reservas, limite=600):
+    """Espera a que se resuelva el pago de todas las reservas; devuelve los segundos esperados."""
+    from pagos.models import IntencionPago
+
+    inicio = time.perf_counter()
+    intenciones = IntencionPago.objects.filter(reserva_id__in=reservas)
+    while intenciones.exclude(estado__in=IntencionPago.ACTIVAS).count() < len(reservas):
+        if time.perf_counter() - inicio > limite:
+            raise RuntimeError("Las intenciones de pago no se resolvieron a tiempo.")
+        time.sleep(0.05)
+    return time.perf_counter() - inicio
+
+
+def medir(modo, usuario, reservas, clientes, reintentos):
+    from django.db import connection
+    from django.test import Client
+    from django.urls import reverse
+    from pagos.models import IntencionPago, Pago
+
+    local = threading.local()
+
+    def pagar(envio):
+        reserva_id, clave = envio
+        if not hasattr(local, 'cliente'):
+            local.cliente = Client()
+            local.cliente.force_login(usuario)
+        inicio = time.perf_counter()
+        respuesta = local.cliente.post(
+            reverse('pagos:procesar_pago', args=[reserva_id]), {**TARJETA, 'clave_idempotencia': clave},
+        )
+        assert respuesta.status_code == 302, respuesta.status_code
+        latencia = (time.perf_counter() - inicio) * 1000
+        connection.close()
+        return latencia
+
+    # Cada reserva con su clave, enviada ``reintentos`` veces en posiciones seguidas
+    claves = {reserva_id: uuid.uuid4().hex for reserva_id in reservas}
+    envios = [(reserva_id, claves[reserva_id]) for reserva_id in reservas for _ in range(reintentos)]
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clientes) as pool:
+        latencias = list(pool.map(pagar, envios))
+    envio = time.perf_counter() - inicio
+    total = envio + esperar_resueltas(reservas)
+    intenciones = IntencionPago.objects.filter(reserva_id__in=reservas).count()
+    pagos = Pago.objects.filter(reserva_id__in=reservas).count()
+    print(json.dumps({
+        'modo': modo, 'pagos': len(reservas), 'clientes': clientes, 'envios': len(envios),
+        'post': entorno.resumen(latencias),
+        'segundos_hasta_resolver_todos': round(total, 3),
+        'pagos_por_segundo': round(len(reservas) / total, 1),
+        'intenciones': intenciones,
+        'aprobados': pagos,
+    }))
+    return intenciones == pagos == len(reservas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pagos', type=int, default=200)
+    parser.add_argument('--clientes', type=int, default=8, help='Hilos que envian formularios a la vez')
+    parser.add_argument('--hilos', type=int, default=8, help='Hilos del pool de pagos (PAGOS_HILOS)')
+    parser.add_argument('--latencia', type=float, default=0.2, help='Segundos que demora cada cobro')
+    parser.add_argument('--reintentos', type=int, default=1, help='Veces que se envia cada formulario')
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    entorno.preparar(en_archivo=True)
+
+    from django.contrib.auth.models import User
+    from django.test import override_settings
+    from pagos.models import MetodoPago
+    from reservas.models import EstadoReserva
+
+    rng = random.Random(args.semilla)
+    pendiente = EstadoReserva.objects.create(nombre='Pendiente')
+    EstadoReserva.objects.create(nombre='Confirmada')
+    MetodoPago.objects.create(nombre='Tarjeta de Credito/Debito')
+    usuario = User.objects.create_user('benchmark')
+    _, _, vehiculos = crear_flota(2 * args.pagos, rng)
+
+    opciones = {'latencia': args.latencia}
+    correcto = True
+    for modo, en_segundo_plano, vehiculos_modo in [
+        ('en_el_request', False, vehiculos[:args.pagos]),
+        ('en_segundo_plano', True, vehiculos[args.pagos:]),
+    ]:
+        reservas = crear_reservas_pendientes(usuario, vehiculos_modo, pendiente)
+        with override_settings(
+            PAGOS_EN_SEGUNDO_PLANO=en_segundo_plano, PAGOS_PASARELA_OPCIONES=opciones, PAGOS_HILOS=args.hilos,
+        ):
+            correcto &= medir(modo, usuario, reservas, args.clientes, args.reintentos)
+    sys.exit(0 if correcto else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Prueba de estres de reservas concurrentes.
+
+Lanza cientos de hilos que intentan reservar a la vez unos pocos vehiculos en
+fechas que se pisan, usando el mismo camino que la vista crear_reserva
+(``disponibilidad.reservar``). Al terminar verifica que no haya dos reservas
+activas superpuestas para un mismo vehiculo y reporta el throughput.
+Termina con codigo 1 si encuentra alguna superposicion.
+
+Uso:
+    python -m benchmarks.reservas_concurrentes [--hilos 300] [--vehiculos 5] [--dias 30]
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+
+from benchmarks import entorno
+
+
+def contar_superposiciones():
+    """Cuenta los pares de reservas activas superpuestas del mismo vehiculo."""
+    from reservas.disponibilidad import ESTADOS_ACTIVOS
+    from reservas.models import Reserva
+
+    superposiciones = 0
+    por_vehiculo = {}
+    reservas = Reserva.objects.filter(estado__nombre__in=ESTADOS_ACTIVOS).values_list(
+        'vehiculo_id', 'fecha_inicio', 'fecha_fin')
+    for vehiculo_id, inicio, fin in reservas:
+        por_vehiculo.setdefault(vehiculo_id, []).append((inicio, fin))
+    for periodos in por_vehiculo.values():
+        periodos.sort()
+        for (_, fin_anterior), (inicio, _) in zip(periodos, periodos[1:]):
+            if inicio <= fin_anterior:
+                superposiciones += 1
+    return superposiciones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hilos', type=int, default=300)
+    parser.add_argument('--vehiculos', type=int, default=5)
+    parser.add_argument('--dias', type=int, default=30, help='Ventana de fechas en la que compiten los hilos')
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    entorno.preparar(en_archivo=True)
+
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from reservas import disponibilidad
+    from reservas.forms import ReservaForm
+    from reservas.models import EstadoReserva
+    from vehiculos.models import Marca, TipoVehiculo, Vehiculo
+
+    for nombre in ['Pendiente', 'Confirmada', 'Cancelada']:
+        EstadoReserva.objects.get_or_create(nombre=nombre)
+    estado_pendiente = EstadoReserva.objects.get(nombre='Pendiente')
+    usuario = User.objects.create_user('benchmark')
+    marca = Marca.objects.create(nombre='Toyota')
+    tipo = TipoVehiculo.objects.create(nombre='Sedan')
+    vehiculos = [
+        Vehiculo.objects.create(
+            marca=marca, tipo=tipo, modelo='Corolla', ano=2022, patente=f'BEN{i:03d}',
+            capacidad=5, precio_por_dia=Decimal('50.00'),
+        )
+        for i in range(args.vehiculos)
+    ]
+
+    rng = random.Random(args.semilla)
+    manana = date.today() + timedelta(days=1)
+    pedidos = []
+    for _ in range(args.hilos):
+        inicio = manana + timedelta(days=rng.randrange(args.dias))
+        pedidos.append((rng.choice(vehiculos), inicio, inicio + timedelta(days=rng.randrange(4))))
+
+    resultados = Counter()
+    candado = threading.Lock()
+    largada = threading.Barrier(args.hilos)
+
+    def reservar(vehiculo, inicio, fin):
+        form = ReservaForm({'fecha_inicio': inicio, 'fecha_fin': fin}, vehiculo=vehiculo, usuario=usuario)
+        largada.wait()
+        try:
+            resultado = 'creadas' if disponibilidad.reservar(form, usuario, vehiculo, estado_pendiente) else 'rechazadas'
+        except Exception as exc:
+            resultado = f'error: {type(exc).__name__}'
+        finally:
+            connection.close()
+        with candado:
+            resultados[resultado] += 1
+
+    hilos = [threading.Thread(target=reservar, args=pedido) for pedido in pedidos]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+
+    superposiciones = contar_superposiciones()
+    print(json.dumps({
+        'backend': connection.vendor,
+        'hilos': args.hilos,
+        'vehiculos': args.vehiculos,
+        **resultados,
+        'superposiciones': superposiciones,
+        'duracion_s': round(duracion, 3),
+        'reservas_por_segundo': round(args.hilos / duracion, 1),
+    }))
+    if superposiciones:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark del vencimiento de reservas pendientes.
+
+Genera un historial grande de reservas confirmadas, canceladas y completadas
+y muchas pendientes recientes (pagos en curso, que todavia no vencen), y mide
+el barrido de reservas.vencimiento: sin nada por vencer (lo habitual en cada
+corrida de cron) con el indice (estado, fecha_creacion) y solo con el indice
+de la clave foranea estado, que recorre todas las pendientes; y despues el
+barrido que vence, por lotes, las pendientes abandonadas.
+
+Uso:
+    python -m benchmarks.vencimiento [--vehiculos 1000] [--reservas 1000000] [--recientes 20000] [--pendientes 20000] [--lote 500]
+"""
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+
+from benchmarks import entorno
+from benchmarks.busqueda_vehiculos import crear_flota, crear_reservas
+
+
+def crear_pendientes(cantidad, vehiculos, usuario, pendiente, rng, antiguedad):
+    from django.utils import timezone
+    from reservas.models import Reserva
+
+    reservas = []
+    for _ in range(cantidad):
+        inicio = date.today() + timedelta(days=rng.randrange(365))
+        reservas.append(Reserva(
+            usuario=usuario, vehiculo_id=rng.choice(vehiculos), estado=pendiente,
+            fecha_inicio=inicio, fecha_fin=inicio + timedelta(days=rng.randrange(10)),
+        ))
+    creadas = Reserva.objects.bulk_create(reservas, batch_size=5_000)
+    Reserva.objects.filter(pk__in=[r.pk for r in creadas]).update(fecha_creacion=timezone.now() - antiguedad)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vehiculos', type=int, default=1_000)
+    parser.add_argument('--reservas', type=int, default=1_000_000)
+    parser.add_argument('--recientes', type=int, default=20_000, help='Pendientes que todavia no vencen')
+    parser.add_argument('--pendientes', type=int, default=20_000, help='Pendientes abandonadas, que vencen')
+    parser.add_argument('--lote', type=int, default=500)
+    parser.add_argument('--repeticiones', type=int, default=50)
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    entorno.preparar()
+
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from reservas import vencimiento
+    from reservas.models import EstadoReserva, Reserva
+
+    rng = random.Random(args.semilla)
+    pendiente = EstadoReserva.objects.create(nombre='Pendiente')
+    historial = [EstadoReserva.objects.create(nombre=nombre) for nombre in ['Confirmada', 'Cancelada', 'Completada']]
+    usuario = User.objects.create_user('benchmark')
+    _, _, vehiculos = crear_flota(args.vehiculos, rng)
+    crear_reservas(args.reservas, vehiculos, usuario, historial, rng)
+    crear_pendientes(args.recientes, vehiculos, usuario, pendiente, rng, timedelta(minutes=5))
+
+    # Barrido sin nada por vencer
+    indice = next(indice for indice in Reserva._meta.indexes if indice.name == 'reserva_estado_creacion_idx')
+    for estrategia in ['estado_fecha_creacion', 'solo_estado']:
+        if estrategia == 'solo_estado':
+            with connection.schema_editor() as editor:
+                editor.remove_index(Reserva, indice)
+        print(json.dumps({
+            'operacion': 'barrido_vacio', 'estrategia': estrategia, 'reservas': args.reservas,
+            'recientes': args.recientes,
+            **entorno.resumen(entorno.medir(lambda i: vencimiento.vencer_pendientes(lote=args.lote), args.repeticiones)),
+        }))
+    with connection.schema_editor() as editor:
+        editor.add_index(Reserva, indice)
+
+    crear_pendientes(args.pendientes, vehiculos, usuario, pendiente, rng, timedelta(days=1))
+    inicio = time.perf_counter()
+    vencidas = vencimiento.vencer_pendientes(lote=args.lote)
+    segundos = time.perf_counter() - inicio
+    assert vencidas == args.pendientes, vencidas
+    print(json.dumps({
+        'operacion': 'vencer_pendientes', 'pendientes': args.pendientes, 'lote': args.lote,
+        'segundos': round(segundos, 3), 'reservas_por_segundo': round(vencidas / segundos, 1),
+    }))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,131 +1,8 @@
-# manage.py
-import os
-import django
-
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alquileres_maria.settings')
-django.setup()
-
-from django.contrib.auth.models import User
-from vehiculos.models import PoliticaReembolso, TipoVehiculo, Marca, Vehiculo
-from reservas.models import EstadoReserva
-from pagos.models import MetodoPago
-from decimal import Decimal
-
 #!/usr/bin/env python
+"""Django's command-line utility for administrative tasks."""
 import os
 import sys
 
-# Crear políticas de reembolso
-politicas_reembolso = [
-    {'nombre': 'Reembolso Completo', 'porcentaje': 100, 'descripcion': 'Devolución del 100% del importe pagado.'},
-    {'nombre': 'Reembolso Parcial', 'porcentaje': 20, 'descripcion': 'Devolución del 20% del importe pagado.'},
-    {'nombre': 'Sin Reembolso', 'porcentaje': 0, 'descripcion': 'No se realiza ningún reembolso.'}
-]
-
-for politica in politicas_reembolso:
-    PoliticaReembolso.objects.get_or_create(
-        nombre=politica['nombre'],
-        defaults={
-            'porcentaje': politica['porcentaje'],
-            'descripcion': politica['descripcion']
-        }
-    )
-print("Políticas de reembolso creadas")
-
-# Crear estados de reserva
-estados_reserva = ['Pendiente', 'Confirmada', 'Cancelada', 'Cancelada por Admin', 'Completada']
-for estado in estados_reserva:
-    EstadoReserva.objects.get_or_create(nombre=estado)
-print("Estados de reserva creados")
-
-# Crear metodos de pago
-metodos_pago = ['Tarjeta de Credito/Debito', 'Transferencia Bancaria', 'Efectivo']
-for metodo in metodos_pago:
-    MetodoPago.objects.get_or_create(nombre=metodo)
-print("Metodos de pago creados")
-
-# Crear tipos de vehiculos
-tipos_vehiculo = ['Sedan', 'SUV', 'Camioneta', 'Compacto', 'Deportivo', 'Minivan']
-for tipo in tipos_vehiculo:
-    TipoVehiculo.objects.get_or_create(nombre=tipo)
-print("Tipos de vehiculo creados")
-
-# Crear marcas
-marcas = ['Toyota', 'Ford', 'Chevrolet', 'Volkswagen', 'Honda', 'Nissan', 'Renault', 'Fiat']
-for marca in marcas:
-    Marca.objects.get_or_create(nombre=marca)
-print("Marcas creadas")
-
-# Crear superusuario si no existe
-if not User.objects.filter(username='admin').exists():
-    user = User.objects.create_superuser('admin', 'admin@example.com', 'admin123')
-    user.last_login = user.date_joined  # Asignamos la fecha de creación como last_login
-    user.save()
-    print("Superusuario creado")
-
-# Crear algunos vehiculos de ejemplo
-vehiculos = [
-    {
-        'marca': 'Toyota',
-        'modelo': 'Corolla',
-        'tipo': 'Sedan',
-        'ano': 2022,
-        'patente': 'ABC123',
-        'capacidad': 5,
-        'precio_por_dia': Decimal('50.00'),  # Actualizado nombre del campo
-        'kilometraje': 15000,  # Añadido nuevo campo
-        'politica_reembolso': 'Reembolso Completo',  # Añadido nuevo campo
-        'descripcion': 'Toyota Corolla en excelente estado. Ideal para viajes familiares.'
-    },
-    {
-        'marca': 'Ford',
-        'modelo': 'EcoSport',
-        'tipo': 'SUV',
-        'ano': 2021,
-        'patente': 'DEF456',
-        'capacidad': 5,
-        'precio_por_dia': Decimal('60.00'),  # Actualizado nombre del campo
-        'kilometraje': 25000,  # Añadido nuevo campo
-        'politica_reembolso': 'Reembolso Parcial',  # Añadido nuevo campo
-        'descripcion': 'Ford EcoSport con todas las comodidades. Perfecta para ciudad y ruta.'
-    },
-    {
-        'marca': 'Chevrolet',
-        'modelo': 'S10',
-        'tipo': 'Camioneta',
-        'ano': 2020,
-        'patente': 'GHI789',
-        'capacidad': 5,
-        'precio_por_dia': Decimal('70.00'),  # Actualizado nombre del campo
-        'kilometraje': 35000,  # Añadido nuevo campo
-        'politica_reembolso': 'Sin Reembolso',  # Añadido nuevo campo
-        'descripcion': 'Chevrolet S10 4x4. Ideal para terrenos dificiles y carga.'
-    }
-]
-
-for v in vehiculos:
-    marca = Marca.objects.get(nombre=v['marca'])
-    tipo = TipoVehiculo.objects.get(nombre=v['tipo'])
-    politica = PoliticaReembolso.objects.get(nombre=v['politica_reembolso'])
-    
-    Vehiculo.objects.get_or_create(
-        patente=v['patente'],
-        defaults={
-            'marca': marca,
-            'modelo': v['modelo'],
-            'tipo': tipo,
-            'ano': v['ano'],
-            'capacidad': v['capacidad'],
-            'precio_por_dia': v['precio_por_dia'],  # Actualizado nombre del campo
-            'kilometraje': v['kilometraje'],  # Añadido nuevo campo
-            'politica_reembolso': politica,  # Añadido nuevo campo
-            'descripcion': v['descripcion'],
-            'disponible': True
-        }
-    )
-print("Vehiculos de ejemplo creados")
-
-print("Datos iniciales creados exitosamente")
 
 def main():
     """Run administrative tasks."""
@@ -140,5 +17,6 @@ def main():
         ) from exc
     execute_from_command_line(sys.argv)
 
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class PagosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pagos'
+
+    def ready(self):
+        from django.core.signals import setting_changed
+        from . import pasarela
+        setting_changed.connect(pasarela.reiniciar, dispatch_uid='pagos-pasarela')
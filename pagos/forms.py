@@ -1,7 +1,11 @@
+import uuid
+
 from django import forms
 from .models import Pago
 
 class PagoTarjetaForm(forms.Form):
+    # Se genera al mostrar el formulario: si se envia dos veces, es el mismo pago
+    clave_idempotencia = forms.CharField(max_length=64, required=False, widget=forms.HiddenInput)
     nombre_titular = forms.CharField(
         max_length=100,
         widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Nombre del titular'})
@@ -34,6 +38,11 @@ class PagoTarjetaForm(forms.Form):
         })
     )
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.is_bound:
+            self.initial.setdefault('clave_idempotencia', uuid.uuid4().hex)
+    
     def clean_numero_tarjeta(self):
         numero = self.cleaned_data.get('numero_tarjeta')
         if not numero.isdigit() or len(numero) != 16:
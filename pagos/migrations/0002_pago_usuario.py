@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 18:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def completar_usuarios(apps, schema_editor):
+    """Copia el usuario de la reserva en los pagos existentes."""
+    Pago = apps.get_model('pagos', 'Pago')
+    Reserva = apps.get_model('reservas', 'Reserva')
+    Pago.objects.filter(usuario__isnull=True).update(
+        usuario=Subquery(Reserva.objects.filter(pk=OuterRef('reserva_id')).values('usuario_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagos', '0001_initial'),
+        ('reservas', '0004_reserva_reserva_usuario_listado_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pago',
+            name='usuario',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='pagos', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(completar_usuarios, migrations.RunPython.noop),
+    ]
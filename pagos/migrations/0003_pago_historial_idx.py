@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-18 18:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Separada de 0002: en PostgreSQL no se puede alterar la tabla en la misma
+    # transaccion que actualizo sus filas (quedan eventos de triggers pendientes)
+
+    dependencies = [
+        ('pagos', '0002_pago_usuario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pago',
+            name='usuario',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='pagos', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['usuario', 'fecha_pago', 'id'], name='pago_historial_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 16:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagos', '0003_pago_historial_idx'),
+        ('reservas', '0005_ocupacionvehiculo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IntencionPago',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('monto', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('aprobada', 'Aprobada'), ('rechazada', 'Rechazada'), ('fallida', 'Fallida')], default='pendiente', max_length=20)),
+                ('ultimos_digitos', models.CharField(max_length=4)),
+                ('referencia_pasarela', models.CharField(blank=True, max_length=100, null=True)),
+                ('mensaje', models.CharField(blank=True, max_length=200)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                ('pago', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='intencion', to='pagos.pago')),
+                ('reserva', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='intenciones_pago', to='reservas.reserva')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='intenciones_pago', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Intencion de Pago',
+                'verbose_name_plural': 'Intenciones de Pago',
+                'indexes': [models.Index(fields=['reserva', 'estado'], name='intencion_reserva_estado_idx')],
+            },
+        ),
+    ]
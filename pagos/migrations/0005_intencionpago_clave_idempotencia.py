@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 16:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagos', '0004_intencionpago'),
+        ('reservas', '0005_ocupacionvehiculo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='intencionpago',
+            name='clave_idempotencia',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='intencionpago',
+            constraint=models.UniqueConstraint(fields=('usuario', 'clave_idempotencia'), name='intencion_clave_unica'),
+        ),
+        migrations.AddConstraint(
+            model_name='intencionpago',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado__in', ['pendiente', 'procesando'])), fields=('reserva',), name='intencion_activa_unica'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-18 16:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagos', '0005_intencionpago_clave_idempotencia'),
+        ('reservas', '0007_reservahistorica'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PagoHistorico',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('monto', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('fecha_pago', models.DateTimeField()),
+                ('referencia_pago', models.CharField(blank=True, max_length=100, null=True)),
+                ('comprobante', models.FileField(blank=True, null=True, upload_to='comprobantes/')),
+                ('fecha_archivado', models.DateTimeField()),
+                ('metodo_pago', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='pagos.metodopago')),
+                ('reserva', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='pagos', to='reservas.reservahistorica')),
+                ('usuario', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Pago historico',
+                'verbose_name_plural': 'Pagos historicos',
+                'ordering': ['-fecha_pago'],
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
-from reservas.models import Reserva
+from django.contrib.auth.models import User
+from reservas.models import Reserva, ReservaHistorica
 
 class MetodoPago(models.Model):
     nombre = models.CharField(max_length=50)
@@ -14,16 +15,107 @@ class MetodoPago(models.Model):
 
 class Pago(models.Model):
     reserva = models.ForeignKey(Reserva, on_delete=models.CASCADE, related_name='pagos')
+    # Copia de reserva.usuario: el historial se filtra y ordena con un solo indice, sin JOIN
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='pagos', editable=False)
     metodo_pago = models.ForeignKey(MetodoPago, on_delete=models.CASCADE)
     monto = models.DecimalField(max_digits=10, decimal_places=2)
     fecha_pago = models.DateTimeField(auto_now_add=True)
     referencia_pago = models.CharField(max_length=100, blank=True, null=True)
     comprobante = models.FileField(upload_to='comprobantes/', blank=True, null=True)
     
+    def save(self, *args, **kwargs):
+        if self.usuario_id is None:
+            self.usuario_id = self.reserva.usuario_id
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"Pago de {self.monto} por {self.reserva}"
     
     class Meta:
         verbose_name = "Pago"
         verbose_name_plural = "Pagos"
-        ordering = ['-fecha_pago']
\ No newline at end of file
+        ordering = ['-fecha_pago']
+        indexes = [
+            # Historial del usuario paginado por cursor sobre (fecha_pago, id)
+            models.Index(fields=['usuario', 'fecha_pago', 'id'], name='pago_historial_idx'),
+            # Pagos registrados desde la ultima actualizacion de los resumenes (reportes.resumenes)
+            models.Index(fields=['fecha_pago'], name='pago_fecha_idx'),
+        ]
+
+
+class PagoHistorico(models.Model):
+    """Pago de una reserva archivada (ver reservas.historial): mismas columnas que Pago."""
+    id = models.BigIntegerField(primary_key=True)
+    reserva = models.ForeignKey(ReservaHistorica, on_delete=models.DO_NOTHING, db_constraint=False, related_name='pagos')
+    usuario = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+')
+    metodo_pago = models.ForeignKey(MetodoPago, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+')
+    monto = models.DecimalField(max_digits=10, decimal_places=2)
+    fecha_pago = models.DateTimeField()
+    referencia_pago = models.CharField(max_length=100, blank=True, null=True)
+    comprobante = models.FileField(upload_to='comprobantes/', blank=True, null=True)
+    fecha_archivado = models.DateTimeField()
+
+    def __str__(self):
+        return f"Pago archivado de {self.monto} (reserva {self.reserva_id})"
+
+    class Meta:
+        verbose_name = "Pago historico"
+        verbose_name_plural = "Pagos historicos"
+        ordering = ['-fecha_pago']
+
+
+class IntencionPago(models.Model):
+    """Pago con tarjeta enviado y todavia en manos de la pasarela (ver pagos.procesamiento).
+
+    Los datos de la tarjeta no se guardan: viajan en memoria hasta el hilo
+    que llama a la pasarela. Solo quedan los ultimos cuatro digitos.
+    """
+    PENDIENTE = 'pendiente'
+    PROCESANDO = 'procesando'
+    APROBADA = 'aprobada'
+    RECHAZADA = 'rechazada'
+    FALLIDA = 'fallida'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (PROCESANDO, 'Procesando'),
+        (APROBADA, 'Aprobada'),
+        (RECHAZADA, 'Rechazada'),
+        (FALLIDA, 'Fallida'),
+    ]
+    ACTIVAS = [PENDIENTE, PROCESANDO]
+
+    reserva = models.ForeignKey(Reserva, on_delete=models.CASCADE, related_name='intenciones_pago')
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='intenciones_pago')
+    monto = models.DecimalField(max_digits=10, decimal_places=2)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    ultimos_digitos = models.CharField(max_length=4)
+    # Clave que manda el cliente con cada envio del formulario (o en el header
+    # Idempotency-Key): reenviar el mismo pago devuelve la misma intencion
+    clave_idempotencia = models.CharField(max_length=64, blank=True, null=True)
+    referencia_pasarela = models.CharField(max_length=100, blank=True, null=True)
+    mensaje = models.CharField(max_length=200, blank=True)
+    pago = models.OneToOneField(Pago, on_delete=models.SET_NULL, blank=True, null=True, related_name='intencion')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    @property
+    def finalizada(self):
+        return self.estado not in self.ACTIVAS
+
+    def __str__(self):
+        return f"Intencion de pago {self.pk} ({self.estado}) por {self.reserva_id}"
+
+    class Meta:
+        verbose_name = "Intencion de Pago"
+        verbose_name_plural = "Intenciones de Pago"
+        indexes = [
+            # Intencion en curso de una reserva, para no cobrar dos veces
+            models.Index(fields=['reserva', 'estado'], name='intencion_reserva_estado_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'clave_idempotencia'], name='intencion_clave_unica'),
+            # Dos envios con claves distintas (dos pestañas) tampoco cobran dos veces
+            models.UniqueConstraint(
+                fields=['reserva'], condition=models.Q(estado__in=['pendiente', 'procesando']), name='intencion_activa_unica',
+            ),
+        ]
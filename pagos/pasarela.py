@@ -0,0 +1,67 @@
+"""Pasarela de pagos con tarjeta.
+
+La pasarela en uso se elige con ``PAGOS_PASARELA`` (ruta a la clase) y se
+construye con ``PAGOS_PASARELA_OPCIONES``. Cualquier clase con los metodos
+``cobrar`` y ``anular`` de PasarelaFalsa sirve; ``cobrar`` devuelve un
+Resultado si la pasarela respondio (aprobado o no) y lanza
+PasarelaNoDisponible si no se pudo saber.
+"""
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+Resultado = namedtuple('Resultado', ['aprobado', 'referencia', 'mensaje'])
+
+
+class PasarelaNoDisponible(Exception):
+    """La pasarela no respondio; no se sabe si el cobro se hizo."""
+
+
+class PasarelaFalsa:
+    """Pasarela local para desarrollo, pruebas y benchmarks: no cobra nada.
+
+    Cada operacion demora ``latencia`` segundos, como una llamada de red.
+    Las tarjetas de TARJETAS_RECHAZADAS se rechazan y las de
+    TARJETAS_SIN_RESPUESTA simulan una pasarela caida.
+    """
+    TARJETAS_RECHAZADAS = {'4000000000000002'}
+    TARJETAS_SIN_RESPUESTA = {'4000000000000119'}
+
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+
+    def cobrar(self, monto, referencia, tarjeta):
+        time.sleep(self.latencia)
+        numero = tarjeta['numero_tarjeta']
+        if numero in self.TARJETAS_SIN_RESPUESTA:
+            raise PasarelaNoDisponible("La pasarela no respondio.")
+        if numero in self.TARJETAS_RECHAZADAS:
+            return Resultado(False, None, "La tarjeta fue rechazada por el emisor.")
+        return Resultado(True, f"FALSA-{uuid.uuid4().hex[:16].upper()}", "")
+
+    def anular(self, referencia):
+        time.sleep(self.latencia)
+
+
+_pasarela = None
+_candado = threading.Lock()
+
+
+def obtener():
+    """Pasarela configurada; se construye una vez por proceso."""
+    global _pasarela
+    with _candado:
+        if _pasarela is None:
+            _pasarela = import_string(settings.PAGOS_PASARELA)(**settings.PAGOS_PASARELA_OPCIONES)
+    return _pasarela
+
+
+def reiniciar(**kwargs):
+    """Descarta la pasarela construida (al cambiar la configuracion)."""
+    global _pasarela
+    with _candado:
+        _pasarela = None
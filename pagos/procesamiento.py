@@ -0,0 +1,192 @@
+"""Procesamiento de pagos con tarjeta en segundo plano.
+
+Al enviar el formulario de pago se registra una IntencionPago y se responde
+enseguida con la pagina de estado; la llamada a la pasarela, el alta del
+Pago y la confirmacion de la reserva los hace un hilo del pool, despues de
+confirmarse la transaccion del request. La pagina de estado consulta la
+intencion (por polling o por eventos, ver pagos.views).
+
+Cada envio del formulario lleva una clave de idempotencia, unica por
+usuario, y una reserva no puede tener dos intenciones en curso (ambas cosas
+con restricciones UNIQUE): reenviar o reintentar un pago devuelve la
+intencion existente. Una intencion solo la procesa quien logra pasarla de
+pendiente a procesando con un UPDATE condicional, y el Pago se crea en la
+misma transaccion que la pasa a aprobada y confirma la reserva, de modo que
+procesarla dos veces no cobra ni registra dos veces.
+
+Los datos de la tarjeta no se guardan: si el proceso se reinicia con
+intenciones en curso, las pendientes (nunca llegaron a la pasarela) quedan
+activas hasta VENCIMIENTO y despues se dan por fallidas (ver
+intencion_activa). Las que quedaron en procesando no vencen: no se sabe si
+la pasarela llego a cobrar, y darlas por fallidas permitiria un segundo
+cobro. Siguen bloqueando la reserva hasta que se revisen en la pasarela
+por su referencia (INT-<id>). Todas las transiciones finales son UPDATE
+condicionales desde procesando, asi nada pisa una intencion ya resuelta.
+"""
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from reservas.models import Reserva
+from reservas.referencias import estados
+from . import pasarela
+from .models import IntencionPago, Pago
+from .referencias import metodos_pago
+
+logger = logging.getLogger(__name__)
+
+# Una intencion pendiente mas vieja que esto quedo huerfana (el proceso se reinicio)
+VENCIMIENTO = timedelta(minutes=10)
+
+_ejecutor = None
+_candado = threading.Lock()
+
+
+def intencion_activa(reserva):
+    """Intencion en curso de la reserva, o None. Las pendientes huerfanas se marcan como fallidas."""
+    intencion = reserva.intenciones_pago.filter(estado__in=IntencionPago.ACTIVAS).order_by('-fecha_creacion').first()
+    if intencion is None or intencion.fecha_actualizacion >= timezone.now() - VENCIMIENTO:
+        return intencion
+    if intencion.estado == IntencionPago.PROCESANDO:
+        # No se sabe si la pasarela llego a cobrar: sigue bloqueando hasta revisarla
+        logger.warning("La intencion de pago %s sigue en procesando desde %s", intencion.pk, intencion.fecha_actualizacion)
+        return intencion
+    vencida = IntencionPago.objects.filter(pk=intencion.pk, estado=IntencionPago.PENDIENTE).update(
+        estado=IntencionPago.FALLIDA, mensaje="El procesamiento se interrumpio.", fecha_actualizacion=timezone.now(),
+    )
+    # Si no vencio es porque un hilo la acaba de tomar: se muestra su estado
+    return None if vencida else intencion
+
+
+def _finalizar(intencion_id, estado, **campos):
+    """Pasa la intencion de procesando a ``estado``; no toca una que otra ejecucion ya resolvio."""
+    return IntencionPago.objects.filter(pk=intencion_id, estado=IntencionPago.PROCESANDO).update(
+        estado=estado, fecha_actualizacion=timezone.now(), **campos,
+    )
+
+
+def procesar(intencion_id, tarjeta):
+    """Cobra la intencion en la pasarela y, si se aprueba, registra el pago y confirma la reserva."""
+    tomada = IntencionPago.objects.filter(pk=intencion_id, estado=IntencionPago.PENDIENTE).update(
+        estado=IntencionPago.PROCESANDO, fecha_actualizacion=timezone.now(),
+    )
+    if not tomada:
+        return
+    intencion = IntencionPago.objects.select_related('reserva').get(pk=intencion_id)
+    if intencion.reserva.estado_id != estados.get('Pendiente').pk:
+        _finalizar(intencion_id, IntencionPago.FALLIDA, mensaje="La reserva ya no esta pendiente de pago.")
+        return
+
+    try:
+        # La referencia identifica el cobro: la pasarela la usa como clave de idempotencia
+        resultado = pasarela.obtener().cobrar(intencion.monto, f"INT-{intencion.pk}", tarjeta)
+    except pasarela.PasarelaNoDisponible:
+        logger.warning("La pasarela no respondio para la intencion %s", intencion_id)
+        _finalizar(intencion_id, IntencionPago.FALLIDA, mensaje="No pudimos comunicarnos con la pasarela de pagos.")
+        return
+    if not resultado.aprobado:
+        _finalizar(intencion_id, IntencionPago.RECHAZADA, mensaje=resultado.mensaje)
+        return
+
+    if not registrar_pago(intencion, resultado.referencia):
+        # La reserva cambio mientras se cobraba (se cancelo o vencio): devolver el cobro
+        pasarela.obtener().anular(resultado.referencia)
+        _finalizar(
+            intencion_id, IntencionPago.FALLIDA, referencia_pasarela=resultado.referencia,
+            mensaje="La reserva ya no esta pendiente de pago; el cobro fue anulado.",
+        )
+
+
+def registrar_pago(intencion, referencia):
+    """Registra el Pago aprobado y confirma la reserva, todo en una transaccion.
+
+    Devuelve False si la reserva ya no estaba pendiente. El primer UPDATE toma
+    el bloqueo de la intencion: una segunda ejecucion espera y no encuentra
+    nada que hacer. La reserva pasa a Confirmada con un UPDATE condicional,
+    sin revalidar fechas (ver ReservaQuerySet.cambiar_estado).
+    """
+    with transaction.atomic():
+        aprobada = IntencionPago.objects.filter(pk=intencion.pk, estado=IntencionPago.PROCESANDO).update(
+            estado=IntencionPago.APROBADA, referencia_pasarela=referencia, fecha_actualizacion=timezone.now(),
+        )
+        if not aprobada:
+            return True
+        confirmada = Reserva.objects.filter(pk=intencion.reserva_id).cambiar_estado(
+            estados.get('Confirmada'), desde=[estados.get('Pendiente')],
+        )
+        if not confirmada:
+            transaction.set_rollback(True)
+            return False
+        pago = Pago.objects.create(
+            reserva_id=intencion.reserva_id,
+            usuario_id=intencion.usuario_id,
+            metodo_pago=metodos_pago.get('Tarjeta de Credito/Debito'),
+            monto=intencion.monto,
+            referencia_pago=referencia,
+        )
+        IntencionPago.objects.filter(pk=intencion.pk).update(pago=pago)
+    return True
+
+
+def _procesar_en_hilo(intencion_id, tarjeta):
+    try:
+        procesar(intencion_id, tarjeta)
+    except Exception:
+        logger.exception("Fallo el procesamiento de la intencion de pago %s", intencion_id)
+        _finalizar(intencion_id, IntencionPago.FALLIDA, mensaje="Ocurrio un error al procesar el pago.")
+    finally:
+        # Cada hilo del pool tiene su propia conexion: cerrarla al terminar
+        connection.close()
+
+
+def ejecutor():
+    global _ejecutor
+    with _candado:
+        if _ejecutor is None:
+            _ejecutor = ThreadPoolExecutor(max_workers=settings.PAGOS_HILOS, thread_name_prefix='pagos')
+    return _ejecutor
+
+
+def encolar(reserva, tarjeta, clave_idempotencia):
+    """Registra la intencion de pago de la reserva y programa su procesamiento.
+
+    ``tarjeta`` son los datos validados de PagoTarjetaForm. Devuelve
+    (intencion, creada): si el usuario ya envio un pago con esa clave, o la
+    reserva ya tiene uno en curso, devuelve esa intencion sin encolar nada.
+    El procesamiento arranca cuando se confirma la transaccion; con
+    PAGOS_EN_SEGUNDO_PLANO en False corre en el mismo request (pruebas, o sin
+    pool de hilos). Sin clave (un cliente que no la manda) se usa una nueva.
+    """
+    clave_idempotencia = clave_idempotencia or uuid.uuid4().hex
+    try:
+        with transaction.atomic():
+            intencion = IntencionPago.objects.create(
+                reserva=reserva,
+                usuario_id=reserva.usuario_id,
+                monto=reserva.calcular_total(),
+                ultimos_digitos=tarjeta['numero_tarjeta'][-4:],
+                clave_idempotencia=clave_idempotencia,
+            )
+    except IntegrityError:
+        # Clave ya usada (reenvio) o la reserva ya tiene un pago en curso
+        existente = IntencionPago.objects.filter(
+            Q(usuario_id=reserva.usuario_id, clave_idempotencia=clave_idempotencia)
+            | Q(reserva=reserva, estado__in=IntencionPago.ACTIVAS),
+        ).first()
+        if existente is None:
+            raise
+        return existente, False
+
+    intencion_id = intencion.pk
+    if settings.PAGOS_EN_SEGUNDO_PLANO:
+        transaction.on_commit(lambda: ejecutor().submit(_procesar_en_hilo, intencion_id, tarjeta))
+    else:
+        transaction.on_commit(lambda: procesar(intencion_id, tarjeta))
+    return intencion, True
@@ -0,0 +1,6 @@
+"""Cache en proceso de los metodos de pago (ver reservas.referencias)."""
+from reservas.referencias import CacheReferencia
+
+from .models import MetodoPago
+
+metodos_pago = CacheReferencia(MetodoPago)
@@ -1,3 +1,310 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.db import DatabaseError, IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from alquileres_maria import replicas
+from alquileres_maria.pruebas import DatosReservaMixin, PresupuestoConsultasMixin, plantillas_en_memoria
+from reservas.models import Reserva
+from vehiculos.models import Vehiculo
+from . import procesamiento
+from .forms import PagoTarjetaForm
+from .models import IntencionPago, Pago, MetodoPago
+from .pasarela import PasarelaFalsa, Resultado
+from .views import PAGOS_POR_PAGINA
+
+
+@plantillas_en_memoria({
+    'pagos/historial_pagos.html': (
+        '{% for pago in pagos %}{{ pago }} {{ pago.metodo_pago }} {{ pago.reserva.estado }}{% endfor %}'
+    ),
+})
+class HistorialPagosConsultasTests(DatosReservaMixin, PresupuestoConsultasMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.tarjeta = MetodoPago.objects.create(nombre='Tarjeta de Credito/Debito')
+
+    def agregar_pagos(self, cantidad):
+        hoy = timezone.now().date()
+        for _ in range(cantidad):
+            vehiculo = self.crear_vehiculo(f'AAA{Vehiculo.objects.count():03d}')
+            reserva = Reserva.objects.create(
+                usuario=self.usuario, vehiculo=vehiculo, estado=self.confirmada,
+                fecha_inicio=hoy + timedelta(days=1), fecha_fin=hoy + timedelta(days=2),
+            )
+            Pago.objects.create(reserva=reserva, metodo_pago=self.tarjeta, monto=Decimal('100.00'))
+
+    def test_historial_con_presupuesto_fijo(self):
+        self.client.force_login(self.usuario)
+        self.agregar_pagos(1)
+        # Sesion, usuario y los pagos con sus relaciones
+        self.assertConsultasConstantes(
+            lambda: self.client.get(reverse('pagos:historial')),
+            lambda: self.agregar_pagos(10),
+            limite=3,
+        )
+
+    def test_historial_paginado_por_cursor(self):
+        self.client.force_login(self.usuario)
+        self.agregar_pagos(PAGOS_POR_PAGINA + 5)
+        primera = self.client.get(reverse('pagos:historial')).context['page_obj']
+        segunda = self.client.get(reverse('pagos:historial'), {'cursor': primera.cursor_siguiente}).context['page_obj']
+        self.assertEqual((len(primera), len(segunda)), (PAGOS_POR_PAGINA, 5))
+        self.assertFalse(segunda.has_next())
+        self.assertEqual(
+            [pago.id for pago in [*primera, *segunda]],
+            list(Pago.objects.order_by('-fecha_pago', '-id').values_list('id', flat=True)),
+        )
+
+
+@plantillas_en_memoria({
+    'pagos/procesar_pago.html': '{% load l10n %}{{ monto_total|unlocalize }}',
+    'pagos/estado_pago.html': '{{ estado.descripcion }}',
+})
+@override_settings(PAGOS_PASARELA_OPCIONES={'latencia': 0})
+class ProcesarPagoTests(DatosReservaMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.tarjeta = MetodoPago.objects.create(nombre='Tarjeta de Credito/Debito')
+        hoy = timezone.now().date()
+        cls.reserva = Reserva.objects.create(
+            usuario=cls.usuario,
+            vehiculo=cls.crear_vehiculo(),
+            estado=cls.pendiente,
+            fecha_inicio=hoy + timedelta(days=1),
+            fecha_fin=hoy + timedelta(days=4),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def test_muestra_el_total_congelado(self):
+        respuesta = self.client.get(reverse('pagos:procesar_pago', args=[self.reserva.id]))
+        self.assertEqual(respuesta.content.decode(), '200.00')
+
+    def pagar(self, numero_tarjeta='4111111111111111'):
+        datos = {
+            'nombre_titular': 'Cliente', 'numero_tarjeta': numero_tarjeta,
+            'fecha_vencimiento': '12/99', 'codigo_seguridad': '123',
+        }
+        return self.client.post(reverse('pagos:procesar_pago', args=[self.reserva.id]), datos)
+
+    @override_settings(PAGOS_EN_SEGUNDO_PLANO=False)
+    def test_pago_confirma_la_reserva(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.pagar()
+        intencion = IntencionPago.objects.get()
+        self.assertRedirects(respuesta, reverse('pagos:estado', args=[intencion.id]), fetch_redirect_response=False)
+        pago = Pago.objects.get()
+        self.assertEqual(pago.monto, Decimal('200.00'))
+        self.assertEqual(pago.metodo_pago, self.tarjeta)
+        self.assertEqual((intencion.estado, intencion.pago, intencion.ultimos_digitos), (IntencionPago.APROBADA, pago, '1111'))
+        self.reserva.refresh_from_db()
+        self.assertEqual(self.reserva.estado, self.confirmada)
+        # Con el pago aprobado, la pagina de estado lleva al detalle de la reserva
+        self.assertRedirects(
+            self.client.get(reverse('pagos:estado', args=[intencion.id])),
+            reverse('reservas:detalle', args=[self.reserva.id]), fetch_redirect_response=False,
+        )
+
+    @override_settings(PAGOS_EN_SEGUNDO_PLANO=False)
+    @mock.patch.object(replicas, 'retraso', return_value=0.0)
+    @mock.patch.object(replicas, 'configurada', return_value=True)
+    def test_el_pago_aprobado_fija_al_usuario_a_la_principal(self, *mocks):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pagar()
+        intencion = IntencionPago.objects.get()
+        # El pago lo registro otro proceso: quien ve que termino lee de la principal
+        estado = self.client.get(reverse('pagos:estado_json', args=[intencion.id]))
+        self.assertIn(replicas.COOKIE, estado.cookies)
+        self.assertEqual(estado.json()['siguiente'], reverse('pagos:estado', args=[intencion.id]))
+        self.client.cookies.pop(replicas.COOKIE)
+        self.assertIn(replicas.COOKIE, self.client.get(estado.json()['siguiente']).cookies)
+
+    def test_responde_sin_esperar_a_la_pasarela(self):
+        with mock.patch('pagos.procesamiento.ejecutor') as ejecutor, self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.pagar()
+        intencion = IntencionPago.objects.get()
+        self.assertRedirects(respuesta, reverse('pagos:estado', args=[intencion.id]), fetch_redirect_response=False)
+        ejecutor.return_value.submit.assert_called_once()
+        self.assertEqual(intencion.estado, IntencionPago.PENDIENTE)
+        self.assertFalse(Pago.objects.exists())
+        self.assertEqual(
+            self.client.get(reverse('pagos:estado_json', args=[intencion.id])).json(),
+            {'estado': 'pendiente', 'descripcion': 'Pendiente', 'mensaje': '', 'finalizada': False},
+        )
+
+    def test_doble_envio_no_cobra_dos_veces(self):
+        self.pagar()
+        intencion = IntencionPago.objects.get()
+        respuesta = self.pagar()
+        self.assertRedirects(respuesta, reverse('pagos:estado', args=[intencion.id]), fetch_redirect_response=False)
+        self.assertEqual(IntencionPago.objects.count(), 1)
+
+        tarjeta = {'numero_tarjeta': '4111111111111111'}
+        procesamiento.procesar(intencion.id, tarjeta)
+        procesamiento.procesar(intencion.id, tarjeta)
+        self.assertEqual(Pago.objects.count(), 1)
+
+    @override_settings(PAGOS_EN_SEGUNDO_PLANO=False)
+    def test_tarjeta_rechazada_y_pasarela_caida(self):
+        for numero, estado in [
+            (next(iter(PasarelaFalsa.TARJETAS_RECHAZADAS)), IntencionPago.RECHAZADA),
+            (next(iter(PasarelaFalsa.TARJETAS_SIN_RESPUESTA)), IntencionPago.FALLIDA),
+        ]:
+            with self.assertNoLogs('pagos.procesamiento', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+                self.pagar(numero)
+            intencion = IntencionPago.objects.latest('id')
+            self.assertEqual(intencion.estado, estado)
+            self.assertTrue(intencion.mensaje)
+        self.assertFalse(Pago.objects.exists())
+        self.reserva.refresh_from_db()
+        self.assertEqual(self.reserva.estado, self.pendiente)
+        # Se puede volver a intentar
+        self.assertEqual(self.client.get(reverse('pagos:procesar_pago', args=[self.reserva.id])).status_code, 200)
+
+    def test_reserva_cancelada_mientras_se_cobra(self):
+        self.pagar()
+        intencion = IntencionPago.objects.get()
+
+        def cobrar_y_cancelar(*args):
+            Reserva.objects.filter(pk=self.reserva.pk).update(estado=self.cancelada)
+            return Resultado(True, 'REF-1', '')
+
+        with mock.patch.object(PasarelaFalsa, 'cobrar', side_effect=cobrar_y_cancelar), \
+                mock.patch.object(PasarelaFalsa, 'anular') as anular:
+            procesamiento.procesar(intencion.id, {'numero_tarjeta': '4111111111111111'})
+        anular.assert_called_once_with('REF-1')
+        intencion.refresh_from_db()
+        self.assertEqual(intencion.estado, IntencionPago.FALLIDA)
+        self.assertFalse(Pago.objects.exists())
+
+    def test_solo_vencen_las_pendientes_huerfanas(self):
+        url = reverse('pagos:procesar_pago', args=[self.reserva.id])
+        self.pagar()
+        pendiente = IntencionPago.objects.get()
+        atrasada = timezone.now() - procesamiento.VENCIMIENTO - timedelta(minutes=1)
+        IntencionPago.objects.filter(pk=pendiente.pk).update(fecha_actualizacion=atrasada)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        pendiente.refresh_from_db()
+        self.assertEqual(pendiente.estado, IntencionPago.FALLIDA)
+
+        # En procesando puede haberse cobrado: sigue bloqueando la reserva
+        self.pagar()
+        procesando = IntencionPago.objects.latest('id')
+        IntencionPago.objects.filter(pk=procesando.pk).update(estado=IntencionPago.PROCESANDO, fecha_actualizacion=atrasada)
+        with self.assertLogs('pagos.procesamiento', 'WARNING'):
+            respuesta = self.client.get(url)
+        self.assertRedirects(respuesta, reverse('pagos:estado', args=[procesando.id]), fetch_redirect_response=False)
+        procesando.refresh_from_db()
+        self.assertEqual(procesando.estado, IntencionPago.PROCESANDO)
+
+    def test_un_error_no_pisa_una_intencion_resuelta(self):
+        self.pagar()
+        intencion = IntencionPago.objects.get()
+        IntencionPago.objects.filter(pk=intencion.pk).update(estado=IntencionPago.APROBADA)
+        with mock.patch.object(procesamiento, 'procesar', side_effect=DatabaseError), \
+                mock.patch.object(procesamiento.connection, 'close'), \
+                self.assertLogs('pagos.procesamiento', 'ERROR'):
+            procesamiento._procesar_en_hilo(intencion.id, {'numero_tarjeta': '4111111111111111'})
+        intencion.refresh_from_db()
+        self.assertEqual(intencion.estado, IntencionPago.APROBADA)
+
+    async def test_eventos_hasta_finalizar(self):
+        await self.client.aforce_login(self.usuario)
+        intencion = await IntencionPago.objects.acreate(
+            reserva=self.reserva, usuario=self.usuario, monto=Decimal('200.00'), ultimos_digitos='1111',
+            estado=IntencionPago.RECHAZADA, mensaje='Rechazada',
+        )
+        self.async_client.cookies = self.client.cookies
+        respuesta = await self.async_client.get(reverse('pagos:eventos', args=[intencion.id]))
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+        contenido = b''.join([parte async for parte in respuesta.streaming_content]).decode()
+        self.assertEqual(contenido.count('data: '), 1)
+        self.assertEqual(json.loads(contenido.removeprefix('data: '))['estado'], IntencionPago.RECHAZADA)
+
+
+@plantillas_en_memoria({'pagos/estado_pago.html': '{{ estado.descripcion }}'})
+@override_settings(PAGOS_PASARELA_OPCIONES={'latencia': 0}, PAGOS_EN_SEGUNDO_PLANO=False)
+class IdempotenciaPagoTests(DatosReservaMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.tarjeta = MetodoPago.objects.create(nombre='Tarjeta de Credito/Debito')
+        hoy = timezone.now().date()
+        cls.reserva = Reserva.objects.create(
+            usuario=cls.usuario,
+            vehiculo=cls.crear_vehiculo(),
+            estado=cls.pendiente,
+            fecha_inicio=hoy + timedelta(days=1),
+            fecha_fin=hoy + timedelta(days=4),
+        )
+        cls.datos = {
+            'nombre_titular': 'Cliente', 'numero_tarjeta': '4111111111111111',
+            'fecha_vencimiento': '12/99', 'codigo_seguridad': '123',
+        }
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        self.url = reverse('pagos:procesar_pago', args=[self.reserva.id])
+
+    def test_reenvio_con_la_misma_clave_despues_de_aprobado(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            primera = self.client.post(self.url, {**self.datos, 'clave_idempotencia': 'envio-1'})
+        # La reserva ya esta confirmada: el reenvio no vuelve a validar ni a cobrar
+        with self.captureOnCommitCallbacks(execute=True):
+            segunda = self.client.post(self.url, {**self.datos, 'clave_idempotencia': 'envio-1'})
+        self.assertEqual(primera['Location'], segunda['Location'])
+        self.assertEqual((IntencionPago.objects.count(), Pago.objects.count()), (1, 1))
+
+    def test_clave_en_el_header(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, self.datos, HTTP_IDEMPOTENCY_KEY='api-1')
+            respuesta = self.client.post(self.url, self.datos, HTTP_IDEMPOTENCY_KEY='api-1')
+        intencion = IntencionPago.objects.get()
+        self.assertEqual(intencion.clave_idempotencia, 'api-1')
+        self.assertRedirects(respuesta, reverse('pagos:estado', args=[intencion.id]), fetch_redirect_response=False)
+
+    def test_formulario_trae_una_clave_nueva(self):
+        primera, segunda = PagoTarjetaForm(), PagoTarjetaForm()
+        self.assertTrue(primera.initial['clave_idempotencia'])
+        self.assertNotEqual(primera.initial['clave_idempotencia'], segunda.initial['clave_idempotencia'])
+
+    def test_restricciones_unicas(self):
+        campos = {'reserva': self.reserva, 'usuario': self.usuario, 'monto': Decimal('200.00'), 'ultimos_digitos': '1111'}
+        IntencionPago.objects.create(**campos, clave_idempotencia='a')
+        # Misma clave del mismo usuario, o una segunda intencion en curso de la reserva
+        for extra in [{'clave_idempotencia': 'a', 'estado': IntencionPago.RECHAZADA}, {'clave_idempotencia': 'b'}]:
+            with self.subTest(**extra), self.assertRaises(IntegrityError), transaction.atomic():
+                IntencionPago.objects.create(**{**campos, **extra})
+        IntencionPago.objects.create(**campos, clave_idempotencia='c', estado=IntencionPago.RECHAZADA)
+
+    def test_confirmacion_sin_revalidar_y_atomica(self):
+        intencion = IntencionPago.objects.create(
+            reserva=self.reserva, usuario=self.usuario, monto=Decimal('200.00'), ultimos_digitos='1111',
+            estado=IntencionPago.PROCESANDO,
+        )
+        # Si falla el alta del pago no queda nada a medias
+        with mock.patch.object(Pago.objects, 'create', side_effect=DatabaseError), self.assertRaises(DatabaseError):
+            procesamiento.registrar_pago(intencion, 'REF-1')
+        self.reserva.refresh_from_db()
+        intencion.refresh_from_db()
+        self.assertEqual((self.reserva.estado, intencion.estado), (self.pendiente, IntencionPago.PROCESANDO))
+
+        # Intencion, reserva (lectura y UPDATE condicional), pago e intencion otra vez,
+        # mas SAVEPOINT/RELEASE: ninguna consulta de superposicion
+        with self.assertNumQueries(7):
+            self.assertTrue(procesamiento.registrar_pago(intencion, 'REF-1'))
+        self.reserva.refresh_from_db()
+        self.assertEqual(self.reserva.estado, self.confirmada)
+        self.assertEqual(IntencionPago.objects.get().pago, Pago.objects.get(referencia_pago='REF-1'))
+        # Repetirlo no registra otro pago
+        self.assertTrue(procesamiento.registrar_pago(intencion, 'REF-1'))
+        self.assertEqual(Pago.objects.count(), 1)
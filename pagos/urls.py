@@ -6,4 +6,7 @@ app_name = 'pagos'
 urlpatterns = [
     path('procesar/<int:reserva_id>/', views.procesar_pago, name='procesar_pago'),
     path('historial/', views.historial_pagos, name='historial'),
-]
\ No newline at end of file
+    path('estado/<int:intencion_id>/', views.estado_pago, name='estado'),
+    path('estado/<int:intencion_id>/json/', views.estado_pago_json, name='estado_json'),
+    path('estado/<int:intencion_id>/eventos/', views.eventos_pago, name='eventos'),
+]
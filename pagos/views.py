@@ -1,46 +1,58 @@
-from django.shortcuts import render, redirect, get_object_or_404
+import asyncio
+import json
+
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from .forms import PagoTarjetaForm
-from .models import Pago, MetodoPago
-from reservas.models import Reserva, EstadoReserva
+from .models import IntencionPago, Pago
+from . import procesamiento
+from reservas.models import Reserva
+from reservas.referencias import estados
+from reservas.views import CAMPOS_LISTADO_RESERVA
+from alquileres_maria.paginacion import PaginadorCursor, CursorInvalido
+from alquileres_maria.replicas import recordar_escritura, solo_lectura
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.urls import reverse
 
+PAGOS_POR_PAGINA = 20
+# Eventos de estado de un pago: cada cuanto se consulta y hasta cuando (segundos)
+INTERVALO_EVENTOS = 0.5
+DURACION_EVENTOS = 60
+# Orden del historial, sobre el indice pago_historial_idx (usuario, fecha_pago, id)
+ORDEN_HISTORIAL = ['-fecha_pago', '-id']
+
 @login_required
 def procesar_pago(request, reserva_id):
     reserva = get_object_or_404(Reserva, id=reserva_id, usuario=request.user)
     
+    # Reenvio de un pago ya registrado (doble clic, reintento del navegador o de
+    # un cliente con Idempotency-Key): mostrar su estado, aunque ya se haya aprobado
+    if request.method == 'POST':
+        clave = request.headers.get('Idempotency-Key') or request.POST.get('clave_idempotencia')
+        repetida = clave and IntencionPago.objects.filter(usuario=request.user, clave_idempotencia=clave).first()
+        if repetida:
+            return redirect('pagos:estado', intencion_id=repetida.id)
+    
     # Verificar que la reserva este pendiente de pago
-    if reserva.estado.nombre != 'Pendiente':
+    if reserva.estado_id != estados.get('Pendiente').id:
         messages.error(request, "Esta reserva no esta pendiente de pago.")
         return redirect('reservas:detalle', pk=reserva.id)
     
     # Calcular el monto total
     monto_total = reserva.calcular_total()
     
+    # Un pago ya en curso (doble envio, recarga): mostrar su estado en lugar de cobrar de nuevo
+    intencion = procesamiento.intencion_activa(reserva)
+    if intencion is not None:
+        return redirect('pagos:estado', intencion_id=intencion.id)
+    
     if request.method == 'POST':
         form = PagoTarjetaForm(request.POST)
         if form.is_valid():
-            # Simular procesamiento de pago
-            # En un entorno real, aqui se integraria con un gateway de pagos
-            
-            # Registrar el pago
-            metodo_pago = MetodoPago.objects.get(nombre='Tarjeta de Credito/Debito')
-            pago = Pago(
-                reserva=reserva,
-                metodo_pago=metodo_pago,
-                monto=monto_total,
-                referencia_pago=f"REF-{reserva.id}-{request.user.id}"
-            )
-            pago.save()
-            
-            # Actualizar estado de la reserva
-            estado_confirmada = EstadoReserva.objects.get(nombre='Confirmada')
-            reserva.estado = estado_confirmada
-            reserva.save()
-            
-            messages.success(request, "Pago procesado exitosamente. Su reserva ha sido confirmada.")
-            return redirect('reservas:detalle', pk=reserva.id)
+            # El cobro lo hace la pasarela en segundo plano (pagos.procesamiento)
+            intencion, _ = procesamiento.encolar(reserva, form.cleaned_data, clave)
+            return redirect('pagos:estado', intencion_id=intencion.id)
     else:
         form = PagoTarjetaForm()
     
@@ -50,11 +62,95 @@ def procesar_pago(request, reserva_id):
         'monto_total': monto_total
     })
 
+def pagos_del_usuario(usuario):
+    """Pagos del usuario junto con la reserva que describen."""
+    return (
+        Pago.objects.filter(usuario=usuario)
+        .select_related('metodo_pago', 'reserva__vehiculo__marca', 'reserva__estado', 'reserva__usuario')
+        .only(
+            'monto', 'fecha_pago', 'referencia_pago', 'metodo_pago__nombre',
+            *(f'reserva__{campo}' for campo in CAMPOS_LISTADO_RESERVA),
+        )
+    )
+
+@solo_lectura
 @login_required
 def historial_pagos(request):
-    # Obtener todos los pagos del usuario
-    pagos = Pago.objects.filter(reserva__usuario=request.user).order_by('-fecha_pago')
+    # De a una pagina por cursor, del pago mas reciente al mas antiguo
+    paginador = PaginadorCursor(pagos_del_usuario(request.user), PAGOS_POR_PAGINA, ORDEN_HISTORIAL)
+    try:
+        pagina = paginador.pagina(request.GET.get('cursor'))
+    except CursorInvalido:
+        raise Http404("Cursor de paginacion invalido.")
     
     return render(request, 'pagos/historial_pagos.html', {
-        'pagos': pagos
-    })
\ No newline at end of file
+        'pagos': pagina,
+        'page_obj': pagina,
+    })
+
+def estado_publico(intencion):
+    """Lo que ve el cliente del estado de una intencion de pago."""
+    datos = {
+        'estado': intencion.estado,
+        'descripcion': intencion.get_estado_display(),
+        'mensaje': intencion.mensaje,
+        'finalizada': intencion.finalizada,
+    }
+    if intencion.estado == IntencionPago.APROBADA:
+        # Pasa por estado_pago, que fija al usuario a la principal antes de ir a la reserva
+        datos['siguiente'] = reverse('pagos:estado', args=[intencion.pk])
+    elif intencion.finalizada:
+        datos['siguiente'] = reverse('pagos:procesar_pago', args=[intencion.reserva_id])
+    return datos
+
+@login_required
+def estado_pago(request, intencion_id):
+    intencion = get_object_or_404(IntencionPago, id=intencion_id, usuario=request.user)
+    if intencion.estado == IntencionPago.APROBADA:
+        # El Pago y la reserva confirmada los escribio el proceso de pagos: que el
+        # historial y el listado de reservas no se lean de una replica atrasada
+        recordar_escritura(request)
+        messages.success(request, "Pago procesado exitosamente. Su reserva ha sido confirmada.")
+        return redirect('reservas:detalle', pk=intencion.reserva_id)
+    return render(request, 'pagos/estado_pago.html', {
+        'intencion': intencion,
+        'estado': estado_publico(intencion),
+    })
+
+@login_required
+def estado_pago_json(request, intencion_id):
+    """Estado de la intencion para el polling de la pagina de estado."""
+    intencion = get_object_or_404(IntencionPago, id=intencion_id, usuario=request.user)
+    if intencion.finalizada:
+        recordar_escritura(request)
+    return JsonResponse(estado_publico(intencion), headers={'Cache-Control': 'no-store'})
+
+@login_required
+async def eventos_pago(request, intencion_id):
+    """Server-sent events con cada cambio de estado de la intencion, hasta que finaliza.
+
+    Vista asincronica: con el servidor ASGI (alquileres_maria.asgi) la espera
+    entre consultas no ocupa un hilo.
+    """
+    usuario = await request.auser()
+    intencion = await aget_object_or_404(IntencionPago, id=intencion_id, usuario=usuario)
+
+    async def eventos():
+        anterior = None
+        limite = asyncio.get_running_loop().time() + DURACION_EVENTOS
+        actual = intencion
+        while True:
+            datos = estado_publico(actual)
+            if datos != anterior:
+                yield f"data: {json.dumps(datos)}\n\n"
+                anterior = datos
+            if actual.finalizada or asyncio.get_running_loop().time() >= limite:
+                return
+            await asyncio.sleep(INTERVALO_EVENTOS)
+            actual = await IntencionPago.objects.only('estado', 'mensaje', 'reserva_id').aget(pk=intencion_id)
+
+    return StreamingHttpResponse(eventos(), content_type='text/event-stream', headers={
+        'Cache-Control': 'no-store',
+        # Que un proxy (nginx) no acumule los eventos
+        'X-Accel-Buffering': 'no',
+    })
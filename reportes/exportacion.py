@@ -0,0 +1,124 @@
+"""Exportacion en streaming de reservas y pagos (CSV o JSON Lines).
+
+Las filas se leen con ``.iterator(chunk_size=...)`` y se escriben a medida
+que se generan, opcionalmente comprimidas con gzip, de modo que la memoria
+usada no depende de la cantidad de filas exportadas. La usan el comando
+``exportar_datos`` y la vista de exportacion del staff. Incluyen las
+reservas y pagos archivados por reservas.historial.
+"""
+import csv
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from pagos.models import Pago, PagoHistorico
+from reservas.models import Reserva, ReservaHistorica
+from reservas.referencias import estados
+
+TAMANO_LOTE = 2000
+
+# Columnas exportadas por modelo: encabezado -> campo de values_list
+COLUMNAS = {
+    'reservas': {
+        'id': 'id',
+        'usuario': 'usuario__username',
+        'patente': 'vehiculo__patente',
+        'fecha_inicio': 'fecha_inicio',
+        'fecha_fin': 'fecha_fin',
+        'estado': 'estado__nombre',
+        'precio_por_dia': 'precio_por_dia',
+        'total': 'total',
+        'fecha_creacion': 'fecha_creacion',
+    },
+    'pagos': {
+        'id': 'id',
+        'reserva': 'reserva_id',
+        'usuario': 'reserva__usuario__username',
+        'patente': 'reserva__vehiculo__patente',
+        'metodo_pago': 'metodo_pago__nombre',
+        'monto': 'monto',
+        'fecha_pago': 'fecha_pago',
+        'referencia_pago': 'referencia_pago',
+    },
+}
+
+FORMATOS = ['csv', 'jsonl']
+
+
+def _filtrar(modelo, queryset, desde=None, hasta=None, estado=None):
+    if modelo == 'reservas':
+        if desde:
+            queryset = queryset.filter(fecha_inicio__gte=desde)
+        if hasta:
+            queryset = queryset.filter(fecha_inicio__lte=hasta)
+        if estado:
+            queryset = queryset.filter(estado=estados.get(estado))
+    else:
+        if desde:
+            queryset = queryset.filter(fecha_pago__date__gte=desde)
+        if hasta:
+            queryset = queryset.filter(fecha_pago__date__lte=hasta)
+        if estado:
+            queryset = queryset.filter(reserva__estado=estados.get(estado))
+    return queryset.order_by().values_list(*COLUMNAS[modelo].values())
+
+
+def consulta(modelo, **filtros):
+    """Filas a exportar, vigentes y archivadas (reservas.historial), filtradas por fechas y estado de la reserva."""
+    vigente, archivado = (Reserva, ReservaHistorica) if modelo == 'reservas' else (Pago, PagoHistorico)
+    filas = _filtrar(modelo, vigente.objects.all(), **filtros).union(
+        _filtrar(modelo, archivado.objects.all(), **filtros), all=True,
+    )
+    # Orden por clave primaria: estable, y las archivadas conservan el id que tenian
+    return filas.order_by('id')
+
+
+class _Eco:
+    """Destino de csv.writer que devuelve lo escrito en lugar de guardarlo."""
+
+    def write(self, valor):
+        return valor
+
+
+def lineas_csv(modelo, filas):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(COLUMNAS[modelo].keys())
+    for fila in filas:
+        yield escritor.writerow(fila)
+
+
+def lineas_jsonl(modelo, filas):
+    encabezados = list(COLUMNAS[modelo].keys())
+    for fila in filas:
+        yield json.dumps(dict(zip(encabezados, fila)), cls=DjangoJSONEncoder) + '\n'
+
+
+def agrupar(fragmentos, tamano=64 * 1024):
+    """Junta fragmentos chicos en bloques de ``tamano`` bytes para escribir menos veces."""
+    bloque = bytearray()
+    for fragmento in fragmentos:
+        bloque += fragmento
+        if len(bloque) >= tamano:
+            yield bytes(bloque)
+            bloque.clear()
+    if bloque:
+        yield bytes(bloque)
+
+
+def comprimir(fragmentos):
+    """Comprime un iterable de bytes en formato gzip a medida que se consume."""
+    compresor = zlib.compressobj(wbits=31)
+    for fragmento in fragmentos:
+        comprimido = compresor.compress(fragmento)
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
+
+
+def exportar(modelo, formato='csv', comprimido=False, tamano_lote=TAMANO_LOTE, **filtros):
+    """Genera el contenido de la exportacion como fragmentos de bytes."""
+    filas = consulta(modelo, **filtros).iterator(chunk_size=tamano_lote)
+    lineas = lineas_csv(modelo, filas) if formato == 'csv' else lineas_jsonl(modelo, filas)
+    fragmentos = agrupar(linea.encode('utf-8') for linea in lineas)
+    return comprimir(fragmentos) if comprimido else fragmentos
@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+from django import forms
+from django.utils import timezone
+
+from .exportacion import FORMATOS
+
+class TableroForm(forms.Form):
+    """Periodo y agrupacion del tablero de reportes."""
+    AGRUPACIONES = [
+        ('mes', 'Mes'),
+        ('vehiculo', 'Vehiculo'),
+        ('marca', 'Marca'),
+        ('tipo', 'Tipo de vehiculo'),
+    ]
+    
+    desde = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+    hasta = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+    agrupacion = forms.ChoiceField(
+        choices=AGRUPACIONES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        # Por defecto, los ultimos 30 dias agrupados por mes
+        hoy = timezone.localdate()
+        cleaned_data['hasta'] = cleaned_data.get('hasta') or hoy
+        cleaned_data['desde'] = cleaned_data.get('desde') or cleaned_data['hasta'] - timedelta(days=29)
+        cleaned_data['agrupacion'] = cleaned_data.get('agrupacion') or 'mes'
+        
+        if cleaned_data['hasta'] < cleaned_data['desde']:
+            self.add_error('hasta', "La fecha final debe ser posterior a la fecha inicial.")
+        
+        return cleaned_data
+
+
+class ExportacionForm(forms.Form):
+    """Filtros de la exportacion de reservas y pagos."""
+    desde = forms.DateField(required=False)
+    hasta = forms.DateField(required=False)
+    estado = forms.CharField(required=False, max_length=50)
+    formato = forms.ChoiceField(choices=[(formato, formato) for formato in FORMATOS], required=False)
+    gzip = forms.BooleanField(required=False)
+    
+    def clean_estado(self):
+        from reservas.models import EstadoReserva
+        from reservas.referencias import estados
+        estado = self.cleaned_data.get('estado')
+        if estado:
+            try:
+                estados.get(estado)
+            except EstadoReserva.DoesNotExist:
+                raise forms.ValidationError("Estado de reserva inexistente.")
+        return estado
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        cleaned_data['formato'] = cleaned_data.get('formato') or 'csv'
+        desde, hasta = cleaned_data.get('desde'), cleaned_data.get('hasta')
+        if desde and hasta and hasta < desde:
+            self.add_error('hasta', "La fecha final debe ser posterior a la fecha inicial.")
+        return cleaned_data
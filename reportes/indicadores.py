@@ -0,0 +1,64 @@
+"""Indicadores del tablero: ingresos, ocupacion y duracion media de las reservas.
+
+Todo se agrega en la base sobre ResumenDiario, por lo que el costo depende
+del periodo consultado y no del historial acumulado.
+"""
+import calendar
+from datetime import date
+
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from vehiculos.models import Vehiculo
+from .models import ResumenDiario
+
+# Criterios de agrupacion disponibles: expresion sobre ResumenDiario y campo de Vehiculo
+AGRUPACIONES = {
+    'vehiculo': (F('vehiculo__patente'), 'patente'),
+    'marca': (F('vehiculo__marca__nombre'), 'marca__nombre'),
+    'tipo': (F('vehiculo__tipo__nombre'), 'tipo__nombre'),
+    'mes': (TruncMonth('fecha'), None),
+}
+
+
+def dias_de_flota(agrupacion, desde, hasta):
+    """Dias-vehiculo disponibles por grupo en el periodo (denominador de la ocupacion)."""
+    dias = (hasta - desde).days + 1
+    _, campo_vehiculo = AGRUPACIONES[agrupacion]
+    if campo_vehiculo:
+        vehiculos = Vehiculo.objects.values_list(campo_vehiculo).annotate(cantidad=Count('id')).order_by()
+        return {grupo: cantidad * dias for grupo, cantidad in vehiculos}
+
+    flota = Vehiculo.objects.count()
+    capacidad = {}
+    mes = date(desde.year, desde.month, 1)
+    while mes <= hasta:
+        fin_mes = date(mes.year, mes.month, calendar.monthrange(mes.year, mes.month)[1])
+        capacidad[mes] = ((min(fin_mes, hasta) - max(mes, desde)).days + 1) * flota
+        mes = date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+    return capacidad
+
+
+def indicadores(agrupacion, desde, hasta):
+    """Indicadores del periodo [desde, hasta] agrupados por vehiculo, marca, tipo o mes."""
+    expresion, _ = AGRUPACIONES[agrupacion]
+    filas = list(
+        ResumenDiario.objects.filter(fecha__range=(desde, hasta))
+        .values(grupo=expresion)
+        .annotate(
+            ingresos=Sum('ingresos'),
+            dias_ocupados=Sum('dias_ocupados'),
+            reservas=Sum('reservas_iniciadas'),
+            dias_reservados=Sum('dias_reservados'),
+        )
+        .order_by('grupo')
+    )
+    capacidad = dias_de_flota(agrupacion, desde, hasta)
+    total_ingresos = sum(fila['ingresos'] for fila in filas)
+
+    for fila in filas:
+        dias_disponibles = capacidad.get(fila['grupo'], 0)
+        fila['ocupacion'] = fila['dias_ocupados'] / dias_disponibles if dias_disponibles else 0
+        fila['duracion_media'] = fila['dias_reservados'] / fila['reservas'] if fila['reservas'] else 0
+        fila['participacion'] = float(fila['ingresos'] / total_ingresos) if total_ingresos else 0
+    return filas
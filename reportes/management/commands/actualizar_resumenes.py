@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from reportes import resumenes
+
+
+class Command(BaseCommand):
+    help = "Actualiza los resumenes diarios de ingresos y ocupacion que usa el tablero de reportes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--completo',
+            action='store_true',
+            help="Reconstruye todos los resumenes en lugar de solo los dias modificados.",
+        )
+
+    def handle(self, *args, **options):
+        dias = resumenes.actualizar(completo=options['completo'])
+        self.stdout.write(self.style.SUCCESS(f"Resumenes actualizados: {dias} dias recalculados."))
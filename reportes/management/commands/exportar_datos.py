@@ -0,0 +1,55 @@
+import argparse
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reportes import exportacion
+from reservas.models import EstadoReserva
+from reservas.referencias import estados
+
+
+def fecha(valor):
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Fecha invalida: {valor!r} (AAAA-MM-DD).") from None
+
+
+class Command(BaseCommand):
+    help = "Exporta reservas o pagos en CSV o JSON Lines sin cargar todas las filas en memoria."
+
+    def add_arguments(self, parser):
+        parser.add_argument('modelo', choices=list(exportacion.COLUMNAS))
+        parser.add_argument('--formato', choices=exportacion.FORMATOS, default='csv')
+        parser.add_argument('--desde', type=fecha, help="Fecha inicial (AAAA-MM-DD)")
+        parser.add_argument('--hasta', type=fecha, help="Fecha final (AAAA-MM-DD)")
+        parser.add_argument('--estado', help="Nombre del estado de la reserva")
+        parser.add_argument('--gzip', action='store_true', help="Comprime la salida con gzip")
+        parser.add_argument('--salida', help="Archivo de salida (por defecto, la salida estandar)")
+        parser.add_argument('--lote', type=int, default=exportacion.TAMANO_LOTE, help="Filas leidas por consulta")
+
+    def handle(self, *args, **options):
+        if options['estado']:
+            try:
+                estados.get(options['estado'])
+            except EstadoReserva.DoesNotExist as exc:
+                raise CommandError(str(exc))
+
+        contenido = exportacion.exportar(
+            options['modelo'],
+            formato=options['formato'],
+            comprimido=options['gzip'],
+            tamano_lote=options['lote'],
+            desde=options['desde'],
+            hasta=options['hasta'],
+            estado=options['estado'],
+        )
+        if options['salida']:
+            with open(options['salida'], 'wb') as archivo:
+                for fragmento in contenido:
+                    archivo.write(fragmento)
+        else:
+            for fragmento in contenido:
+                sys.stdout.buffer.write(fragmento)
+            sys.stdout.buffer.flush()
@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-18 16:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('vehiculos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActualizacionResumen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ultima', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Actualizacion de Resumenes',
+                'verbose_name_plural': 'Actualizaciones de Resumenes',
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('dias_ocupados', models.PositiveSmallIntegerField(default=0, help_text='1 si el vehiculo estuvo alquilado ese dia')),
+                ('reservas_iniciadas', models.PositiveIntegerField(default=0)),
+                ('dias_reservados', models.PositiveIntegerField(default=0, help_text='Duracion total de las reservas iniciadas ese dia')),
+                ('vehiculo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='vehiculos.vehiculo')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario',
+                'verbose_name_plural': 'Resumenes Diarios',
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'vehiculo'), name='resumen_diario_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-18 17:31
+
+from django.db import migrations, models
+
+# Los de alquileres_maria.metricas.CONTADORES al crear la tabla; los que se
+# agreguen despues crean su fila la primera vez que se incrementan
+CONTADORES = ['reservas_vencidas', 'reservas_completadas', 'reservas_archivadas', 'vehiculos_disponibilidad_corregida']
+
+
+def crear_contadores(apps, schema_editor):
+    """Crea las filas de los contadores en 0: cada incremento es entonces un solo UPDATE."""
+    Contador = apps.get_model('reportes', 'Contador')
+    Contador.objects.bulk_create([Contador(nombre=nombre) for nombre in CONTADORES], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Contador',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True)),
+                ('valor', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Contador',
+                'verbose_name_plural': 'Contadores',
+            },
+        ),
+        migrations.RunPython(crear_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+from django.db import models
+from vehiculos.models import Vehiculo
+
+class ResumenDiario(models.Model):
+    """Actividad de un vehiculo en un dia, preagregada para el tablero de reportes.
+    
+    Solo existen filas para los dias con actividad (ingresos u ocupacion).
+    """
+    fecha = models.DateField()
+    vehiculo = models.ForeignKey(Vehiculo, on_delete=models.CASCADE, related_name='resumenes_diarios')
+    ingresos = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    dias_ocupados = models.PositiveSmallIntegerField(default=0, help_text="1 si el vehiculo estuvo alquilado ese dia")
+    reservas_iniciadas = models.PositiveIntegerField(default=0)
+    dias_reservados = models.PositiveIntegerField(default=0, help_text="Duracion total de las reservas iniciadas ese dia")
+    
+    def __str__(self):
+        return f"Resumen de {self.vehiculo_id} el {self.fecha}"
+    
+    class Meta:
+        verbose_name = "Resumen Diario"
+        verbose_name_plural = "Resumenes Diarios"
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'vehiculo'], name='resumen_diario_unico'),
+        ]
+
+class ActualizacionResumen(models.Model):
+    """Marca de agua de la ultima actualizacion incremental de los resumenes (fila unica)."""
+    ultima = models.DateTimeField()
+    
+    def __str__(self):
+        return f"Resumenes actualizados al {self.ultima}"
+    
+    class Meta:
+        verbose_name = "Actualizacion de Resumenes"
+        verbose_name_plural = "Actualizaciones de Resumenes"
+
+class Contador(models.Model):
+    """Valor acumulado de un contador de alquileres_maria.metricas, compartido por todos los procesos."""
+    nombre = models.CharField(max_length=100, unique=True)
+    valor = models.PositiveBigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.nombre}: {self.valor}"
+    
+    class Meta:
+        verbose_name = "Contador"
+        verbose_name_plural = "Contadores"
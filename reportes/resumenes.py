@@ -0,0 +1,123 @@
+"""Actualizacion incremental de los resumenes diarios.
+
+El tablero de reportes nunca recorre Pago ni Reserva: lee ResumenDiario, que
+se recalcula solo para los dias tocados por reservas o pagos modificados
+desde la ultima actualizacion (marca de agua en ActualizacionResumen).
+Los recalculos suman tambien las reservas y pagos archivados
+(reservas.historial), asi una reconstruccion completa no pierde los
+periodos ya archivados.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from pagos.models import Pago, PagoHistorico
+from reservas.models import Reserva, ReservaHistorica
+from reservas.referencias import estados
+from .models import ResumenDiario, ActualizacionResumen
+
+# Estados de las reservas que ocupan el vehiculo a efectos de los reportes
+ESTADOS_FACTURADOS = ['Confirmada', 'Completada']
+
+
+def rangos_contiguos(dias):
+    """Agrupa un conjunto de fechas en rangos (desde, hasta) consecutivos."""
+    rango = None
+    for dia in sorted(dias):
+        if rango and dia == rango[1] + timedelta(days=1):
+            rango[1] = dia
+        else:
+            if rango:
+                yield tuple(rango)
+            rango = [dia, dia]
+    if rango:
+        yield tuple(rango)
+
+
+def dias_modificados(desde_momento):
+    """Dias afectados por reservas o pagos modificados despues de ``desde_momento``."""
+    dias = set()
+    reservas = Reserva.objects.filter(fecha_actualizacion__gt=desde_momento).values_list('fecha_inicio', 'fecha_fin')
+    for inicio, fin in reservas.order_by().iterator():
+        dias.update(inicio + timedelta(days=n) for n in range((fin - inicio).days + 1))
+    pagos = Pago.objects.filter(fecha_pago__gt=desde_momento).values_list('fecha_pago', flat=True)
+    for fecha_pago in pagos.order_by().iterator():
+        dias.add(timezone.localdate(fecha_pago))
+    return dias
+
+
+@transaction.atomic
+def recalcular(desde, hasta):
+    """Reconstruye los resumenes de los dias [desde, hasta]. Devuelve las filas generadas."""
+    ResumenDiario.objects.filter(fecha__range=(desde, hasta)).delete()
+    filas = {}
+
+    def fila(fecha, vehiculo_id):
+        return filas.setdefault((fecha, vehiculo_id), ResumenDiario(fecha=fecha, vehiculo_id=vehiculo_id))
+
+    # Ingresos: los pagos del periodo sumados por dia y vehiculo en la base
+    for modelo in (Pago, PagoHistorico):
+        ingresos = (
+            modelo.objects.filter(fecha_pago__date__range=(desde, hasta))
+            .annotate(dia=TruncDate('fecha_pago'))
+            .values('dia', 'reserva__vehiculo_id')
+            .annotate(total=Sum('monto'))
+            .order_by()
+        )
+        for ingreso in ingresos:
+            fila(ingreso['dia'], ingreso['reserva__vehiculo_id']).ingresos += ingreso['total']
+
+    # Ocupacion: solo las reservas facturadas que pisan el periodo
+    for modelo in (Reserva, ReservaHistorica):
+        reservas = modelo.objects.filter(
+            estado_id__in=estados.ids(ESTADOS_FACTURADOS),
+            fecha_inicio__lte=hasta,
+            fecha_fin__gte=desde,
+        ).values_list('vehiculo_id', 'fecha_inicio', 'fecha_fin').order_by()
+        for vehiculo_id, inicio, fin in reservas.iterator():
+            dia = max(inicio, desde)
+            while dia <= min(fin, hasta):
+                fila(dia, vehiculo_id).dias_ocupados = 1
+                dia += timedelta(days=1)
+            if inicio >= desde:
+                resumen = fila(inicio, vehiculo_id)
+                resumen.reservas_iniciadas += 1
+                resumen.dias_reservados += (fin - inicio).days + 1
+
+    ResumenDiario.objects.bulk_create(filas.values(), batch_size=1000)
+    return len(filas)
+
+
+def actualizar(completo=False):
+    """Actualiza los resumenes y devuelve la cantidad de dias recalculados.
+
+    Sin ``completo`` solo recalcula los dias modificados desde la ultima
+    actualizacion; la primera vez (o con ``completo``) reconstruye todo.
+    Las reservas borradas solo se reflejan con una reconstruccion completa.
+    """
+    ahora = timezone.now()
+    control = ActualizacionResumen.objects.first()
+
+    if completo or control is None:
+        extremos = []
+        for modelo in (Reserva, ReservaHistorica):
+            limites = modelo.objects.aggregate(desde=Min('fecha_inicio'), hasta=Max('fecha_fin'))
+            extremos += [fecha for fecha in limites.values() if fecha]
+        for modelo in (Pago, PagoHistorico):
+            limites = modelo.objects.aggregate(desde=Min('fecha_pago'), hasta=Max('fecha_pago'))
+            extremos += [timezone.localdate(fecha) for fecha in limites.values() if fecha]
+        rangos = [(min(extremos), max(extremos))] if extremos else []
+        with transaction.atomic():
+            ResumenDiario.objects.all().delete()
+            for desde, hasta in rangos:
+                recalcular(desde, hasta)
+    else:
+        rangos = list(rangos_contiguos(dias_modificados(control.ultima)))
+        for desde, hasta in rangos:
+            recalcular(desde, hasta)
+
+    ActualizacionResumen.objects.update_or_create(pk=1, defaults={'ultima': ahora})
+    return sum((hasta - desde).days + 1 for desde, hasta in rangos)
@@ -0,0 +1,204 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from alquileres_maria.pruebas import DatosReservaMixin
+from pagos.models import Pago, MetodoPago
+from reservas import historial
+from reservas.models import Reserva
+from vehiculos.models import Marca
+from . import exportacion, resumenes
+from .indicadores import indicadores
+from .models import ResumenDiario
+
+
+class ReportesTests(DatosReservaMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.tarjeta = MetodoPago.objects.create(nombre='Tarjeta de Credito/Debito')
+        cls.toyota = cls.crear_vehiculo()
+        cls.ford = cls.crear_vehiculo(
+            'BBB222', marca=Marca.objects.create(nombre='Ford'), modelo='Ka', ano=2020,
+            capacidad=4, precio_por_dia=Decimal('30.00'),
+        )
+        cls.inicio = date(2025, 3, 1)
+
+    def reservar(self, vehiculo, desde, dias, estado=None, monto=None):
+        reserva = Reserva(
+            usuario=self.usuario, vehiculo=vehiculo, estado=estado or self.confirmada,
+            fecha_inicio=self.inicio + timedelta(days=desde),
+            fecha_fin=self.inicio + timedelta(days=desde + dias - 1),
+        )
+        # Reservas en el pasado: se insertan sin pasar por Reserva.clean()
+        Reserva.objects.bulk_create([reserva])
+        if monto is not None:
+            Pago.objects.create(reserva=reserva, metodo_pago=self.tarjeta, monto=Decimal(monto))
+        return reserva
+
+    def test_indicadores_por_marca(self):
+        self.reservar(self.toyota, 0, 4, monto='200.00')
+        self.reservar(self.toyota, 10, 2, monto='100.00')
+        self.reservar(self.ford, 5, 3, monto='90.00')
+        self.reservar(self.ford, 20, 5, estado=self.cancelada)
+        resumenes.actualizar()
+
+        hoy = timezone.localdate()
+        filas = {fila['grupo']: fila for fila in indicadores('marca', self.inicio, hoy)}
+        dias = (hoy - self.inicio).days + 1
+        self.assertEqual(filas['Toyota']['ingresos'], Decimal('300.00'))
+        self.assertEqual(filas['Toyota']['reservas'], 2)
+        self.assertEqual(filas['Toyota']['duracion_media'], 3)
+        self.assertAlmostEqual(filas['Toyota']['ocupacion'], 6 / dias)
+        self.assertEqual(filas['Ford']['dias_ocupados'], 3)
+        self.assertAlmostEqual(filas['Ford']['participacion'], 90 / 390)
+
+    def test_indicadores_por_mes(self):
+        self.reservar(self.toyota, 29, 3)
+        resumenes.actualizar()
+
+        filas = indicadores('mes', self.inicio, date(2025, 4, 30))
+        self.assertEqual([fila['grupo'] for fila in filas], [date(2025, 3, 1), date(2025, 4, 1)])
+        self.assertAlmostEqual(filas[0]['ocupacion'], 2 / (31 * 2))
+        self.assertAlmostEqual(filas[1]['ocupacion'], 1 / (30 * 2))
+
+    def test_actualizacion_incremental(self):
+        self.reservar(self.toyota, 0, 4)
+        resumenes.actualizar()
+        self.assertEqual(ResumenDiario.objects.count(), 4)
+
+        self.assertEqual(resumenes.actualizar(), 0)
+        self.reservar(self.ford, 40, 2)
+        self.assertEqual(resumenes.actualizar(), 2)
+        self.assertEqual(ResumenDiario.objects.filter(vehiculo=self.ford).count(), 2)
+
+    def test_reconstruccion_completa_incluye_lo_archivado(self):
+        self.reservar(self.toyota, 0, 4, estado=self.completada, monto='200.00')
+        self.reservar(self.ford, 5, 3, monto='90.00')
+        resumenes.actualizar()
+        columnas = ('fecha', 'vehiculo_id', 'ingresos', 'dias_ocupados', 'reservas_iniciadas', 'dias_reservados')
+        antes = list(ResumenDiario.objects.order_by('fecha', 'vehiculo_id').values_list(*columnas))
+
+        self.assertEqual(historial.archivar(anos=0), 1)
+        resumenes.actualizar(completo=True)
+        self.assertEqual(list(ResumenDiario.objects.order_by('fecha', 'vehiculo_id').values_list(*columnas)), antes)
+
+    def test_tablero_solo_staff(self):
+        self.client.force_login(self.usuario)
+        self.assertEqual(self.client.get(reverse('reportes:tablero')).status_code, 302)
+        User.objects.filter(pk=self.usuario.pk).update(is_staff=True)
+        respuesta = self.client.get(reverse('reportes:tablero'), {'agrupacion': 'vehiculo'})
+        self.assertEqual(respuesta.status_code, 200)
+
+
+class ExportacionTests(DatosReservaMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.tarjeta = MetodoPago.objects.create(nombre='Tarjeta de Credito/Debito')
+        cls.vehiculo = cls.crear_vehiculo()
+
+    def agregar_reservas(self, cantidad, estado=None, inicio=date(2025, 1, 1)):
+        Reserva.objects.bulk_create(
+            (
+                Reserva(
+                    usuario=self.usuario, vehiculo=self.vehiculo, estado=estado or self.confirmada,
+                    fecha_inicio=inicio, fecha_fin=inicio + timedelta(days=2),
+                    precio_por_dia=Decimal('50.00'), total=Decimal('150.00'),
+                )
+                for _ in range(cantidad)
+            ),
+            batch_size=1000,
+        )
+
+    def leer(self, *args, **kwargs):
+        return b''.join(exportacion.exportar(*args, **kwargs)).decode()
+
+    def test_csv_filtrado_por_estado_y_fecha(self):
+        self.agregar_reservas(2)
+        self.agregar_reservas(1, estado=self.cancelada)
+        self.agregar_reservas(1, inicio=date(2025, 6, 1))
+
+        filas = list(csv.DictReader(io.StringIO(self.leer(
+            'reservas', estado='Confirmada', desde=date(2025, 1, 1), hasta=date(2025, 3, 1)))))
+        self.assertEqual(len(filas), 2)
+        self.assertEqual(filas[0]['patente'], 'AAA111')
+        self.assertEqual(filas[0]['estado'], 'Confirmada')
+        self.assertEqual(filas[0]['total'], '150.00')
+
+    def test_incluye_lo_archivado(self):
+        self.agregar_reservas(1, estado=self.completada)
+        archivada = Reserva.objects.get()
+        Pago.objects.create(reserva=archivada, metodo_pago=self.tarjeta, monto=Decimal('150.00'))
+        self.assertEqual(historial.archivar(anos=0), 1)
+        self.agregar_reservas(1)
+
+        filas = list(csv.DictReader(io.StringIO(self.leer('reservas'))))
+        self.assertEqual([fila['estado'] for fila in filas], ['Completada', 'Confirmada'])
+        self.assertEqual(filas[0]['id'], str(archivada.pk))
+        self.assertEqual(len(list(csv.DictReader(io.StringIO(self.leer('pagos', estado='Completada'))))), 1)
+
+    def test_jsonl_comprimido(self):
+        self.agregar_reservas(1)
+        Pago.objects.create(reserva=Reserva.objects.get(), metodo_pago=self.tarjeta, monto=Decimal('150.00'))
+
+        comprimido = b''.join(exportacion.exportar('pagos', formato='jsonl', comprimido=True))
+        lineas = gzip.decompress(comprimido).decode().splitlines()
+        self.assertEqual(len(lineas), 1)
+        pago = json.loads(lineas[0])
+        self.assertEqual((pago['monto'], pago['metodo_pago'], pago['usuario']),
+                         ('150.00', 'Tarjeta de Credito/Debito', 'cliente'))
+
+    def test_memoria_constante(self):
+        def pico_de_memoria():
+            tracemalloc.start()
+            for _ in exportacion.exportar('reservas', comprimido=True, tamano_lote=500):
+                pass
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return pico
+
+        self.agregar_reservas(2000)
+        pico_chico = pico_de_memoria()
+        self.agregar_reservas(8000)
+        pico_grande = pico_de_memoria()
+        # Cinco veces mas filas no deben requerir sensiblemente mas memoria
+        self.assertLess(pico_grande, pico_chico * 1.5)
+
+    def test_vista_solo_staff(self):
+        self.agregar_reservas(1)
+        self.client.force_login(self.usuario)
+        url = reverse('reportes:exportar', args=['reservas'])
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        User.objects.filter(pk=self.usuario.pk).update(is_staff=True)
+        respuesta = self.client.get(url, {'gzip': 'on'})
+        self.assertEqual(respuesta['Content-Type'], 'application/gzip')
+        contenido = gzip.decompress(b''.join(respuesta.streaming_content)).decode()
+        self.assertEqual(len(contenido.splitlines()), 2)
+        self.assertEqual(self.client.get(reverse('reportes:exportar', args=['usuarios'])).status_code, 404)
+
+    def test_comando(self):
+        self.agregar_reservas(3)
+        with tempfile.TemporaryDirectory() as directorio:
+            salida = os.path.join(directorio, 'reservas.csv')
+            call_command('exportar_datos', 'reservas', '--salida', salida)
+            with open(salida, encoding='utf-8') as archivo:
+                self.assertEqual(len(archivo.read().splitlines()), 4)
+
+    def test_comando_fecha_invalida(self):
+        with self.assertRaisesMessage(CommandError, "Fecha invalida: '2024-13-01' (AAAA-MM-DD)."):
+            call_command('exportar_datos', 'reservas', '--desde', '2024-13-01')
@@ -0,0 +1,62 @@
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
+from django.shortcuts import render, redirect
+from django.utils import timezone
+
+from . import exportacion
+from .forms import TableroForm, ExportacionForm
+from .indicadores import indicadores
+
+@login_required
+def tablero(request):
+    """Tablero de ingresos y ocupacion."""
+    # Solo para administradores
+    if not request.user.is_staff:
+        messages.error(request, "No tiene permisos para realizar esta accion.")
+        return redirect('home')
+    
+    form = TableroForm(request.GET)
+    filas = []
+    if form.is_valid():
+        datos = form.cleaned_data
+        filas = indicadores(datos['agrupacion'], datos['desde'], datos['hasta'])
+    
+    return render(request, 'reportes/tablero.html', {
+        'form': form,
+        'filas': filas,
+    })
+
+@login_required
+def exportar(request, modelo):
+    """Descarga en streaming de reservas o pagos en CSV o JSON Lines."""
+    # Solo para administradores
+    if not request.user.is_staff:
+        messages.error(request, "No tiene permisos para realizar esta accion.")
+        return redirect('home')
+    
+    if modelo not in exportacion.COLUMNAS:
+        raise Http404("No se puede exportar ese modelo.")
+    
+    form = ExportacionForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+    
+    datos = form.cleaned_data
+    contenido = exportacion.exportar(
+        modelo,
+        formato=datos['formato'],
+        comprimido=datos['gzip'],
+        desde=datos['desde'],
+        hasta=datos['hasta'],
+        estado=datos['estado'],
+    )
+    nombre = f"{modelo}-{timezone.localdate():%Y%m%d}.{datos['formato']}"
+    tipo = 'text/csv' if datos['formato'] == 'csv' else 'application/x-ndjson'
+    if datos['gzip']:
+        nombre += '.gz'
+        tipo = 'application/gzip'
+    
+    respuesta = StreamingHttpResponse(contenido, content_type=tipo)
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return respuesta
@@ -0,0 +1,138 @@
+"""API JSON de solo lectura: calendario de disponibilidad de un vehiculo.
+
+Los dias ocupados salen del mapa de ocupacion del vehiculo (ver
+reservas.ocupacion), que se lee junto con el vehiculo en una sola consulta.
+El ETag se calcula con las fechas de actualizacion del vehiculo y del mapa,
+que cambia con cualquier reserva del vehiculo (ver alquileres_maria.api).
+Las lecturas nunca escriben: si el vehiculo no tiene mapa guardado, o se
+piden dias anteriores a su origen, se arma uno en memoria solo para el rango
+pedido y los dias ocupados hacen de version.
+"""
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import require_GET
+
+from alquileres_maria.api import error, etag, respuesta_condicional
+from vehiculos.models import Vehiculo
+from . import ocupacion
+
+DIAS_POR_DEFECTO = 90
+DIAS_MAXIMOS = 366
+MESES_POR_DEFECTO = 3
+MESES_MAXIMOS = 12
+
+
+def leer_rango(parametros):
+    """(desde, hasta) del calendario; lanza ValueError si el rango es invalido."""
+    desde = parse_date(parametros['desde']) if parametros.get('desde') else timezone.localdate()
+    if desde is None:
+        raise ValueError("Fecha 'desde' invalida (AAAA-MM-DD).")
+    if parametros.get('hasta'):
+        hasta = parse_date(parametros['hasta'])
+        if hasta is None:
+            raise ValueError("Fecha 'hasta' invalida (AAAA-MM-DD).")
+    else:
+        hasta = desde + timedelta(days=DIAS_POR_DEFECTO - 1)
+    if hasta < desde:
+        raise ValueError("La fecha 'hasta' debe ser posterior a 'desde'.")
+    if (hasta - desde).days >= DIAS_MAXIMOS:
+        raise ValueError(f"El rango no puede superar {DIAS_MAXIMOS} dias.")
+    return desde, hasta
+
+
+def leer_meses(parametros):
+    """(primer dia del primer mes, cantidad de meses); lanza ValueError si son invalidos."""
+    if parametros.get('desde'):
+        try:
+            desde = datetime.strptime(parametros['desde'], '%Y-%m').date()
+        except ValueError:
+            raise ValueError("Mes 'desde' invalido (AAAA-MM).") from None
+    else:
+        desde = timezone.localdate().replace(day=1)
+    try:
+        meses = int(parametros.get('meses', MESES_POR_DEFECTO))
+    except ValueError:
+        raise ValueError("'meses' debe ser un numero.") from None
+    if not 1 <= meses <= MESES_MAXIMOS:
+        raise ValueError(f"'meses' debe estar entre 1 y {MESES_MAXIMOS}.")
+    return desde, meses
+
+
+def mes_siguiente(dia):
+    return (dia.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def mapa_del_vehiculo(vehiculo_id, desde, hasta):
+    """(datos del vehiculo, mapa de ocupacion, version del mapa), o (None, None, None) si no existe.
+
+    Sin mapa guardado (vehiculos cargados con bulk_create, hasta correr
+    ``manage.py reconstruir_ocupacion``) o si el mapa empieza despues de
+    ``desde``, se arma uno en memoria para [desde, hasta] sin guardarlo.
+    """
+    fila = Vehiculo.objects.filter(pk=vehiculo_id).values(
+        'disponible', 'fecha_actualizacion', 'ocupacion__origen', 'ocupacion__dias', 'ocupacion__fecha_actualizacion',
+    ).first()
+    if fila is None:
+        return None, None, None
+    origen = fila['ocupacion__origen']
+    if origen is not None and desde >= origen:
+        return fila, ocupacion.Mapa(origen, bytes(fila['ocupacion__dias'])), fila['ocupacion__fecha_actualizacion']
+    mapa = ocupacion.Mapa(desde)
+    ocupacion.marcar_reservas(mapa, vehiculo_id, desde, hasta)
+    return fila, mapa, mapa.dias()
+
+
+def version(fila, version_mapa, *partes):
+    return etag('disponibilidad', *partes, fila['disponible'], fila['fecha_actualizacion'], version_mapa)
+
+
+@require_GET
+def calendario(request, vehiculo_id):
+    """Periodos ocupados de un rango de dias (desde/hasta, AAAA-MM-DD)."""
+    try:
+        desde, hasta = leer_rango(request.GET)
+    except ValueError as problema:
+        return error(str(problema))
+
+    vehiculo, mapa, version_mapa = mapa_del_vehiculo(vehiculo_id, desde, hasta)
+    if vehiculo is None:
+        return error("Vehiculo inexistente.", estado=404)
+
+    return respuesta_condicional(request, version(vehiculo, version_mapa, vehiculo_id, desde, hasta), lambda: {
+        'vehiculo': vehiculo_id,
+        'desde': desde,
+        'hasta': hasta,
+        'en_servicio': vehiculo['disponible'],
+        'ocupado': [{'desde': inicio, 'hasta': fin} for inicio, fin in mapa.periodos(desde, hasta)],
+    })
+
+
+@require_GET
+def calendario_mensual(request, vehiculo_id):
+    """Dias ocupados mes por mes (desde=AAAA-MM, meses=N); lo usa el selector de fechas."""
+    try:
+        desde, meses = leer_meses(request.GET)
+    except ValueError as problema:
+        return error(str(problema))
+
+    inicios = [desde]
+    for _ in range(meses):
+        inicios.append(mes_siguiente(inicios[-1]))
+    vehiculo, mapa, version_mapa = mapa_del_vehiculo(vehiculo_id, desde, inicios[-1] - timedelta(days=1))
+    if vehiculo is None:
+        return error("Vehiculo inexistente.", estado=404)
+
+    def construir():
+        calendario = [
+            {
+                'mes': inicio.strftime('%Y-%m'),
+                'dias': (siguiente - inicio).days,
+                'ocupados': [dia.day for dia in mapa.ocupados(inicio, siguiente - timedelta(days=1))],
+            }
+            for inicio, siguiente in zip(inicios, inicios[1:])
+        ]
+        return {'vehiculo': vehiculo_id, 'en_servicio': vehiculo['disponible'], 'meses': calendario}
+
+    return respuesta_condicional(request, version(vehiculo, version_mapa, vehiculo_id, desde, meses), construir)
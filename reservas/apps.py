@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ReservasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reservas'
+
+    def ready(self):
+        from . import disponibilidad_actual, ocupacion
+        ocupacion.conectar_senales()
+        disponibilidad_actual.conectar_senales()
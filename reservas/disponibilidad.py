@@ -0,0 +1,117 @@
+"""Consultas de disponibilidad de vehiculos.
+
+Responde "esta libre el vehiculo X entre a y b" con una unica consulta por
+rango, apoyada en el indice compuesto (vehiculo, estado, fecha_fin,
+fecha_inicio) de Reserva. Tanto ReservaForm.clean como Reserva.clean usan este
+modulo, de modo que la regla de superposicion vive en un solo lugar.
+"""
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef
+
+from vehiculos.models import Vehiculo
+from .models import Reserva
+from .referencias import estados
+
+# Estados que ocupan el vehiculo
+ESTADOS_ACTIVOS = ['Pendiente', 'Confirmada']
+
+
+def reservas_superpuestas(vehiculo, fecha_inicio, fecha_fin, excluir_id=None):
+    """Devuelve las reservas activas del vehiculo que se superponen con el periodo."""
+    queryset = Reserva.objects.filter(
+        vehiculo=vehiculo,
+        # Ids de estado resueltos desde la cache: ni JOIN ni subconsulta, y el
+        # filtro se resuelve sobre el indice compuesto
+        estado_id__in=estados.ids(ESTADOS_ACTIVOS),
+        fecha_inicio__lte=fecha_fin,
+        fecha_fin__gte=fecha_inicio,
+    )
+    if excluir_id is not None:
+        queryset = queryset.exclude(id=excluir_id)
+    return queryset
+
+
+def reserva_conflictiva(vehiculo, fecha_inicio, fecha_fin, excluir_id=None):
+    """Devuelve una reserva que bloquea el periodo, o None si el vehiculo esta libre."""
+    return (
+        reservas_superpuestas(vehiculo, fecha_inicio, fecha_fin, excluir_id)
+        .select_related('vehiculo__marca', 'usuario')
+        .order_by()
+        .first()
+    )
+
+
+def vehiculo_disponible(vehiculo, fecha_inicio, fecha_fin, excluir_id=None):
+    """Indica si el vehiculo esta libre en el periodo [fecha_inicio, fecha_fin]."""
+    return not reservas_superpuestas(vehiculo, fecha_inicio, fecha_fin, excluir_id).exists()
+
+
+def filtrar_disponibles(vehiculos, fecha_inicio, fecha_fin):
+    """Restringe un queryset de vehiculos a los que estan libres en el periodo.
+
+    Se resuelve con un NOT EXISTS correlacionado sobre el indice de
+    disponibilidad, por lo que se combina con cualquier otro filtro del
+    queryset en una sola consulta.
+    """
+    return vehiculos.filter(~Exists(reservas_superpuestas(OuterRef('pk'), fecha_inicio, fecha_fin)))
+
+
+def bloquear_vehiculo(vehiculo_id):
+    """Toma un bloqueo de escritura sobre el vehiculo hasta el fin de la transaccion.
+
+    Debe llamarse dentro de transaction.atomic(). En PostgreSQL es un
+    SELECT ... FOR UPDATE sobre la fila del vehiculo, de modo que solo se
+    serializan las reservas del mismo vehiculo. SQLite no soporta FOR UPDATE:
+    un UPDATE sin efecto toma el bloqueo de escritura de la base antes de leer,
+    y las demas transacciones esperan en lugar de fallar al confirmar.
+    """
+    bloquear_vehiculos([vehiculo_id])
+
+
+def bloquear_vehiculos(vehiculo_ids):
+    """Como bloquear_vehiculo, para varios vehiculos y siempre en orden de id.
+
+    Todo camino que cambia reservas bloquea primero los vehiculos y despues
+    el mapa de ocupacion (ocupacion.recalcular); con el mismo orden en todos
+    dos transacciones en PostgreSQL no pueden esperarse una a la otra.
+    """
+    ids = sorted(set(vehiculo_ids))
+    if not ids:
+        return
+    if connection.features.has_select_for_update:
+        list(Vehiculo.objects.select_for_update().filter(pk__in=ids).order_by('pk').values_list('pk', flat=True))
+    else:
+        Vehiculo.objects.filter(pk__in=ids).update(disponible=F('disponible'))
+
+
+def reservar(form, usuario, vehiculo, estado):
+    """Valida y guarda una ReservaForm con el vehiculo bloqueado.
+
+    La verificacion de superposicion y el INSERT ocurren en la misma
+    transaccion y bajo el bloqueo, por lo que dos pedidos simultaneos para el
+    mismo vehiculo y fechas no pueden pasar ambos la validacion. Devuelve la
+    reserva creada, o None si el formulario no es valido.
+    """
+    with transaction.atomic():
+        bloquear_vehiculo(vehiculo.pk)
+        if not form.is_valid():
+            return None
+        reserva = form.save(commit=False)
+        reserva.usuario = usuario
+        reserva.vehiculo = vehiculo
+        reserva.estado = estado
+        # Las senales de Reserva no vuelven a bloquearlo
+        reserva._vehiculo_bloqueado = vehiculo.pk
+        reserva.save()
+        return reserva
+
+
+def marcar_verificada(reserva, vehiculo_id, fecha_inicio, fecha_fin):
+    """Recuerda en la instancia que el periodo ya fue validado contra la base."""
+    reserva._disponibilidad_verificada = (vehiculo_id, fecha_inicio, fecha_fin)
+
+
+def ya_verificada(reserva):
+    """Indica si la instancia ya paso la validacion de superposicion con sus datos actuales."""
+    clave = (reserva.vehiculo_id, reserva.fecha_inicio, reserva.fecha_fin)
+    return getattr(reserva, '_disponibilidad_verificada', None) == clave
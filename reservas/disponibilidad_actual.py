@@ -0,0 +1,194 @@
+"""Disponibilidad actual de cada vehiculo, guardada en el propio Vehiculo.
+
+Para que el catalogo muestre y filtre "libre hoy" / "libre desde" sin
+consultar las reservas de cada tarjeta, Vehiculo lleva tres columnas
+calculadas a partir de sus reservas activas que todavia no terminaron:
+
+* ``ocupado_hoy``: alguna la ocupa hoy.
+* ``proxima_fecha_libre``: primer dia desde hoy sin reservas (hoy si esta libre).
+* ``reservas_activas``: cuantas son.
+
+Se mantienen en forma incremental, en la misma transaccion, cuando una
+reserva empieza o deja de ocupar el vehiculo (senales de Reserva y
+ReservaQuerySet.cambiar_estado). Una reserva que empieza despues de
+proxima_fecha_libre no cambia ni ocupado_hoy ni proxima_fecha_libre: basta
+con sumar o restar en reservas_activas, un solo UPDATE sin lecturas (que
+nunca la deja bajo cero si estaba atrasada). Las
+que tocan el tramo ocupado desde hoy recalculan las tres columnas desde las
+reservas del vehiculo, y solo si cambia lo que muestra la tarjeta se
+invalida la cache del catalogo.
+
+Los valores dependen de la fecha: al cambiar el dia quedan atrasados hasta
+que corre ``manage.py reconciliar_disponibilidad``, que recalcula todos los
+vehiculos por lotes (conviene programarlo apenas pasada la medianoche) y
+tambien corrige lo que hayan cambiado escrituras sin senales (``update()``,
+``bulk_create()``). Vehiculo.save() no escribe estas columnas al editar un
+vehiculo existente.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from alquileres_maria import metricas
+from vehiculos import catalogo
+from vehiculos.models import Vehiculo
+from . import disponibilidad
+from .models import Reserva
+from .referencias import estados
+
+logger = logging.getLogger(__name__)
+
+LOTE = 500
+METRICA_CORREGIDOS = 'vehiculos_disponibilidad_corregida'
+CAMPOS = Vehiculo.CAMPOS_DISPONIBILIDAD
+
+
+def resumir(periodos, hoy):
+    """(ocupado_hoy, proxima_fecha_libre, reservas_activas) de los periodos activos ordenados por inicio."""
+    libre = hoy
+    for inicio, fin in periodos:
+        if inicio > libre:
+            break
+        libre = max(libre, fin + timedelta(days=1))
+    return libre > hoy, libre, len(periodos)
+
+
+def calcular(vehiculo_ids, hoy):
+    """Valores de CAMPOS de cada vehiculo, con una consulta para todos."""
+    periodos = {vehiculo_id: [] for vehiculo_id in vehiculo_ids}
+    reservas = Reserva.objects.filter(
+        vehiculo_id__in=vehiculo_ids,
+        estado_id__in=estados.ids(disponibilidad.ESTADOS_ACTIVOS),
+        fecha_fin__gte=hoy,
+    ).order_by('vehiculo_id', 'fecha_inicio').values_list('vehiculo_id', 'fecha_inicio', 'fecha_fin')
+    for vehiculo_id, inicio, fin in reservas:
+        periodos[vehiculo_id].append((inicio, fin))
+    return {vehiculo_id: resumir(propios, hoy) for vehiculo_id, propios in periodos.items()}
+
+
+def _guardar(vehiculos, nuevos):
+    """Guarda los valores que cambiaron; devuelve los vehiculos corregidos.
+
+    ``vehiculos`` son filas (id, *CAMPOS) con los valores actuales. Si cambia
+    lo que muestra la tarjeta (y filtra ``libre_hoy``) se actualiza
+    fecha_actualizacion, la marca de agua de los ETag de la API, y se
+    invalida el catalogo al confirmar.
+    """
+    cambiados = [
+        Vehiculo(pk=vehiculo_id, **dict(zip(CAMPOS, nuevos[vehiculo_id])))
+        for vehiculo_id, *actuales in vehiculos
+        if tuple(actuales) != nuevos[vehiculo_id]
+    ]
+    if not cambiados:
+        return []
+    visibles = [
+        vehiculo_id for vehiculo_id, *actuales in vehiculos
+        if tuple(actuales[:2]) != nuevos[vehiculo_id][:2]
+    ]
+    if len(cambiados) == 1:
+        campos = {campo: getattr(cambiados[0], campo) for campo in CAMPOS}
+        if visibles:
+            campos['fecha_actualizacion'] = timezone.now()
+        Vehiculo.objects.filter(pk=cambiados[0].pk).update(**campos)
+    else:
+        Vehiculo.objects.bulk_update(cambiados, CAMPOS)
+        if visibles:
+            Vehiculo.objects.filter(pk__in=visibles).update(fecha_actualizacion=timezone.now())
+    if visibles:
+        catalogo.invalidar_al_confirmar('flota', *(f'vehiculo:{vehiculo_id}' for vehiculo_id in visibles))
+    return cambiados
+
+
+def actualizar(vehiculo_id):
+    """Recalcula la disponibilidad del vehiculo; corre en la transaccion de quien cambio la reserva.
+
+    Dos cambios simultaneos del mismo vehiculo no pueden pisarse: en
+    PostgreSQL la fila del vehiculo se lee con FOR UPDATE; en SQLite quien
+    llama ya escribio la reserva en esta transaccion y tiene el bloqueo de
+    escritura de la base.
+    """
+    filas = Vehiculo.objects.filter(pk=vehiculo_id).order_by().values_list('pk', *CAMPOS)
+    with transaction.atomic(savepoint=False):
+        if connection.features.has_select_for_update:
+            filas = filas.select_for_update()
+        actuales = list(filas)
+        if actuales:
+            _guardar(actuales, calcular([vehiculo_id], timezone.localdate()))
+
+
+def reconciliar(lote=LOTE):
+    """Recalcula todos los vehiculos por lotes de ``lote``; devuelve (revisados, corregidos)."""
+    hoy = timezone.localdate()
+    revisados = corregidos = 0
+    ultimo = 0
+    while True:
+        with transaction.atomic():
+            vehiculos = list(
+                Vehiculo.objects.select_for_update().filter(pk__gt=ultimo).order_by('pk')
+                .values_list('pk', *CAMPOS)[:lote]
+            )
+            if not vehiculos:
+                break
+            cambiados = _guardar(vehiculos, calcular([fila[0] for fila in vehiculos], hoy))
+        ultimo = vehiculos[-1][0]
+        revisados += len(vehiculos)
+        corregidos += len(cambiados)
+    if corregidos:
+        metricas.incrementar(METRICA_CORREGIDOS, corregidos)
+    logger.info("Disponibilidad de vehiculos reconciliada: %d revisados, %d corregidos.", revisados, corregidos)
+    return revisados, corregidos
+
+
+def ajustar(vehiculo_id, fecha_inicio, cambio):
+    """Suma ``cambio`` reservas activas que empiezan desde ``fecha_inicio`` (+1 alta, -1 baja, 0 cambio de fechas)."""
+    hoy = timezone.localdate()
+    # Con proxima_fecha_libre anterior a hoy (cambio el dia) el recalculo tambien la corrige
+    if fecha_inicio > hoy and Vehiculo.objects.filter(
+        pk=vehiculo_id, proxima_fecha_libre__gte=hoy, proxima_fecha_libre__lt=fecha_inicio,
+    ).update(reservas_activas=Greatest(F('reservas_activas') + cambio, 0)):
+        return
+    actualizar(vehiculo_id)
+
+
+def _periodo(reserva):
+    # Mismo formato que el periodo anterior que guarda ocupacion._antes_de_guardar
+    activa = reserva.estado_id in estados.ids(disponibilidad.ESTADOS_ACTIVOS)
+    return reserva.vehiculo_id, reserva.fecha_inicio, reserva.fecha_fin, activa
+
+
+def _reserva_guardada(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    # La senal pre_save de ocupacion deja en la instancia el periodo anterior al cambio
+    vehiculo_id, inicio, _, activa = actual = _periodo(instance)
+    anterior = None if created else getattr(instance, '_periodo_anterior', None)
+    if anterior is None:
+        if activa:
+            ajustar(vehiculo_id, inicio, 1)
+        return
+    if anterior == actual:
+        return
+    vehiculo_anterior, inicio_anterior, _, activa_anterior = anterior
+    if vehiculo_anterior != vehiculo_id:
+        if activa_anterior:
+            ajustar(vehiculo_anterior, inicio_anterior, -1)
+        if activa:
+            ajustar(vehiculo_id, inicio, 1)
+    elif activa or activa_anterior:
+        ajustar(vehiculo_id, min(inicio, inicio_anterior), int(activa) - int(activa_anterior))
+
+
+def _reserva_borrada(sender, instance, **kwargs):
+    vehiculo_id, inicio, _, activa = _periodo(instance)
+    if activa:
+        ajustar(vehiculo_id, inicio, -1)
+
+
+def conectar_senales():
+    post_save.connect(_reserva_guardada, sender='reservas.Reserva', dispatch_uid='disponibilidad-actual-reserva')
+    post_delete.connect(_reserva_borrada, sender='reservas.Reserva', dispatch_uid='disponibilidad-actual-reserva')
@@ -1,5 +1,7 @@
 from django import forms
 from .models import Reserva
+from . import disponibilidad
+from django.urls import reverse
 from django.utils import timezone
 
 class ReservaForm(forms.ModelForm):
@@ -15,6 +17,11 @@ class ReservaForm(forms.ModelForm):
         self.vehiculo = kwargs.pop('vehiculo', None)
         self.usuario = kwargs.pop('usuario', None)
         super().__init__(*args, **kwargs)
+        if self.vehiculo is not None:
+            # El selector de fechas (static/js/scripts.js) deshabilita los dias ocupados
+            self.fields['fecha_inicio'].widget.attrs['data-calendario'] = reverse(
+                'reservas:api-calendario', args=[self.vehiculo.pk],
+            )
     
     def clean(self):
         cleaned_data = super().clean()
@@ -30,17 +37,13 @@ class ReservaForm(forms.ModelForm):
             if fecha_fin < fecha_inicio:
                 self.add_error('fecha_fin', "La fecha de fin debe ser posterior a la fecha de inicio.")
             
-            # Validar que el vehiculo no este reservado en las fechas seleccionadas
-            from .models import Reserva
-            reservas_existentes = Reserva.objects.filter(
-                vehiculo=self.vehiculo,
-                estado__nombre__in=['Pendiente', 'Confirmada'],
-            )
-            
-            for reserva in reservas_existentes:
-                if (fecha_inicio <= reserva.fecha_fin and fecha_fin >= reserva.fecha_inicio):
-                    self.add_error(None, f"El vehiculo ya esta reservado en el periodo seleccionado.")
-                    break
+            # Validar que el vehiculo no este reservado en las fechas seleccionadas.
+            # El resultado queda registrado en la instancia para que Reserva.save() no repita la consulta.
+            if self.vehiculo is not None:
+                if disponibilidad.vehiculo_disponible(self.vehiculo, fecha_inicio, fecha_fin, excluir_id=self.instance.pk):
+                    disponibilidad.marcar_verificada(self.instance, self.vehiculo.pk, fecha_inicio, fecha_fin)
+                else:
+                    self.add_error(None, "El vehiculo ya esta reservado en el periodo seleccionado.")
         
         return cleaned_data
 
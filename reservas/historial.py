@@ -0,0 +1,109 @@
+"""Cierre y archivo de las reservas terminadas.
+
+completar_finalizadas pasa a Completada las reservas confirmadas cuya fecha
+de fin ya paso: dejan de ocupar el vehiculo (disponibilidad.ESTADOS_ACTIVOS)
+y siguen contando en los reportes (reportes.resumenes.ESTADOS_FACTURADOS).
+Como vencimiento, cambia el estado por lotes con
+ReservaQuerySet.cambiar_estado.
+
+archivar mueve las reservas terminadas hace mas de cierta cantidad de años
+a ReservaHistorica, con sus pagos (a pagos.PagoHistorico: Pago borra en
+cascada con la reserva), para que la tabla de reservas y sus indices solo
+tengan lo que se consulta. Cada lote es una transaccion con un INSERT ...
+SELECT por tabla, que copia las filas dentro de la base sin traerlas a
+Python, y un DELETE por tabla. Las intenciones de pago de esas reservas se
+descartan. Los resumenes diarios de reportes y las exportaciones leen
+tambien las tablas archivadas, asi que no cambian.
+
+Se corre con ``manage.py cerrar_reservas``.
+"""
+import logging
+
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from alquileres_maria import metricas
+from . import disponibilidad
+from .models import Reserva, ReservaHistorica
+from .referencias import estados
+
+logger = logging.getLogger(__name__)
+
+LOTE = 500
+
+# Contadores de alquileres_maria.metricas
+METRICA_COMPLETADAS = 'reservas_completadas'
+METRICA_ARCHIVADAS = 'reservas_archivadas'
+
+
+def completar_finalizadas(lote=LOTE):
+    """Pasa a Completada las confirmadas que terminaron antes de hoy; devuelve cuantas."""
+    confirmada, completada = estados.get('Confirmada'), estados.get('Completada')
+    pendientes = Reserva.objects.filter(estado=confirmada, fecha_fin__lt=timezone.localdate()).order_by('pk')
+    total = 0
+    while True:
+        ids = list(pendientes.values_list('pk', flat=True)[:lote])
+        if not ids:
+            break
+        total += Reserva.objects.filter(pk__in=ids).cambiar_estado(completada, desde=[confirmada])
+        if len(ids) < lote:
+            break
+
+    if total:
+        metricas.incrementar(METRICA_COMPLETADAS, total)
+        logger.info("Se completaron %s reservas finalizadas", total)
+    return total
+
+
+def archivables(anos):
+    """Reservas que ya no ocupan el vehiculo y terminaron hace mas de ``anos`` años."""
+    hoy = timezone.localdate()
+    try:
+        limite = hoy.replace(year=hoy.year - anos)
+    except ValueError:
+        # 29 de febrero
+        limite = hoy.replace(year=hoy.year - anos, day=28)
+    return Reserva.objects.filter(fecha_fin__lt=limite).exclude(
+        estado_id__in=estados.ids(disponibilidad.ESTADOS_ACTIVOS),
+    )
+
+
+def _copiar(queryset, destino, ahora):
+    """INSERT INTO destino SELECT ... de las filas del queryset, con fecha_archivado ``ahora``."""
+    campos = queryset.model._meta.concrete_fields
+    filas = queryset.order_by().annotate(
+        archivado=models.Value(ahora, output_field=models.DateTimeField()),
+    ).values_list(*[campo.attname for campo in campos], 'archivado')
+    sql, params = filas.query.sql_with_params()
+    columnas = ', '.join(
+        connection.ops.quote_name(columna) for columna in [campo.column for campo in campos] + ['fecha_archivado']
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {connection.ops.quote_name(destino._meta.db_table)} ({columnas}) {sql}', params)
+
+
+def archivar(anos, lote=LOTE):
+    """Mueve a ReservaHistorica (y sus pagos a PagoHistorico) las reservas de archivables(); devuelve cuantas."""
+    from pagos.models import IntencionPago, Pago, PagoHistorico
+
+    candidatas = archivables(anos).order_by('pk').values_list('pk', flat=True)
+    total = 0
+    while True:
+        ids = list(candidatas[:lote])
+        if not ids:
+            break
+        ahora = timezone.now()
+        with transaction.atomic():
+            _copiar(Pago.objects.filter(reserva_id__in=ids), PagoHistorico, ahora)
+            _copiar(Reserva.objects.filter(pk__in=ids), ReservaHistorica, ahora)
+            # DELETE directos: son filas que nadie mas referencia, sin cascada ni senales por fila
+            IntencionPago.objects.filter(reserva_id__in=ids)._raw_delete(connection.alias)
+            Pago.objects.filter(reserva_id__in=ids)._raw_delete(connection.alias)
+            total += Reserva.objects.filter(pk__in=ids)._raw_delete(connection.alias)
+        if len(ids) < lote:
+            break
+
+    if total:
+        metricas.incrementar(METRICA_ARCHIVADAS, total)
+        logger.info("Se archivaron %s reservas terminadas hace mas de %s años", total, anos)
+    return total
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from reservas import historial
+
+
+class Command(BaseCommand):
+    help = "Pasa a Completada las reservas confirmadas ya terminadas y, opcionalmente, archiva las muy viejas."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--archivar', type=int, metavar='AÑOS',
+            help="Mover a ReservaHistorica las reservas terminadas hace mas de tantos años.",
+        )
+        parser.add_argument('--lote', type=int, default=historial.LOTE, help="Reservas por transaccion.")
+
+    def handle(self, *args, **options):
+        completadas = historial.completar_finalizadas(lote=options['lote'])
+        mensaje = f"Reservas completadas: {completadas}."
+        if options['archivar'] is not None:
+            archivadas = historial.archivar(options['archivar'], lote=options['lote'])
+            mensaje += f" Reservas archivadas: {archivadas}."
+        self.stdout.write(self.style.SUCCESS(mensaje))
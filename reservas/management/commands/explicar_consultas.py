@@ -0,0 +1,91 @@
+import re
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from pagos.models import IntencionPago, Pago
+from pagos.views import ORDEN_HISTORIAL, pagos_del_usuario
+from reservas import disponibilidad, vencimiento
+from reservas.models import Reserva, EstadoReserva
+from reservas.referencias import estados
+from reservas.views import ReservaListView
+from vehiculos.models import Vehiculo
+from vehiculos.views import VehiculoListView
+
+# Recorridos completos de una tabla en el plan de cada motor
+ESCANEO_COMPLETO = {
+    'sqlite': re.compile(r'\bSCAN (?!CONSTANT\b)(\w+)\b(?! USING)'),
+    'postgresql': re.compile(r'\bSeq Scan on (\w+)'),
+}
+
+
+def consultas_frecuentes():
+    """(nombre, queryset) de las consultas de los caminos mas usados, con valores de ejemplo."""
+    hoy = timezone.localdate()
+    periodo = (hoy, hoy + timedelta(days=3))
+    catalogo = Vehiculo.objects.order_by(*VehiculoListView.ordenamiento)
+    pagina = VehiculoListView.paginate_by + 1
+    return [
+        ('disponibilidad', disponibilidad.reservas_superpuestas(0, *periodo)),
+        ('catalogo', catalogo[:pagina]),
+        ('catalogo_disponibles', catalogo.filter(disponible=True)[:pagina]),
+        ('catalogo_por_fechas', disponibilidad.filtrar_disponibles(catalogo, *periodo)[:pagina]),
+        ('catalogo_libres_hoy', catalogo.filter(ocupado_hoy=False)[:pagina]),
+        ('catalogo_por_proxima_libre', Vehiculo.objects.order_by(*VehiculoListView.ordenamiento_libre)[:pagina]),
+        ('disponibilidad_actual', Reserva.objects.filter(
+            vehiculo_id__in=[0], estado_id__in=estados.ids(disponibilidad.ESTADOS_ACTIVOS), fecha_fin__gte=hoy,
+        ).order_by('vehiculo_id', 'fecha_inicio')),
+        ('reservas_del_usuario', Reserva.objects.filter(usuario_id=0).order_by(*ReservaListView.ordenamiento)[:11]),
+        ('historial_pagos', pagos_del_usuario(User(pk=0)).order_by(*ORDEN_HISTORIAL)[:21]),
+        ('email_registrado', User.objects.filter(email='cliente@example.com')),
+        ('intencion_activa', IntencionPago.objects.filter(
+            reserva_id=0, estado__in=IntencionPago.ACTIVAS,
+        ).order_by('-fecha_creacion')[:1]),
+        ('pendientes_vencidas', vencimiento.pendientes_vencidas(timezone.now())[:vencimiento.LOTE]),
+        ('reservas_modificadas', Reserva.objects.filter(fecha_actualizacion__gt=timezone.now()).order_by()),
+        ('pagos_modificados', Pago.objects.filter(fecha_pago__gt=timezone.now()).order_by()),
+    ]
+
+
+def plan(queryset):
+    """Plan de ejecucion del queryset en la base actual."""
+    if connection.vendor != 'postgresql':
+        return queryset.explain()
+    # Con tablas chicas PostgreSQL prefiere recorrerlas enteras; sin Seq Scan se
+    # ve si algun indice puede resolver la consulta
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+class Command(BaseCommand):
+    help = "Muestra el plan (EXPLAIN) de las consultas frecuentes y falla si alguna recorre una tabla entera."
+
+    def handle(self, *args, **options):
+        patron = ESCANEO_COMPLETO.get(connection.vendor)
+        if patron is None:
+            self.stderr.write(f"No se interpretan los planes de {connection.vendor}: solo se muestran.")
+        try:
+            consultas = consultas_frecuentes()
+        except EstadoReserva.DoesNotExist as exc:
+            raise CommandError(f"{exc} Cargue los datos iniciales con manage.py sembrar_datos.")
+
+        fallidas = []
+        for nombre, queryset in consultas:
+            texto = plan(queryset)
+            tablas = sorted(set(patron.findall(texto))) if patron else []
+            if tablas:
+                fallidas.append(nombre)
+                self.stdout.write(self.style.ERROR(f"{nombre}: recorre entera {', '.join(tablas)}"))
+            else:
+                self.stdout.write(f"{nombre}: ok")
+            if tablas or options['verbosity'] > 1 or patron is None:
+                self.stdout.write(''.join(f"    {linea}\n" for linea in texto.splitlines()))
+
+        if fallidas:
+            raise CommandError(f"Consultas sin indice: {', '.join(fallidas)}.")
+        self.stdout.write(self.style.SUCCESS(f"Consultas revisadas: {len(consultas)}, todas con indice."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from reservas import disponibilidad_actual
+
+
+class Command(BaseCommand):
+    help = "Recalcula la disponibilidad actual de todos los vehiculos (correr cada noche, pasada la medianoche)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=disponibilidad_actual.LOTE, help="Vehiculos por transaccion.")
+
+    def handle(self, *args, **options):
+        revisados, corregidos = disponibilidad_actual.reconciliar(lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f"Vehiculos revisados: {revisados}. Vehiculos corregidos: {corregidos}."))
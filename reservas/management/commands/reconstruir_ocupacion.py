@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from reservas import ocupacion
+from vehiculos.models import Vehiculo
+
+
+class Command(BaseCommand):
+    help = "Reconstruye los mapas de ocupacion de los vehiculos desde sus reservas activas."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'vehiculos', nargs='*', type=int,
+            help="Ids de los vehiculos a reconstruir; por defecto, todos.",
+        )
+        parser.add_argument(
+            '--faltantes', action='store_true',
+            help="Solo los vehiculos sin mapa (por ejemplo, los cargados con sembrar_datos o importar_flota).",
+        )
+
+    def handle(self, *args, **options):
+        vehiculos = Vehiculo.objects.all()
+        if options['vehiculos']:
+            vehiculos = vehiculos.filter(pk__in=options['vehiculos'])
+        if options['faltantes']:
+            vehiculos = vehiculos.filter(ocupacion__isnull=True)
+        ids = vehiculos.order_by('pk').values_list('pk', flat=True).iterator()
+        cantidad = 0
+        for vehiculo_id in ids:
+            ocupacion.reconstruir(vehiculo_id)
+            cantidad += 1
+        self.stdout.write(self.style.SUCCESS(f"Mapas de ocupacion reconstruidos: {cantidad} vehiculos."))
@@ -0,0 +1,30 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from reservas import vencimiento
+
+
+class Command(BaseCommand):
+    help = "Vence las reservas pendientes de pago mas viejas que RESERVAS_PENDIENTES_TTL y libera sus fechas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutos', type=int, help="Antiguedad a partir de la cual vencen; por defecto, la configurada.")
+        parser.add_argument('--lote', type=int, default=vencimiento.LOTE, help="Reservas por UPDATE.")
+        parser.add_argument(
+            '--cada', type=int, metavar='SEGUNDOS',
+            help="Repetir el barrido cada tantos segundos, sin terminar (en lugar de correrlo desde cron).",
+        )
+
+    def handle(self, *args, **options):
+        ttl = timedelta(minutes=options['minutos']) if options['minutos'] is not None else None
+        while True:
+            cantidad = vencimiento.vencer_pendientes(ttl=ttl, lote=options['lote'])
+            self.stdout.write(self.style.SUCCESS(f"Reservas pendientes vencidas: {cantidad}."))
+            if not options['cada']:
+                break
+            # Entre barridos no se retiene la conexion
+            connection.close()
+            time.sleep(options['cada'])
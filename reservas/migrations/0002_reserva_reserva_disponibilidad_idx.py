@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 16:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0001_initial'),
+        ('vehiculos', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['vehiculo', 'estado', 'fecha_fin', 'fecha_inicio'], name='reserva_disponibilidad_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2 on 2026-10-18 16:21
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+class DiasReserva(models.Func):
+    """Copia de reservas.models.DiasReserva al escribir esta migracion: no depende del codigo actual."""
+    output_field = models.IntegerField()
+
+    def __init__(self):
+        super().__init__('fecha_fin', 'fecha_inicio')
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, template='(%(expressions)s + 1)', arg_joiner=' - ', **extra_context)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='(CAST(julianday(%(expressions)s) AS INTEGER) + 1)', arg_joiner=') - julianday(',
+            **extra_context
+        )
+
+
+def completar_precios(apps, schema_editor):
+    """Copia la tarifa actual del vehiculo en las reservas existentes y calcula su total."""
+    Reserva = apps.get_model('reservas', 'Reserva')
+    Vehiculo = apps.get_model('vehiculos', 'Vehiculo')
+    Reserva.objects.filter(precio_por_dia__isnull=True).update(
+        precio_por_dia=Subquery(Vehiculo.objects.filter(pk=OuterRef('vehiculo_id')).values('precio_por_dia')[:1])
+    )
+    Reserva.objects.filter(total__isnull=True).update(
+        total=models.ExpressionWrapper(
+            DiasReserva() * models.F('precio_por_dia'),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0002_reserva_reserva_disponibilidad_idx'),
+        ('vehiculos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reserva',
+            name='precio_por_dia',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='reserva',
+            name='total',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.RunPython(completar_precios, migrations.RunPython.noop),
+    ]
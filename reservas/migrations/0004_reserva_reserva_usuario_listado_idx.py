@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 16:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0003_precio_reserva'),
+        ('vehiculos', '0002_vehiculo_imagen_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['usuario', 'fecha_creacion', 'id'], name='reserva_usuario_listado_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 16:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0004_reserva_reserva_usuario_listado_idx'),
+        ('vehiculos', '0004_vehiculo_fecha_actualizacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OcupacionVehiculo',
+            fields=[
+                ('vehiculo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ocupacion', serialize=False, to='vehiculos.vehiculo')),
+                ('origen', models.DateField()),
+                ('dias', models.BinaryField(default=bytes)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Ocupacion de vehiculo',
+                'verbose_name_plural': 'Ocupacion de vehiculos',
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 16:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0005_ocupacionvehiculo'),
+        ('vehiculos', '0004_vehiculo_fecha_actualizacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['estado', 'fecha_creacion'], name='reserva_estado_creacion_idx'),
+        ),
+    ]
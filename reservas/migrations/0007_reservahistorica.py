@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-18 16:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0006_reserva_estado_creacion_idx'),
+        ('vehiculos', '0004_vehiculo_fecha_actualizacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservaHistorica',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fecha_inicio', models.DateField()),
+                ('fecha_fin', models.DateField()),
+                ('fecha_creacion', models.DateTimeField()),
+                ('fecha_actualizacion', models.DateTimeField()),
+                ('motivo_cancelacion', models.TextField(blank=True, null=True)),
+                ('precio_por_dia', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('total', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('fecha_archivado', models.DateTimeField()),
+                ('estado', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='reservas.estadoreserva')),
+                ('usuario', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('vehiculo', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='vehiculos.vehiculo')),
+            ],
+            options={
+                'verbose_name': 'Reserva historica',
+                'verbose_name_plural': 'Reservas historicas',
+                'ordering': ['-fecha_creacion'],
+            },
+        ),
+    ]
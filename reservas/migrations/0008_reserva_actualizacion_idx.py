@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 17:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0007_reservahistorica'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['fecha_actualizacion'], name='reserva_actualizacion_idx'),
+        ),
+    ]
@@ -1,4 +1,8 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from vehiculos.models import Vehiculo
 from django.core.exceptions import ValidationError
@@ -15,6 +19,91 @@ class EstadoReserva(models.Model):
         verbose_name = "Estado de Reserva"
         verbose_name_plural = "Estados de Reservas"
 
+class DiasReserva(models.Func):
+    """Cantidad de dias de una reserva (ambos extremos incluidos), calculada en la base."""
+    output_field = models.IntegerField()
+    
+    def __init__(self, fecha_inicio='fecha_inicio', fecha_fin='fecha_fin', **extra):
+        super().__init__(fecha_fin, fecha_inicio, **extra)
+    
+    def as_sql(self, compiler, connection, **extra_context):
+        # PostgreSQL y la mayoria de los motores: date - date devuelve dias enteros
+        return super().as_sql(compiler, connection, template='(%(expressions)s + 1)', arg_joiner=' - ', **extra_context)
+    
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='(CAST(julianday(%(expressions)s) AS INTEGER) + 1)', arg_joiner=') - julianday(',
+            **extra_context
+        )
+
+class ReservaQuerySet(models.QuerySet):
+    def con_total(self):
+        """Anota ``total_calculado`` (dias x precio por dia) en la misma consulta.
+        
+        Usa el precio guardado en la reserva y, para reservas anteriores a ese
+        campo, el precio actual del vehiculo.
+        """
+        precio = Coalesce('precio_por_dia', 'vehiculo__precio_por_dia')
+        return self.annotate(total_calculado=models.ExpressionWrapper(
+            DiasReserva() * precio,
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ))
+    
+    def total_facturado(self):
+        """Suma de los totales del queryset, resuelta con un solo agregado."""
+        return self.con_total().aggregate(total=Sum('total_calculado'))['total'] or Decimal('0')
+    
+    def cambiar_estado(self, estado, desde, **campos):
+        """Pasa a ``estado`` las reservas del queryset que esten en alguno de los estados ``desde``.
+
+        Es un UPDATE condicional: las fechas no cambian, asi que no se revalida
+        la superposicion (Reserva.clean), y de dos transiciones simultaneas de
+        la misma reserva solo una la encuentra en ``desde``. ``campos`` se
+        actualizan junto con el estado. Como update() no dispara senales, se
+        actualizan aca fecha_actualizacion, el mapa de ocupacion, la
+        disponibilidad actual de los vehiculos y la cache del catalogo.
+        Devuelve cuantas reservas cambiaron.
+        """
+        from django.db import transaction
+        from vehiculos import catalogo
+        from . import disponibilidad, disponibilidad_actual, ocupacion
+        from .referencias import estados
+
+        desde_ids = [anterior.pk for anterior in desde]
+        filas = list(self.filter(estado_id__in=desde_ids).values_list(
+            'pk', 'vehiculo_id', 'fecha_inicio', 'fecha_fin', 'estado_id',
+        ))
+        if not filas:
+            return 0
+
+        # Periodo a recalcular y reservas que cambian por vehiculo, solo si la reserva
+        # deja de ocupar o pasa a ocupar
+        activos = set(estados.ids(disponibilidad.ESTADOS_ACTIVOS))
+        periodos = {}
+        cambios = {}
+        for _, vehiculo_id, inicio, fin, anterior in filas:
+            if (anterior in activos) != (estado.pk in activos):
+                desde_periodo, hasta_periodo = periodos.get(vehiculo_id, (inicio, fin))
+                periodos[vehiculo_id] = (min(inicio, desde_periodo), max(fin, hasta_periodo))
+                cambios[vehiculo_id] = cambios.get(vehiculo_id, 0) + 1
+
+        with transaction.atomic(savepoint=False):
+            # Vehiculos primero y en orden de id, despues los mapas: el mismo orden
+            # que disponibilidad.reservar y las senales de Reserva
+            disponibilidad.bloquear_vehiculos(periodos)
+            # Solo las filas leidas: cada reserva que cambia tiene su periodo recalculado
+            cantidad = self.model.objects.filter(pk__in=[fila[0] for fila in filas], estado_id__in=desde_ids).update(
+                estado=estado, fecha_actualizacion=timezone.now(), **campos,
+            )
+            for vehiculo_id, (inicio, fin) in sorted(periodos.items()):
+                ocupacion.recalcular(vehiculo_id, inicio, fin)
+                cambio = cambios[vehiculo_id] if estado.pk in activos else -cambios[vehiculo_id]
+                disponibilidad_actual.ajustar(vehiculo_id, inicio, cambio)
+        if cantidad and periodos:
+            catalogo.invalidar_al_confirmar('disponibilidad')
+        return cantidad
+
 class Reserva(models.Model):
     usuario = models.ForeignKey(User, on_delete=models.CASCADE)
     vehiculo = models.ForeignKey(Vehiculo, on_delete=models.CASCADE)
@@ -24,6 +113,11 @@ class Reserva(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
     motivo_cancelacion = models.TextField(blank=True, null=True)
+    # Precio pactado al reservar; no cambia si luego se modifica la tarifa del vehiculo
+    precio_por_dia = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    total = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    
+    objects = ReservaQuerySet.as_manager()
     
     def __str__(self):
         return f"Reserva de {self.vehiculo} por {self.usuario.username} ({self.fecha_inicio} - {self.fecha_fin})"
@@ -37,24 +131,33 @@ class Reserva(models.Model):
         if self.fecha_fin < self.fecha_inicio:
             raise ValidationError("La fecha de fin debe ser posterior a la fecha de inicio.")
         
-        # Validar que el vehiculo no este reservado en las fechas seleccionadas
-        reservas_existentes = Reserva.objects.filter(
-            vehiculo=self.vehiculo,
-            estado__nombre__in=['Pendiente', 'Confirmada'],
-        ).exclude(id=self.id)
+        # Validar que el vehiculo no este reservado en las fechas seleccionadas.
+        # Sin vehiculo asignado todavia (validacion del formulario) no hay nada que comparar.
+        if self.vehiculo_id is None:
+            return
+        
+        from . import disponibilidad
+        if disponibilidad.ya_verificada(self):
+            return
         
-        for reserva in reservas_existentes:
-            if (self.fecha_inicio <= reserva.fecha_fin and self.fecha_fin >= reserva.fecha_inicio):
-                raise ValidationError(f"El vehiculo ya esta reservado en el periodo seleccionado. Reserva conflictiva: {reserva}")
+        reserva = disponibilidad.reserva_conflictiva(self.vehiculo_id, self.fecha_inicio, self.fecha_fin, excluir_id=self.id)
+        if reserva is not None:
+            raise ValidationError(f"El vehiculo ya esta reservado en el periodo seleccionado. Reserva conflictiva: {reserva}")
+        disponibilidad.marcar_verificada(self, self.vehiculo_id, self.fecha_inicio, self.fecha_fin)
     
     def save(self, *args, **kwargs):
         self.clean()
+        # Congelar el precio del vehiculo al momento de reservar
+        if self.precio_por_dia is None:
+            self.precio_por_dia = self.vehiculo.precio_por_dia
+        self.total = self.calcular_total()
         super().save(*args, **kwargs)
     
     def calcular_total(self):
         """Calcula el costo total de la reserva"""
         dias = (self.fecha_fin - self.fecha_inicio).days + 1
-        return dias * self.vehiculo.tarifa_diaria
+        precio = self.precio_por_dia if self.precio_por_dia is not None else self.vehiculo.precio_por_dia
+        return dias * precio
     
     def puede_cancelar_usuario(self):
         """Verifica si el usuario puede cancelar la reserva (24 horas antes)"""
@@ -66,4 +169,64 @@ class Reserva(models.Model):
     class Meta:
         verbose_name = "Reserva"
         verbose_name_plural = "Reservas"
-        ordering = ['-fecha_creacion']
\ No newline at end of file
+        ordering = ['-fecha_creacion']
+        indexes = [
+            # Consulta de disponibilidad. fecha_fin va antes que fecha_inicio: el rango
+            # fecha_fin >= inicio solo recorre reservas vigentes, no todo el historial.
+            models.Index(fields=['vehiculo', 'estado', 'fecha_fin', 'fecha_inicio'], name='reserva_disponibilidad_idx'),
+            # Listado del usuario paginado por cursor sobre (fecha_creacion, id)
+            models.Index(fields=['usuario', 'fecha_creacion', 'id'], name='reserva_usuario_listado_idx'),
+            # Barrido de reservas pendientes vencidas (reservas.vencimiento), en orden de creacion
+            models.Index(fields=['estado', 'fecha_creacion'], name='reserva_estado_creacion_idx'),
+            # Reservas modificadas desde la ultima actualizacion de los resumenes (reportes.resumenes)
+            models.Index(fields=['fecha_actualizacion'], name='reserva_actualizacion_idx'),
+        ]
+
+
+class OcupacionVehiculo(models.Model):
+    """Dias ocupados de un vehiculo como mapa de bits (ver reservas.ocupacion).
+
+    El bit i corresponde al dia ``origen + i``. Se deriva de las reservas
+    activas y se mantiene al guardar o borrar reservas; las reservas siguen
+    siendo la fuente de verdad.
+    """
+    vehiculo = models.OneToOneField(Vehiculo, on_delete=models.CASCADE, primary_key=True, related_name='ocupacion')
+    origen = models.DateField()
+    dias = models.BinaryField(default=bytes)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Ocupacion de {self.vehiculo_id} desde {self.origen}"
+
+    class Meta:
+        verbose_name = "Ocupacion de vehiculo"
+        verbose_name_plural = "Ocupacion de vehiculos"
+
+
+class ReservaHistorica(models.Model):
+    """Reserva terminada hace años, movida fuera de la tabla de reservas (ver reservas.historial).
+
+    Tiene las mismas columnas que Reserva, con el mismo id, y la fecha en que
+    se archivo. Las referencias no tienen restriccion de clave foranea: el
+    archivo conserva la fila aunque despues se borre el usuario o el vehiculo.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    usuario = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    vehiculo = models.ForeignKey(Vehiculo, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+')
+    fecha_inicio = models.DateField()
+    fecha_fin = models.DateField()
+    estado = models.ForeignKey(EstadoReserva, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+')
+    fecha_creacion = models.DateTimeField()
+    fecha_actualizacion = models.DateTimeField()
+    motivo_cancelacion = models.TextField(blank=True, null=True)
+    precio_por_dia = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    total = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    fecha_archivado = models.DateTimeField()
+
+    def __str__(self):
+        return f"Reserva archivada {self.pk} ({self.fecha_inicio} - {self.fecha_fin})"
+
+    class Meta:
+        verbose_name = "Reserva historica"
+        verbose_name_plural = "Reservas historicas"
+        ordering = ['-fecha_creacion']
@@ -0,0 +1,200 @@
+"""Mapa de ocupacion de cada vehiculo: un bit por dia.
+
+El calendario de disponibilidad y el selector de fechas necesitan saber que
+dias estan ocupados, mes por mes. En lugar de recorrer las reservas en cada
+pedido, cada vehiculo tiene una fila OcupacionVehiculo con un bit por dia a
+partir de ``origen`` (el primer dia del mes en que se construyo): un año
+ocupa 46 bytes y leer un rango es un desplazamiento y una mascara sobre un
+entero.
+
+El mapa lo construye ``manage.py reconstruir_ocupacion`` (con --faltantes,
+solo el de los vehiculos que no tienen; la API nunca lo guarda, mientras
+falte arma uno en memoria para el rango pedido) y despues se mantiene en
+forma incremental con las senales de Reserva: al crear una reserva activa
+se marcan sus dias; al confirmarla, cancelarla, cambiarle las fechas o
+borrarla se recalcula solo el rango afectado (el anterior y el nuevo) desde
+las reservas activas, con el vehiculo bloqueado y en la misma transaccion.
+Las senales nunca crean la fila, asi que un vehiculo que nadie consulto no
+paga nada al reservar.
+
+Las escrituras con ``update()`` o ``bulk_create()`` no disparan senales:
+despues de usarlas hay que llamar a ``recalcular()`` o ``reconstruir()``, o
+correr ``manage.py reconstruir_ocupacion``.
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+
+from . import disponibilidad
+from .models import OcupacionVehiculo, Reserva
+from .referencias import estados
+
+
+class Mapa:
+    """Dias ocupados a partir de ``origen``; el bit i es el dia ``origen + i``."""
+
+    def __init__(self, origen, dias=b''):
+        self.origen = origen
+        self.valor = int.from_bytes(dias, 'little')
+
+    def _bits(self, desde, hasta):
+        """(primer bit, cantidad) del periodo [desde, hasta], recortado al origen."""
+        inicio = max((desde - self.origen).days, 0)
+        return inicio, (hasta - self.origen).days + 1 - inicio
+
+    def marcar(self, desde, hasta, ocupado=True):
+        inicio, cantidad = self._bits(desde, hasta)
+        if cantidad <= 0:
+            return
+        mascara = ((1 << cantidad) - 1) << inicio
+        self.valor = self.valor | mascara if ocupado else self.valor & ~mascara
+
+    def ocupados(self, desde, hasta):
+        """Dias ocupados del periodo [desde, hasta], en orden."""
+        inicio, cantidad = self._bits(desde, hasta)
+        if cantidad <= 0:
+            return []
+        bits = (self.valor >> inicio) & ((1 << cantidad) - 1)
+        dias = []
+        while bits:
+            menor = bits & -bits
+            dias.append(self.origen + timedelta(days=inicio + menor.bit_length() - 1))
+            bits ^= menor
+        return dias
+
+    def periodos(self, desde, hasta):
+        """Periodos [desde, hasta] de dias ocupados consecutivos dentro del rango."""
+        periodos = []
+        for dia in self.ocupados(desde, hasta):
+            if periodos and periodos[-1][1] + timedelta(days=1) == dia:
+                periodos[-1][1] = dia
+            else:
+                periodos.append([dia, dia])
+        return periodos
+
+    def dias(self):
+        """Bytes a guardar; los dias libres al final no ocupan lugar."""
+        return self.valor.to_bytes((self.valor.bit_length() + 7) // 8, 'little')
+
+
+def mapa(ocupacion):
+    return Mapa(ocupacion.origen, bytes(ocupacion.dias))
+
+
+def marcar_reservas(mapa, vehiculo_id, desde, hasta):
+    """Marca en el mapa los dias [desde, hasta] ocupados por reservas activas."""
+    reservas = disponibilidad.reservas_superpuestas(vehiculo_id, desde, hasta).values_list('fecha_inicio', 'fecha_fin')
+    for inicio, fin in reservas.order_by():
+        mapa.marcar(max(inicio, desde), min(fin, hasta))
+
+
+def reconstruir(vehiculo_id):
+    """Construye (o rehace) el mapa del vehiculo desde sus reservas activas."""
+    origen = timezone.localdate().replace(day=1)
+    nuevo = Mapa(origen)
+    with transaction.atomic():
+        disponibilidad.bloquear_vehiculo(vehiculo_id)
+        marcar_reservas(nuevo, vehiculo_id, origen, origen.max)
+        ocupacion, _ = OcupacionVehiculo.objects.update_or_create(
+            vehiculo_id=vehiculo_id, defaults={'origen': origen, 'dias': nuevo.dias()},
+        )
+    return ocupacion
+
+
+def _bloquear(vehiculo_id):
+    """Devuelve el mapa del vehiculo bloqueado hasta el fin de la transaccion, o None si no tiene.
+
+    Mismo criterio que disponibilidad.bloquear_vehiculo, pero sobre la fila del
+    mapa: en SQLite el UPDATE sin efecto toma el bloqueo de escritura y ademas
+    dice si la fila existe, asi que sin mapa cuesta una sola consulta.
+    """
+    filas = OcupacionVehiculo.objects.filter(vehiculo_id=vehiculo_id)
+    if connection.features.has_select_for_update:
+        return filas.select_for_update().first()
+    if not filas.update(origen=F('origen')):
+        return None
+    return filas.first()
+
+
+def recalcular(vehiculo_id, desde, hasta, solo_marcar=False):
+    """Actualiza los dias [desde, hasta] del mapa del vehiculo, si el mapa existe.
+
+    Con ``solo_marcar`` marca el periodo como ocupado sin leer reservas (alta
+    de una reserva activa); si no, lo recalcula desde las reservas activas.
+    Corre en la transaccion de quien guarda la reserva: si falla, la reserva
+    tampoco se guarda. Quien llama ya bloqueo el vehiculo
+    (disponibilidad.bloquear_vehiculos): el mapa se bloquea siempre despues.
+    """
+    with transaction.atomic(savepoint=False):
+        ocupacion = _bloquear(vehiculo_id)
+        if ocupacion is None:
+            return
+        actual = mapa(ocupacion)
+        if solo_marcar:
+            actual.marcar(desde, hasta)
+        else:
+            actual.marcar(desde, hasta, ocupado=False)
+            marcar_reservas(actual, vehiculo_id, desde, hasta)
+        ocupacion.dias = actual.dias()
+        ocupacion.save(update_fields=['dias', 'fecha_actualizacion'])
+
+
+def _periodo(vehiculo_id, fecha_inicio, fecha_fin, estado_id):
+    """Lo que importa de una reserva para el mapa: vehiculo, fechas y si ocupa."""
+    return vehiculo_id, fecha_inicio, fecha_fin, estado_id in estados.ids(disponibilidad.ESTADOS_ACTIVOS)
+
+
+def _antes_de_guardar(sender, instance, raw=False, **kwargs):
+    instance._periodo_anterior = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    anterior = Reserva.objects.filter(pk=instance.pk).values_list(
+        'vehiculo_id', 'fecha_inicio', 'fecha_fin', 'estado_id',
+    ).first()
+    if anterior is not None:
+        instance._periodo_anterior = _periodo(*anterior)
+
+
+def _bloquear_vehiculos(instance, *vehiculo_ids):
+    # Antes que el mapa, como cambiar_estado (ver disponibilidad.bloquear_vehiculos);
+    # disponibilidad.reservar ya bloqueo el vehiculo de la reserva que guarda
+    disponibilidad.bloquear_vehiculos(
+        vehiculo_id for vehiculo_id in vehiculo_ids
+        if vehiculo_id != getattr(instance, '_vehiculo_bloqueado', None)
+    )
+
+
+def _reserva_guardada(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    actual = _periodo(instance.vehiculo_id, instance.fecha_inicio, instance.fecha_fin, instance.estado_id)
+    anterior = getattr(instance, '_periodo_anterior', None)
+    if created or anterior is None:
+        if actual[3]:
+            _bloquear_vehiculos(instance, actual[0])
+            recalcular(*actual[:3], solo_marcar=True)
+        return
+    if anterior == actual:
+        return
+    vehiculo_id, inicio, fin, _ = actual
+    vehiculo_anterior, inicio_anterior, fin_anterior, _ = anterior
+    _bloquear_vehiculos(instance, vehiculo_id, vehiculo_anterior)
+    if vehiculo_anterior == vehiculo_id:
+        recalcular(vehiculo_id, min(inicio, inicio_anterior), max(fin, fin_anterior))
+    else:
+        recalcular(vehiculo_anterior, inicio_anterior, fin_anterior)
+        recalcular(vehiculo_id, inicio, fin)
+
+
+def _reserva_borrada(sender, instance, **kwargs):
+    _bloquear_vehiculos(instance, instance.vehiculo_id)
+    recalcular(instance.vehiculo_id, instance.fecha_inicio, instance.fecha_fin)
+
+
+def conectar_senales():
+    pre_save.connect(_antes_de_guardar, sender='reservas.Reserva', dispatch_uid='ocupacion-reserva')
+    post_save.connect(_reserva_guardada, sender='reservas.Reserva', dispatch_uid='ocupacion-reserva')
+    post_delete.connect(_reserva_borrada, sender='reservas.Reserva', dispatch_uid='ocupacion-reserva')
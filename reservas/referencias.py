@@ -0,0 +1,57 @@
+"""Cache en proceso de las filas de referencia sembradas.
+
+Los estados de reserva, metodos de pago y demas catalogos se definen en la
+siembra inicial y casi nunca cambian, pero cada transicion de estado los
+buscaba por nombre con una consulta. CacheReferencia los carga una vez por
+proceso, indexados por nombre, y se invalida con post_save/post_delete del
+modelo. Un nombre que no esta en la cache la recarga una vez antes de
+fallar, asi se ven las filas creadas sin senales (bulk_create de
+sembrar_datos, otro proceso); los cambios y bajas hechos desde otro proceso
+se ven al reiniciarlo.
+"""
+from django.db.models.signals import post_delete, post_save
+
+from .models import EstadoReserva
+
+
+class CacheReferencia:
+    """Filas de un modelo de referencia indexadas por su campo ``nombre``."""
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self._por_nombre = None
+        post_save.connect(self.limpiar, sender=modelo, weak=False)
+        post_delete.connect(self.limpiar, sender=modelo, weak=False)
+
+    def _filas(self):
+        filas = self._por_nombre
+        if filas is None:
+            filas = {fila.nombre: fila for fila in self.modelo.objects.all()}
+            # Una tabla vacia (todavia sin sembrar) no se guarda: se vuelve a leer
+            if filas:
+                self._por_nombre = filas
+        return filas
+
+    def get(self, nombre):
+        """Devuelve la fila con ese nombre; lanza DoesNotExist como objects.get()."""
+        cargadas = self._por_nombre
+        filas = self._filas()
+        if nombre not in filas and cargadas is not None:
+            # Puede haberse creado sin senales despues de cargar la cache
+            self.limpiar()
+            filas = self._filas()
+        try:
+            return filas[nombre]
+        except KeyError:
+            raise self.modelo.DoesNotExist(f"{self.modelo._meta.object_name} '{nombre}' no existe.") from None
+
+    def ids(self, nombres):
+        """Ids de las filas con esos nombres; lanza DoesNotExist si falta alguna, como get()."""
+        return [self.get(nombre).pk for nombre in nombres]
+
+    def limpiar(self, **kwargs):
+        """Descarta el contenido; la proxima consulta lo recarga."""
+        self._por_nombre = None
+
+
+estados = CacheReferencia(EstadoReserva)
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'reservas'
 
@@ -9,4 +9,7 @@ urlpatterns = [
     path('crear/<int:vehiculo_id>/', views.crear_reserva, name='crear'),
     path('cancelar/<int:pk>/', views.cancelar_reserva, name='cancelar'),
     path('admin-cancelar/<int:pk>/', views.admin_cancelar_reserva, name='admin_cancelar'),
+    # API JSON de solo lectura
+    path('api/disponibilidad/<int:vehiculo_id>/', api.calendario, name='api-disponibilidad'),
+    path('api/calendario/<int:vehiculo_id>/', api.calendario_mensual, name='api-calendario'),
 ]
\ No newline at end of file
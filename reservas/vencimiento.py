@@ -0,0 +1,71 @@
+"""Vencimiento de las reservas pendientes de pago.
+
+crear_reserva deja la reserva en Pendiente hasta que se paga, y una reserva
+pendiente ocupa el vehiculo (disponibilidad.ESTADOS_ACTIVOS). Si el cliente
+abandona el pago, la reserva bloquearia esas fechas para siempre y seguiria
+entrando en cada consulta de superposicion. vencer_pendientes pasa a Vencida
+las pendientes creadas hace mas de RESERVAS_PENDIENTES_TTL.
+
+El barrido recorre el indice (estado, fecha_creacion) de Reserva en orden de
+creacion y cambia el estado por lotes con UPDATE condicionales
+(ReservaQuerySet.cambiar_estado), que actualizan tambien el mapa de
+ocupacion y la cache del catalogo. Cada lote es una transaccion corta; si
+una reserva se paga mientras tanto, el UPDATE ya no la encuentra en
+Pendiente. Si vence mientras la pasarela cobra, pagos.procesamiento anula el
+cobro.
+
+Se corre con ``manage.py vencer_reservas`` desde cron, o con ``--cada`` como
+proceso que repite el barrido.
+"""
+import logging
+
+from django.conf import settings
+from django.utils import timezone
+
+from alquileres_maria import metricas
+from .models import EstadoReserva, Reserva
+from .referencias import estados
+
+logger = logging.getLogger(__name__)
+
+LOTE = 500
+
+# Contador de alquileres_maria.metricas con las reservas vencidas
+METRICA_VENCIDAS = 'reservas_vencidas'
+
+
+def estado_vencida():
+    try:
+        return estados.get('Vencida')
+    except EstadoReserva.DoesNotExist:
+        # Bases sembradas antes de que existiera el estado
+        return EstadoReserva.objects.get_or_create(nombre='Vencida')[0]
+
+
+def pendientes_vencidas(limite):
+    """Pendientes creadas antes de ``limite``, de la mas vieja a la mas nueva."""
+    return Reserva.objects.filter(
+        estado=estados.get('Pendiente'), fecha_creacion__lt=limite,
+    ).order_by('fecha_creacion')
+
+
+def vencer_pendientes(ttl=None, lote=LOTE):
+    """Pasa a Vencida las pendientes mas viejas que ``ttl``; devuelve cuantas vencieron.
+
+    ``ttl`` es un timedelta; por defecto, RESERVAS_PENDIENTES_TTL.
+    """
+    limite = timezone.now() - (ttl if ttl is not None else settings.RESERVAS_PENDIENTES_TTL)
+    pendiente, vencida = estados.get('Pendiente'), estado_vencida()
+    total = 0
+    while True:
+        ids = list(pendientes_vencidas(limite).values_list('pk', flat=True)[:lote])
+        if not ids:
+            break
+        total += Reserva.objects.filter(pk__in=ids).cambiar_estado(vencida, desde=[pendiente])
+        if len(ids) < lote:
+            break
+
+    if total:
+        metricas.incrementar(METRICA_VENCIDAS, total)
+        logger.info("Vencieron %s reservas pendientes creadas antes de %s", total, limite)
+    return total
@@ -4,20 +4,39 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import ListView, DetailView
 from django.contrib import messages
 from django.urls import reverse
-from .models import Reserva, EstadoReserva
+from .models import Reserva
 from .forms import ReservaForm, CancelarReservaForm
+from . import disponibilidad
+from .referencias import estados
 from vehiculos.models import Vehiculo
+from alquileres_maria.paginacion import PaginacionCursorMixin
+from alquileres_maria.replicas import solo_lectura
 from django.utils import timezone
 
-class ReservaListView(LoginRequiredMixin, ListView):
+# Columnas necesarias para mostrar una reserva en un listado
+CAMPOS_LISTADO_RESERVA = [
+    'fecha_inicio', 'fecha_fin', 'fecha_creacion',
+    'estado__nombre', 'usuario__username',
+    'vehiculo__modelo', 'vehiculo__ano', 'vehiculo__patente', 'vehiculo__imagen', 'vehiculo__marca__nombre',
+]
+
+@solo_lectura
+class ReservaListView(LoginRequiredMixin, PaginacionCursorMixin, ListView):
     model = Reserva
     template_name = 'reservas/reserva_list.html'
     context_object_name = 'reservas'
     paginate_by = 10
+    # Paginacion por cursor sobre el indice reserva_usuario_listado_idx
+    ordenamiento = ['-fecha_creacion', '-id']
     
     def get_queryset(self):
-        # Mostrar solo las reservas del usuario actual
-        return Reserva.objects.filter(usuario=self.request.user).order_by('-fecha_creacion')
+        # Mostrar solo las reservas del usuario actual, con vehiculo, marca,
+        # estado y usuario cargados en la misma consulta (Reserva.__str__ los usa)
+        return (
+            Reserva.objects.filter(usuario=self.request.user)
+            .select_related('vehiculo__marca', 'estado', 'usuario')
+            .only(*CAMPOS_LISTADO_RESERVA)
+        )
 
 class ReservaDetailView(LoginRequiredMixin, DetailView):
     model = Reserva
@@ -41,17 +60,13 @@ def crear_reserva(request, vehiculo_id):
     
     if request.method == 'POST':
         form = ReservaForm(request.POST, vehiculo=vehiculo, usuario=request.user)
-        if form.is_valid():
-            # Crear la reserva
-            reserva = form.save(commit=False)
-            reserva.usuario = request.user
-            reserva.vehiculo = vehiculo
-            
-            # Obtener el estado "Pendiente"
-            estado_pendiente = EstadoReserva.objects.get(nombre='Pendiente')
-            reserva.estado = estado_pendiente
-            
-            reserva.save()
+        
+        # Obtener el estado "Pendiente"
+        estado_pendiente = estados.get('Pendiente')
+        
+        # Crear la reserva: la validacion y el guardado se hacen con el vehiculo bloqueado
+        reserva = disponibilidad.reservar(form, request.user, vehiculo, estado_pendiente)
+        if reserva is not None:
             messages.success(request, "Reserva creada exitosamente. Proceda a realizar el pago.")
             return redirect('pagos:procesar_pago', reserva_id=reserva.id)
     else:
@@ -74,11 +89,15 @@ def cancelar_reserva(request, pk):
     if request.method == 'POST':
         form = CancelarReservaForm(request.POST)
         if form.is_valid():
-            # Obtener el estado "Cancelada"
-            estado_cancelada = EstadoReserva.objects.get(nombre='Cancelada')
-            reserva.estado = estado_cancelada
-            reserva.motivo_cancelacion = form.cleaned_data['motivo_cancelacion']
-            reserva.save()
+            # Cambio de estado sin revalidar fechas; falla si la reserva ya no esta activa
+            cancelada = Reserva.objects.filter(pk=reserva.pk).cambiar_estado(
+                estados.get('Cancelada'),
+                desde=[estados.get(nombre) for nombre in disponibilidad.ESTADOS_ACTIVOS],
+                motivo_cancelacion=form.cleaned_data['motivo_cancelacion'],
+            )
+            if not cancelada:
+                messages.error(request, "La reserva ya no esta activa.")
+                return redirect('reservas:detalle', pk=reserva.id)
             
             messages.success(request, "Reserva cancelada exitosamente.")
             return redirect('reservas:lista')
@@ -102,11 +121,15 @@ def admin_cancelar_reserva(request, pk):
     if request.method == 'POST':
         form = CancelarReservaForm(request.POST)
         if form.is_valid():
-            # Obtener el estado "Cancelada por Admin"
-            estado_cancelada = EstadoReserva.objects.get(nombre='Cancelada por Admin')
-            reserva.estado = estado_cancelada
-            reserva.motivo_cancelacion = form.cleaned_data['motivo_cancelacion']
-            reserva.save()
+            # Cambio de estado sin revalidar fechas: tambien sirve para reservas ya iniciadas
+            cancelada = Reserva.objects.filter(pk=reserva.pk).cambiar_estado(
+                estados.get('Cancelada por Admin'),
+                desde=[estados.get(nombre) for nombre in disponibilidad.ESTADOS_ACTIVOS],
+                motivo_cancelacion=form.cleaned_data['motivo_cancelacion'],
+            )
+            if not cancelada:
+                messages.error(request, "La reserva ya no esta activa.")
+                return redirect('admin:reservas_reserva_changelist')
             
             messages.success(request, "Reserva cancelada exitosamente.")
             return redirect('admin:reservas_reserva_changelist')
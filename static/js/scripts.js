@@ -3,6 +3,12 @@ document.addEventListener('DOMContentLoaded', function() {
     // Aplicar esquema de colores verde con negro
     applyGreenBlackColorScheme();
     
+    // Calendario de disponibilidad en el formulario de reserva
+    initAvailabilityCalendar();
+    
+    // Estado de un pago en proceso
+    initPaymentStatus();
+    
     // Formatear numero de tarjeta
     const cardNumberInput = document.getElementById('id_numero_tarjeta');
     if (cardNumberInput) {
@@ -105,4 +111,165 @@ function applyGreenBlackColorScheme() {
         element.classList.remove('border-primary', 'active-primary');
         element.classList.add('border-success', 'active-success');
     });
-}
\ No newline at end of file
+}
+
+// Calendario de disponibilidad del formulario de reserva: muestra los dias
+// ocupados (y los pasados) deshabilitados, permite elegir el periodo con dos
+// clics y marca como invalido un periodo que incluya dias ocupados.
+function initAvailabilityCalendar() {
+    const startInput = document.querySelector('input[data-calendario]');
+    const endInput = document.getElementById('id_fecha_fin');
+    if (!startInput || !endInput) {
+        return;
+    }
+    
+    const busy = new Set();
+    const today = new Date();
+    const todayKey = dateKey(today.getFullYear(), today.getMonth() + 1, today.getDate());
+    let shownMonth = new Date(today.getFullYear(), today.getMonth(), 1);
+    
+    const container = document.createElement('div');
+    container.className = 'calendario-disponibilidad mt-3';
+    endInput.parentNode.appendChild(container);
+    
+    fetch(startInput.dataset.calendario + '?meses=12')
+        .then(response => response.json())
+        .then(data => {
+            data.meses.forEach(mes => {
+                const [year, month] = mes.mes.split('-').map(Number);
+                mes.ocupados.forEach(day => busy.add(dateKey(year, month, day)));
+            });
+            render();
+            validate();
+        });
+    
+    startInput.addEventListener('change', validate);
+    endInput.addEventListener('change', validate);
+    
+    function dateKey(year, month, day) {
+        return year + '-' + String(month).padStart(2, '0') + '-' + String(day).padStart(2, '0');
+    }
+    
+    // Dias ocupados entre dos fechas AAAA-MM-DD, inclusive
+    function busyBetween(start, end) {
+        return Array.from(busy).filter(day => day >= start && day <= end);
+    }
+    
+    function validate() {
+        const start = startInput.value;
+        const end = endInput.value;
+        let message = '';
+        if (busy.has(start)) {
+            message = 'El vehiculo esta ocupado en la fecha de inicio.';
+        } else if (start && end && busyBetween(start, end).length) {
+            message = 'El vehiculo ya esta reservado en parte del periodo seleccionado.';
+        }
+        endInput.setCustomValidity(message);
+        render();
+    }
+    
+    function select(key) {
+        if (!startInput.value || endInput.value || key < startInput.value || busyBetween(startInput.value, key).length) {
+            startInput.value = key;
+            endInput.value = '';
+        } else {
+            endInput.value = key;
+        }
+        validate();
+    }
+    
+    function render() {
+        const year = shownMonth.getFullYear();
+        const month = shownMonth.getMonth();
+        const days = new Date(year, month + 1, 0).getDate();
+        // Semana de lunes a domingo
+        const offset = (new Date(year, month, 1).getDay() + 6) % 7;
+        
+        let html = '<div class="d-flex justify-content-between align-items-center mb-2">' +
+            '<button type="button" class="btn btn-sm btn-outline-success" data-mes="-1">&laquo;</button>' +
+            '<strong>' + shownMonth.toLocaleDateString('es-AR', {month: 'long', year: 'numeric'}) + '</strong>' +
+            '<button type="button" class="btn btn-sm btn-outline-success" data-mes="1">&raquo;</button></div>' +
+            '<div class="calendario-grilla">';
+        ['Lu', 'Ma', 'Mi', 'Ju', 'Vi', 'Sa', 'Do'].forEach(name => {
+            html += '<span class="calendario-encabezado">' + name + '</span>';
+        });
+        for (let i = 0; i < offset; i++) {
+            html += '<span></span>';
+        }
+        for (let day = 1; day <= days; day++) {
+            const key = dateKey(year, month + 1, day);
+            const classes = ['calendario-dia'];
+            if (busy.has(key)) {
+                classes.push('ocupado');
+            }
+            if (key >= startInput.value && key <= (endInput.value || startInput.value)) {
+                classes.push('seleccionado');
+            }
+            const disabled = busy.has(key) || key < todayKey ? ' disabled' : '';
+            html += '<button type="button" class="' + classes.join(' ') + '" data-dia="' + key + '"' + disabled + '>' + day + '</button>';
+        }
+        container.innerHTML = html + '</div>';
+        
+        container.querySelectorAll('[data-mes]').forEach(button => {
+            button.addEventListener('click', () => {
+                shownMonth = new Date(year, month + Number(button.dataset.mes), 1);
+                render();
+            });
+        });
+        container.querySelectorAll('[data-dia]').forEach(button => {
+            button.addEventListener('click', () => select(button.dataset.dia));
+        });
+    }
+}
+
+// Pagina de estado de un pago: recibe los cambios por eventos del servidor
+// (EventSource) o, si el navegador no los soporta, consultando cada 2 segundos.
+// Al aprobarse el pago sigue al detalle de la reserva.
+function initPaymentStatus() {
+    const card = document.querySelector('[data-estado-pago]');
+    if (!card) {
+        return;
+    }
+    
+    function show(state) {
+        card.querySelector('[data-estado-descripcion]').textContent = state.descripcion;
+        card.querySelector('[data-estado-mensaje]').textContent = state.mensaje;
+        if (!state.finalizada) {
+            return false;
+        }
+        if (state.estado === 'aprobada') {
+            window.location.href = state.siguiente;
+        }
+        const next = card.querySelector('[data-estado-siguiente]');
+        next.href = state.siguiente;
+        next.classList.remove('d-none');
+        return true;
+    }
+    
+    function poll() {
+        fetch(card.dataset.estadoPago)
+            .then(response => response.json())
+            .then(state => {
+                if (!show(state)) {
+                    setTimeout(poll, 2000);
+                }
+            });
+    }
+    
+    if (!window.EventSource) {
+        poll();
+        return;
+    }
+    const source = new EventSource(card.dataset.eventosPago);
+    source.onmessage = function(event) {
+        if (show(JSON.parse(event.data))) {
+            source.close();
+        }
+    };
+    // El servidor cierra el flujo al terminar el pago o al vencer el plazo:
+    // seguir por polling en lugar de reconectar
+    source.onerror = function() {
+        source.close();
+        poll();
+    };
+}
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+# auth.User es de Django: el indice se agrega desde esta app con el schema editor
+INDICE_EMAIL = models.Index(fields=['email'], name='usuario_email_idx')
+
+
+def crear_indice(apps, schema_editor):
+    schema_editor.add_index(apps.get_model('auth', 'User'), INDICE_EMAIL)
+
+
+def borrar_indice(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model('auth', 'User'), INDICE_EMAIL)
+
+
+class Migration(migrations.Migration):
+    """Indice sobre auth_user.email: RegistroUsuarioForm.clean_email busca usuarios por email."""
+
+    dependencies = [
+        ('usuarios', '0001_initial'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
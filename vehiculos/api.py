@@ -0,0 +1,134 @@
+"""API JSON de solo lectura del catalogo de vehiculos.
+
+Los datos se leen con ``.values()`` (sin instanciar modelos) y las
+respuestas llevan ETag; ver alquileres_maria.api.
+"""
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+
+from alquileres_maria.api import error, etag, respuesta_condicional
+from alquileres_maria.paginacion import CursorInvalido, PaginadorCursor
+from . import catalogo, imagenes
+from .forms import BusquedaVehiculoForm
+from .models import Vehiculo
+
+POR_PAGINA = 50
+# Mismo orden que el catalogo HTML (indice vehiculo_catalogo_idx)
+ORDENAMIENTO = ['-ano', 'marca', 'modelo', 'id']
+
+# Clave publicada -> campo de values()
+COLUMNAS = {
+    'id': 'id',
+    'marca': 'marca__nombre',
+    'modelo': 'modelo',
+    'tipo': 'tipo__nombre',
+    'ano': 'ano',
+    'patente': 'patente',
+    'capacidad': 'capacidad',
+    'precio_por_dia': 'precio_por_dia',
+    'kilometraje': 'kilometraje',
+    'politica_reembolso': 'politica_reembolso__nombre',
+    'porcentaje_reembolso': 'politica_reembolso__porcentaje',
+    'disponible': 'disponible',
+    'fecha_actualizacion': 'fecha_actualizacion',
+}
+# Columnas que se leen ademas de las publicadas: orden del cursor e imagen
+COLUMNAS_INTERNAS = ['marca_id', 'imagen', 'imagen_hash']
+
+
+def serializar(fila):
+    vehiculo = {clave: fila[campo] for clave, campo in COLUMNAS.items()}
+    vehiculo['imagenes'] = urls_imagen(fila['imagen'], fila['imagen_hash'])
+    vehiculo['url'] = reverse('vehiculos:api-detalle', args=[fila['id']])
+    return vehiculo
+
+
+def urls_imagen(nombre, hash_imagen):
+    """URLs de la imagen original y, si ya se generaron, de sus variantes."""
+    if not nombre:
+        return None
+    urls = {'original': default_storage.url(nombre)}
+    if hash_imagen:
+        for variante in imagenes.VARIANTES:
+            for extension in imagenes.FORMATOS:
+                urls[f'{variante}_{extension}'] = default_storage.url(
+                    imagenes.ruta_variante(hash_imagen, variante, extension)
+                )
+    return urls
+
+
+def vehiculos_filtrados(parametros):
+    """Queryset filtrado y el formulario de busqueda (None si los filtros son invalidos)."""
+    vehiculos = Vehiculo.objects.all()
+    disponible = parametros.get('disponible')
+    if disponible in ('true', 'false'):
+        vehiculos = vehiculos.filter(disponible=disponible == 'true')
+    form = BusquedaVehiculoForm(parametros)
+    if not form.is_valid():
+        return None, form
+    return form.filtrar(vehiculos), form
+
+
+def marca_de_agua(vehiculos, form):
+    """Partes del ETag del listado: vehiculos filtrados y, si se filtra por fechas, las reservas.
+
+    Las reservas no se agregan en la base (seria recorrer todas las del
+    periodo en cada consulta): se usa la version del ambito
+    ``disponibilidad`` del catalogo, que cambia con cualquier reserva.
+    """
+    partes = list(vehiculos.aggregate(ultima=Max('fecha_actualizacion'), cantidad=Count('id')).values())
+    if form.cleaned_data['fecha_inicio'] and form.cleaned_data['fecha_fin']:
+        partes += catalogo.versiones('disponibilidad')
+    return partes
+
+
+@require_GET
+def lista(request):
+    vehiculos, form = vehiculos_filtrados(request.GET)
+    if vehiculos is None:
+        return error("Filtros invalidos.", errores=form.errors.get_json_data())
+
+    cursor = request.GET.get('cursor')
+    version = etag('vehiculos', sorted(request.GET.items()), *marca_de_agua(vehiculos, form))
+
+    def construir():
+        paginador = PaginadorCursor(
+            vehiculos.values(*COLUMNAS.values(), *COLUMNAS_INTERNAS), POR_PAGINA, ORDENAMIENTO,
+        )
+        pagina = paginador.pagina(cursor)
+        return {
+            'resultados': [serializar(fila) for fila in pagina],
+            'anterior': enlace(request, pagina.cursor_anterior),
+            'siguiente': enlace(request, pagina.cursor_siguiente),
+        }
+
+    try:
+        return respuesta_condicional(request, version, construir)
+    except CursorInvalido:
+        return error("Cursor de paginacion invalido.")
+
+
+def enlace(request, cursor):
+    if cursor is None:
+        return None
+    parametros = request.GET.copy()
+    parametros['cursor'] = cursor
+    return f'{request.path}?{parametros.urlencode()}'
+
+
+@require_GET
+def detalle(request, pk):
+    fila = Vehiculo.objects.filter(pk=pk).values(*COLUMNAS.values(), *COLUMNAS_INTERNAS, 'descripcion').first()
+    if fila is None:
+        return error("Vehiculo inexistente.", estado=404)
+
+    def construir():
+        vehiculo = serializar(fila)
+        vehiculo['descripcion'] = fila['descripcion']
+        vehiculo['disponibilidad'] = reverse('reservas:api-disponibilidad', args=[pk])
+        vehiculo['calendario'] = reverse('reservas:api-calendario', args=[pk])
+        return vehiculo
+
+    return respuesta_condicional(request, etag('vehiculo', pk, fila['fecha_actualizacion']), construir)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class VehiculosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'vehiculos'
+
+    def ready(self):
+        from . import catalogo
+        catalogo.conectar_senales()
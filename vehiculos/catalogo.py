@@ -0,0 +1,151 @@
+"""Cache del catalogo publico de vehiculos.
+
+El listado y el detalle son publicos, se leen mucho y cambian poco. Se
+cachean los vehiculos de cada pagina (segun los filtros y el cursor de
+paginacion), el vehiculo del detalle y las marcas y tipos de los filtros;
+el HTML se sigue generando por request porque la barra de navegacion
+depende del usuario. Las tarjetas se cachean como fragmentos de
+plantilla (``vehiculos/_tarjeta.html``).
+
+Las claves llevan el numero de version de los ambitos de los que dependen y
+las senales de Vehiculo, Marca, TipoVehiculo, PoliticaReembolso y Reserva
+incrementan solo los ambitos afectados, asi que no hace falta borrar claves
+(ni conocerlas) y funciona igual con la cache en memoria, en archivos o
+compartida entre procesos:
+
+* ``flota``: cualquier vehiculo o catalogo de referencia; lo usa el listado.
+* ``disponibilidad``: las reservas; solo lo usan los listados filtrados por fechas.
+* ``referencias``: marcas, tipos y politicas; los filtros, el detalle y las tarjetas.
+* ``vehiculo:<id>``: un vehiculo; su detalle y su tarjeta.
+
+Las escrituras con ``update()`` o ``bulk_create()`` no disparan senales y
+deben llamar a ``invalidar()`` por su cuenta.
+
+Con replica de lectura (alquileres_maria.replicas), lo que falta en la cache
+durante REPLICA_RETRASO_TOLERADO segundos despues de una invalidacion se
+calcula en la principal: la replica puede no tener todavia el cambio y el
+valor viejo quedaria guardado con la version nueva.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from alquileres_maria import replicas
+
+# Segundos que se conserva cada entrada aunque no haya cambios
+DURACION = 15 * 60
+
+# Parametros del listado que cambian el resultado; el resto se ignora en la clave
+PARAMETROS_LISTADO = [
+    'disponible', 'marca', 'tipo', 'capacidad_minima', 'libre_hoy', 'fecha_inicio', 'fecha_fin', 'orden', 'cursor',
+]
+
+
+# Marca de que hubo una invalidacion hace menos de REPLICA_RETRASO_TOLERADO segundos
+CLAVE_RECIENTE = 'catalogo:invalidado'
+
+
+def _clave_version(ambito):
+    return f'catalogo:version:{ambito}'
+
+
+def versiones(*ambitos):
+    """Version actual de cada ambito, en el mismo orden, con una sola lectura de la cache."""
+    claves = [_clave_version(ambito) for ambito in ambitos]
+    actuales = cache.get_many(claves)
+    for clave in claves:
+        if clave not in actuales:
+            # Arrancar desde el reloj y no desde 1: si la cache perdio la version,
+            # las entradas viejas que siguieran guardadas no vuelven a ser validas
+            inicial = time.time_ns()
+            cache.add(clave, inicial, None)
+            actuales[clave] = cache.get(clave, inicial)
+    return [actuales[clave] for clave in claves]
+
+
+def invalidar(*ambitos):
+    """Incrementa la version de los ambitos; las entradas que dependen de ellos dejan de usarse."""
+    for ambito in ambitos:
+        clave = _clave_version(ambito)
+        try:
+            cache.incr(clave)
+        except ValueError:
+            cache.add(clave, time.time_ns(), None)
+    if ambitos and replicas.configurada():
+        cache.set(CLAVE_RECIENTE, True, settings.REPLICA_RETRASO_TOLERADO)
+
+
+def invalidar_al_confirmar(*ambitos):
+    """Invalida cuando se confirma la transaccion, para no recachear datos todavia sin guardar."""
+    transaction.on_commit(lambda: invalidar(*ambitos))
+
+
+def obtener(clave, calcular, duracion=DURACION):
+    """Devuelve el valor cacheado o lo calcula y lo guarda."""
+    valor = cache.get(clave)
+    if valor is None:
+        if replicas.en_replica() and cache.get(CLAVE_RECIENTE):
+            with replicas.primaria():
+                valor = calcular()
+        else:
+            valor = calcular()
+        cache.set(clave, valor, duracion)
+    return valor
+
+
+def clave_listado(parametros):
+    """Clave de una pagina del listado segun sus filtros y su cursor."""
+    filtros = sorted((nombre, parametros.get(nombre)) for nombre in PARAMETROS_LISTADO if parametros.get(nombre))
+    ambitos = ['flota']
+    if parametros.get('fecha_inicio') and parametros.get('fecha_fin'):
+        ambitos.append('disponibilidad')
+    version = '-'.join(str(numero) for numero in versiones(*ambitos))
+    resumen = hashlib.sha1(urlencode(filtros).encode('utf-8')).hexdigest()
+    return f'catalogo:listado:{version}:{resumen}'
+
+
+def version_vehiculo(vehiculo_id):
+    return '-'.join(str(numero) for numero in versiones(f'vehiculo:{vehiculo_id}', 'referencias'))
+
+
+def clave_vehiculo(vehiculo_id):
+    return f'catalogo:vehiculo:{vehiculo_id}:{version_vehiculo(vehiculo_id)}'
+
+
+def clave_referencias(nombre):
+    return f'catalogo:{nombre}:{versiones("referencias")[0]}'
+
+
+def anotar_versiones(vehiculos):
+    """Guarda en cada vehiculo la version con la que se cachea su tarjeta."""
+    if not vehiculos:
+        return
+    ambitos = [f'vehiculo:{vehiculo.pk}' for vehiculo in vehiculos] + ['referencias']
+    *propias, referencias = versiones(*ambitos)
+    for vehiculo, propia in zip(vehiculos, propias):
+        vehiculo.version_catalogo = f'{propia}-{referencias}'
+
+
+def _vehiculo_modificado(sender, instance, **kwargs):
+    invalidar_al_confirmar('flota', f'vehiculo:{instance.pk}')
+
+
+def _referencia_modificada(sender, instance, **kwargs):
+    invalidar_al_confirmar('flota', 'referencias')
+
+
+def _reserva_modificada(sender, instance, **kwargs):
+    invalidar_al_confirmar('disponibilidad')
+
+
+def conectar_senales():
+    for senal in (post_save, post_delete):
+        senal.connect(_vehiculo_modificado, sender='vehiculos.Vehiculo', dispatch_uid='catalogo-vehiculo')
+        for modelo in ('vehiculos.Marca', 'vehiculos.TipoVehiculo', 'vehiculos.PoliticaReembolso'):
+            senal.connect(_referencia_modificada, sender=modelo, dispatch_uid=f'catalogo-{modelo}')
+        senal.connect(_reserva_modificada, sender='reservas.Reserva', dispatch_uid='catalogo-reserva')
@@ -1,38 +1,89 @@
 from django import forms
 from .models import Vehiculo
 
-# class BusquedaVehiculoForm(forms.Form):
-#     fecha_inicio = forms.DateField(
-#         widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
-#         required=True
-#     )
-#     fecha_fin = forms.DateField(
-#         widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
-#         required=True
-#     )
-#     tipo = forms.ModelChoiceField(
-#         queryset=None,
-#         required=False,
-#         empty_label="Todos los tipos",
-#         widget=forms.Select(attrs={'class': 'form-select'})
-#     )
-#     marca = forms.ModelChoiceField(
-#         queryset=None,
-#         required=False,
-#         empty_label="Todas las marcas",
-#         widget=forms.Select(attrs={'class': 'form-select'})
-#     )
-#     capacidad_minima = forms.IntegerField(
-#         required=False,
-#         min_value=1,
-#         widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Capacidad minima'})
-#     )
+class BusquedaVehiculoForm(forms.Form):
+    """Filtros del listado de vehículos, incluida la disponibilidad por fechas."""
+    fecha_inicio = forms.DateField(
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+        required=False
+    )
+    fecha_fin = forms.DateField(
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+        required=False
+    )
+    tipo = forms.ModelChoiceField(
+        queryset=None,
+        required=False,
+        empty_label="Todos los tipos",
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    marca = forms.ModelChoiceField(
+        queryset=None,
+        required=False,
+        empty_label="Todas las marcas",
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    capacidad_minima = forms.IntegerField(
+        required=False,
+        min_value=1,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Capacidad minima'})
+    )
+    libre_hoy = forms.BooleanField(
+        required=False,
+        label="Libre hoy",
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
     
-    # def __init__(self, *args, **kwargs):
-    #     super().__init__(*args, **kwargs)
-    #     from .models import TipoVehiculo, Marca
-    #     self.fields['tipo'].queryset = TipoVehiculo.objects.all()
-    #     self.fields['marca'].queryset = Marca.objects.all()
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        from .models import TipoVehiculo, Marca
+        self.fields['tipo'].queryset = TipoVehiculo.objects.all()
+        self.fields['marca'].queryset = Marca.objects.all()
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        fecha_inicio = cleaned_data.get('fecha_inicio')
+        fecha_fin = cleaned_data.get('fecha_fin')
+        
+        # Las fechas se usan juntas: una sola no alcanza para buscar disponibilidad
+        if bool(fecha_inicio) != bool(fecha_fin):
+            raise forms.ValidationError("Indique la fecha de inicio y la fecha de fin.")
+        
+        if fecha_inicio and fecha_fin and fecha_fin < fecha_inicio:
+            self.add_error('fecha_fin', "La fecha de fin debe ser posterior a la fecha de inicio.")
+        
+        return cleaned_data
+    
+    def filtrar(self, vehiculos):
+        """Aplica a un queryset de vehiculos los filtros del formulario que validaron.
+
+        Llamar despues de is_valid(): un rango de fechas invalido no descarta
+        la marca, el tipo ni los demas filtros; el error queda en el formulario.
+        """
+        from reservas import disponibilidad
+        datos = self.cleaned_data
+        
+        if datos.get('marca'):
+            vehiculos = vehiculos.filter(marca=datos['marca'])
+        
+        if datos.get('tipo'):
+            vehiculos = vehiculos.filter(tipo=datos['tipo'])
+        
+        if datos.get('capacidad_minima'):
+            vehiculos = vehiculos.filter(capacidad__gte=datos['capacidad_minima'])
+        
+        # Columna mantenida por reservas.disponibilidad_actual: sin leer reservas
+        if datos.get('libre_hoy'):
+            vehiculos = vehiculos.filter(ocupado_hoy=False)
+        
+        # Excluir los vehiculos con reservas activas en el rango de fechas (NOT EXISTS)
+        if datos.get('fecha_inicio') and datos.get('fecha_fin'):
+            vehiculos = disponibilidad.filtrar_disponibles(vehiculos, datos['fecha_inicio'], datos['fecha_fin'])
+        
+        return vehiculos
+
+# Campos que el staff debe completar siempre (formulario e importacion masiva)
+CAMPOS_OBLIGATORIOS = ['marca', 'tipo', 'modelo', 'ano', 'patente', 'capacidad', 'precio_por_dia', 'kilometraje']
 
 class VehiculoForm(forms.ModelForm):
     """Formulario para la creación y edición de vehículos."""
@@ -58,5 +109,5 @@ class VehiculoForm(forms.ModelForm):
         self.fields['disponible'].help_text = 'Marcar si el vehículo está disponible para alquiler'
         
         # Hacer que algunos campos sean obligatorios
-        for campo in ['marca', 'tipo', 'modelo', 'ano', 'patente', 'capacidad', 'precio_por_dia', 'kilometraje']:
+        for campo in CAMPOS_OBLIGATORIOS:
             self.fields[campo].required = True
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""Variantes reducidas de las imagenes de vehiculos.
+
+Al subir una imagen se generan, en segundo plano, versiones de tamano fijo
+en JPEG y WebP, sin metadatos EXIF. Se guardan con el hash del contenido en
+el nombre (``vehiculos/variantes/<hash>-<variante>.<ext>``), por lo que una
+imagen ya procesada no se vuelve a procesar y las URLs pueden cachearse
+indefinidamente. El original se conserva tal como se subio.
+"""
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from . import catalogo
+
+logger = logging.getLogger(__name__)
+
+# Nombre de la variante -> (ancho, alto)
+VARIANTES = {
+    'miniatura': (400, 300),
+    'mediana': (800, 600),
+}
+
+# Extension -> (formato de Pillow, opciones de guardado)
+FORMATOS = {
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+}
+
+_ejecutor = None
+_candado = threading.Lock()
+
+
+def ruta_variante(hash_imagen, variante, extension):
+    return f'vehiculos/variantes/{hash_imagen}-{variante}.{extension}'
+
+
+def hash_contenido(archivo):
+    """Hash corto del contenido de un archivo abierto, leido por bloques."""
+    digest = hashlib.sha256()
+    for bloque in archivo.chunks():
+        digest.update(bloque)
+    return digest.hexdigest()[:32]
+
+
+def generar_variantes(nombre_imagen, storage=default_storage):
+    """Genera las variantes que falten para una imagen guardada. Devuelve su hash."""
+    with storage.open(nombre_imagen, 'rb') as archivo:
+        hash_imagen = hash_contenido(archivo)
+        pendientes = [
+            (variante, extension)
+            for variante in VARIANTES
+            for extension in FORMATOS
+            if not storage.exists(ruta_variante(hash_imagen, variante, extension))
+        ]
+        if not pendientes:
+            return hash_imagen
+
+        archivo.seek(0)
+        with Image.open(archivo) as original:
+            # Aplicar la orientacion EXIF antes de descartar los metadatos
+            imagen = ImageOps.exif_transpose(original).convert('RGB')
+
+    for variante, extension in pendientes:
+        reducida = ImageOps.fit(imagen, VARIANTES[variante], method=Image.Resampling.LANCZOS)
+        formato, opciones = FORMATOS[extension]
+        contenido = io.BytesIO()
+        # Sin el parametro exif, Pillow no copia los metadatos de la imagen original
+        reducida.save(contenido, formato, **opciones)
+        storage.save(ruta_variante(hash_imagen, variante, extension), ContentFile(contenido.getvalue()))
+    return hash_imagen
+
+
+def procesar(vehiculo_id, nombre_imagen):
+    """Genera las variantes y registra el hash en el vehiculo (si la imagen no cambio mientras tanto)."""
+    from .models import Vehiculo
+
+    try:
+        hash_imagen = generar_variantes(nombre_imagen)
+        actualizados = Vehiculo.objects.filter(pk=vehiculo_id, imagen=nombre_imagen).update(
+            imagen_hash=hash_imagen, fecha_actualizacion=timezone.now(),
+        )
+        if actualizados:
+            catalogo.invalidar('flota', f'vehiculo:{vehiculo_id}')
+    except Exception:
+        logger.exception("No se pudieron generar las variantes de %s", nombre_imagen)
+
+
+def _procesar_en_hilo(vehiculo_id, nombre_imagen):
+    try:
+        procesar(vehiculo_id, nombre_imagen)
+    finally:
+        # Cada hilo del pool tiene su propia conexion: cerrarla al terminar
+        connection.close()
+
+
+def ejecutor():
+    global _ejecutor
+    with _candado:
+        if _ejecutor is None:
+            _ejecutor = ThreadPoolExecutor(max_workers=settings.IMAGENES_HILOS, thread_name_prefix='imagenes')
+    return _ejecutor
+
+
+def encolar(vehiculo):
+    """Programa la generacion de variantes para cuando se confirme la transaccion."""
+    vehiculo_id, nombre_imagen = vehiculo.pk, vehiculo.imagen.name
+    if settings.IMAGENES_EN_SEGUNDO_PLANO:
+        transaction.on_commit(lambda: ejecutor().submit(_procesar_en_hilo, vehiculo_id, nombre_imagen))
+    else:
+        transaction.on_commit(lambda: procesar(vehiculo_id, nombre_imagen))
@@ -0,0 +1,139 @@
+"""Importacion masiva de la flota desde CSV o JSON Lines.
+
+Las filas se leen de a una, se validan con las mismas reglas que
+VehiculoForm y se guardan por lotes con un upsert por patente
+(``bulk_create(update_conflicts=True)``). Marcas, tipos y politicas se
+resuelven con diccionarios en memoria; las marcas y tipos que no existen se
+crean en bloque. Una fila invalida se informa y no detiene la importacion.
+"""
+import csv
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import catalogo
+from .forms import CAMPOS_OBLIGATORIOS
+from .models import Vehiculo, Marca, TipoVehiculo, PoliticaReembolso
+
+TAMANO_LOTE = 1000
+
+# Campos que se sobrescriben cuando la patente ya existe
+CAMPOS_ACTUALIZABLES = [
+    'marca', 'modelo', 'tipo', 'ano', 'capacidad', 'precio_por_dia',
+    'kilometraje', 'politica_reembolso', 'descripcion', 'disponible', 'fecha_actualizacion',
+]
+
+VALORES_VERDADEROS = {'1', 'true', 'si', 'sí', 's', 'yes', 'y', 'verdadero'}
+
+
+def leer_filas(archivo, formato):
+    """Genera (numero_de_linea, fila) desde un archivo abierto en modo texto."""
+    if formato == 'csv':
+        lector = csv.DictReader(archivo)
+        for fila in lector:
+            yield lector.line_num, fila
+    else:
+        for numero, linea in enumerate(archivo, start=1):
+            if not linea.strip():
+                continue
+            try:
+                yield numero, json.loads(linea)
+            except ValueError:
+                yield numero, None
+
+
+def texto(fila, campo):
+    valor = fila.get(campo)
+    return str(valor).strip() if valor is not None else ''
+
+
+class ImportadorFlota:
+    """Importa filas de vehiculos y acumula el resultado."""
+
+    def __init__(self, tamano_lote=TAMANO_LOTE):
+        self.tamano_lote = tamano_lote
+        self.marcas = {marca.nombre: marca for marca in Marca.objects.all()}
+        self.tipos = {tipo.nombre: tipo for tipo in TipoVehiculo.objects.all()}
+        self.politicas = {politica.nombre: politica for politica in PoliticaReembolso.objects.all()}
+        self.procesadas = 0
+        self.importadas = 0
+        self.errores = []
+
+    def importar(self, filas):
+        """Procesa un iterable de (numero, fila) y devuelve el propio importador."""
+        lote = {}
+        for numero, fila in filas:
+            self.procesadas += 1
+            try:
+                vehiculo, nombre_marca, nombre_tipo = self.construir(fila)
+            except ValidationError as error:
+                self.errores.append((numero, '; '.join(error.messages)))
+                continue
+            # Si la patente se repite en el lote, gana la ultima fila
+            lote[vehiculo.patente] = (vehiculo, nombre_marca, nombre_tipo)
+            if len(lote) >= self.tamano_lote:
+                self.guardar(lote.values())
+                lote = {}
+        if lote:
+            self.guardar(lote.values())
+        return self
+
+    def construir(self, fila):
+        """Valida una fila como lo haria VehiculoForm y arma el Vehiculo (sin guardarlo)."""
+        if not isinstance(fila, dict):
+            raise ValidationError("Fila con formato invalido.")
+
+        faltantes = [campo for campo in CAMPOS_OBLIGATORIOS if not texto(fila, campo)]
+        if faltantes:
+            raise ValidationError(f"Faltan campos obligatorios: {', '.join(faltantes)}.")
+
+        politica = None
+        if texto(fila, 'politica_reembolso'):
+            politica = self.politicas.get(texto(fila, 'politica_reembolso'))
+            if politica is None:
+                raise ValidationError(f"Politica de reembolso inexistente: {texto(fila, 'politica_reembolso')}.")
+
+        disponible = texto(fila, 'disponible')
+        vehiculo = Vehiculo(
+            modelo=texto(fila, 'modelo'),
+            ano=texto(fila, 'ano'),
+            patente=texto(fila, 'patente'),
+            capacidad=texto(fila, 'capacidad'),
+            precio_por_dia=texto(fila, 'precio_por_dia'),
+            kilometraje=texto(fila, 'kilometraje'),
+            descripcion=texto(fila, 'descripcion') or None,
+            politica_reembolso=politica,
+            disponible=disponible.lower() in VALORES_VERDADEROS if disponible else True,
+        )
+        # Valida y convierte los valores; las relaciones se resuelven al guardar el lote
+        vehiculo.clean_fields(exclude=['marca', 'tipo', 'politica_reembolso', 'imagen'])
+        return vehiculo, texto(fila, 'marca'), texto(fila, 'tipo')
+
+    def guardar(self, lote):
+        lote = list(lote)
+        self.completar(Marca, self.marcas, {nombre_marca for _, nombre_marca, _ in lote})
+        self.completar(TipoVehiculo, self.tipos, {nombre_tipo for _, _, nombre_tipo in lote})
+        vehiculos = []
+        for vehiculo, nombre_marca, nombre_tipo in lote:
+            vehiculo.marca = self.marcas[nombre_marca]
+            vehiculo.tipo = self.tipos[nombre_tipo]
+            vehiculos.append(vehiculo)
+
+        with transaction.atomic():
+            Vehiculo.objects.bulk_create(
+                vehiculos,
+                update_conflicts=True,
+                unique_fields=['patente'],
+                update_fields=CAMPOS_ACTUALIZABLES,
+            )
+            # bulk_create no dispara senales: invalidar todo el catalogo
+            catalogo.invalidar_al_confirmar('flota', 'referencias')
+        self.importadas += len(vehiculos)
+
+    def completar(self, modelo, existentes, nombres):
+        """Crea en una sola consulta las filas de referencia que falten."""
+        nuevos = [modelo(nombre=nombre) for nombre in sorted(nombres - existentes.keys())]
+        if nuevos:
+            for objeto in modelo.objects.bulk_create(nuevos):
+                existentes[objeto.nombre] = objeto
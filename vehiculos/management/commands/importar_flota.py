@@ -0,0 +1,33 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vehiculos.importacion import ImportadorFlota, TAMANO_LOTE, leer_filas
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa vehiculos desde un archivo CSV o JSON Lines. Los vehiculos se identifican por patente: "
+        "los existentes se actualizan y los nuevos se crean."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta al archivo .csv o .jsonl")
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help="Por defecto se deduce de la extension")
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help="Vehiculos guardados por consulta")
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        formato = options['formato'] or ('csv' if ruta.lower().endswith('.csv') else 'jsonl')
+        if not os.path.exists(ruta):
+            raise CommandError(f"No existe el archivo {ruta}.")
+
+        with open(ruta, encoding='utf-8-sig', newline='') as archivo:
+            importador = ImportadorFlota(tamano_lote=options['lote']).importar(leer_filas(archivo, formato))
+
+        for numero, mensaje in importador.errores:
+            self.stderr.write(f"Fila {numero}: {mensaje}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Filas procesadas: {importador.procesadas}. Vehiculos importados: {importador.importadas}. "
+            f"Errores: {len(importador.errores)}."
+        ))
@@ -0,0 +1,132 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from pagos.models import MetodoPago
+from reservas.models import EstadoReserva
+from vehiculos import catalogo
+from vehiculos.models import PoliticaReembolso, TipoVehiculo, Marca, Vehiculo
+
+POLITICAS_REEMBOLSO = [
+    {'nombre': 'Reembolso Completo', 'porcentaje': 100, 'descripcion': 'Devolución del 100% del importe pagado.'},
+    {'nombre': 'Reembolso Parcial', 'porcentaje': 20, 'descripcion': 'Devolución del 20% del importe pagado.'},
+    {'nombre': 'Sin Reembolso', 'porcentaje': 0, 'descripcion': 'No se realiza ningún reembolso.'},
+]
+
+ESTADOS_RESERVA = ['Pendiente', 'Confirmada', 'Cancelada', 'Cancelada por Admin', 'Completada', 'Vencida']
+
+METODOS_PAGO = ['Tarjeta de Credito/Debito', 'Transferencia Bancaria', 'Efectivo']
+
+TIPOS_VEHICULO = ['Sedan', 'SUV', 'Camioneta', 'Compacto', 'Deportivo', 'Minivan']
+
+MARCAS = ['Toyota', 'Ford', 'Chevrolet', 'Volkswagen', 'Honda', 'Nissan', 'Renault', 'Fiat']
+
+VEHICULOS_EJEMPLO = [
+    {
+        'marca': 'Toyota',
+        'modelo': 'Corolla',
+        'tipo': 'Sedan',
+        'ano': 2022,
+        'patente': 'ABC123',
+        'capacidad': 5,
+        'precio_por_dia': Decimal('50.00'),
+        'kilometraje': 15000,
+        'politica_reembolso': 'Reembolso Completo',
+        'descripcion': 'Toyota Corolla en excelente estado. Ideal para viajes familiares.'
+    },
+    {
+        'marca': 'Ford',
+        'modelo': 'EcoSport',
+        'tipo': 'SUV',
+        'ano': 2021,
+        'patente': 'DEF456',
+        'capacidad': 5,
+        'precio_por_dia': Decimal('60.00'),
+        'kilometraje': 25000,
+        'politica_reembolso': 'Reembolso Parcial',
+        'descripcion': 'Ford EcoSport con todas las comodidades. Perfecta para ciudad y ruta.'
+    },
+    {
+        'marca': 'Chevrolet',
+        'modelo': 'S10',
+        'tipo': 'Camioneta',
+        'ano': 2020,
+        'patente': 'GHI789',
+        'capacidad': 5,
+        'precio_por_dia': Decimal('70.00'),
+        'kilometraje': 35000,
+        'politica_reembolso': 'Sin Reembolso',
+        'descripcion': 'Chevrolet S10 4x4. Ideal para terrenos dificiles y carga.'
+    },
+]
+
+# Lo que se muestra en el catalogo publico (vehiculos.catalogo), por su nombre en el resumen
+EN_EL_CATALOGO = ['Políticas de reembolso', 'Tipos de vehiculo', 'Marcas', 'Vehiculos de ejemplo']
+
+
+def sembrar(modelo, filas, clave='nombre'):
+    """Crea las filas que falten con una consulta de existencia y un solo bulk_create."""
+    existentes = set(
+        modelo.objects.filter(**{f'{clave}__in': [fila[clave] for fila in filas]}).values_list(clave, flat=True)
+    )
+    nuevas = [modelo(**fila) for fila in filas if fila[clave] not in existentes]
+    modelo.objects.bulk_create(nuevas, ignore_conflicts=True)
+    return len(nuevas)
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga los datos iniciales (politicas, estados, metodos de pago, tipos, marcas, vehiculos de ejemplo "
+        "y el superusuario admin). Es idempotente: solo crea lo que falta."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sin-ejemplos',
+            action='store_true',
+            help="Carga solo los catalogos, sin vehiculos de ejemplo ni superusuario.",
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        creados = {
+            'Políticas de reembolso': sembrar(PoliticaReembolso, POLITICAS_REEMBOLSO),
+            'Estados de reserva': sembrar(EstadoReserva, [{'nombre': nombre} for nombre in ESTADOS_RESERVA]),
+            'Metodos de pago': sembrar(MetodoPago, [{'nombre': nombre} for nombre in METODOS_PAGO]),
+            'Tipos de vehiculo': sembrar(TipoVehiculo, [{'nombre': nombre} for nombre in TIPOS_VEHICULO]),
+            'Marcas': sembrar(Marca, [{'nombre': nombre} for nombre in MARCAS]),
+        }
+
+        if not options['sin_ejemplos']:
+            # Crear superusuario si no existe
+            if not User.objects.filter(username='admin').exists():
+                user = User.objects.create_superuser('admin', 'admin@example.com', 'admin123')
+                user.last_login = user.date_joined  # Asignamos la fecha de creación como last_login
+                user.save()
+                creados['Superusuario'] = 1
+
+            # Resolver las relaciones de los vehiculos de ejemplo con una consulta por tabla
+            marcas = {marca.nombre: marca for marca in Marca.objects.filter(nombre__in=MARCAS)}
+            tipos = {tipo.nombre: tipo for tipo in TipoVehiculo.objects.filter(nombre__in=TIPOS_VEHICULO)}
+            politicas = {politica.nombre: politica for politica in PoliticaReembolso.objects.all()}
+            vehiculos = [
+                {
+                    **v,
+                    'marca': marcas[v['marca']],
+                    'tipo': tipos[v['tipo']],
+                    'politica_reembolso': politicas[v['politica_reembolso']],
+                    'disponible': True,
+                }
+                for v in VEHICULOS_EJEMPLO
+            ]
+            creados['Vehiculos de ejemplo'] = sembrar(Vehiculo, vehiculos, clave='patente')
+
+        # bulk_create no dispara senales: invalidar el catalogo si cambio la flota o sus referencias
+        if any(creados.get(nombre) for nombre in EN_EL_CATALOGO):
+            catalogo.invalidar_al_confirmar('flota', 'referencias')
+
+        for nombre, cantidad in creados.items():
+            self.stdout.write(f"{nombre}: {cantidad} creados")
+        self.stdout.write(self.style.SUCCESS("Datos iniciales creados exitosamente"))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehiculo',
+            name='imagen_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+    ]
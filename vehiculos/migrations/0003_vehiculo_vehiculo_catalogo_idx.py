@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 16:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0002_vehiculo_imagen_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(fields=['-ano', 'marca', 'modelo', 'id'], name='vehiculo_catalogo_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 17:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0004_vehiculo_fecha_actualizacion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(condition=models.Q(('disponible', True)), fields=['-ano', 'marca', 'modelo', 'id'], name='vehiculo_disponibles_idx'),
+        ),
+    ]
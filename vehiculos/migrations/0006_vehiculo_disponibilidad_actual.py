@@ -0,0 +1,73 @@
+# Generated by Django 5.2 on 2026-10-18 17:14
+
+from datetime import timedelta
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+# Valores al escribir esta migracion; no se importan del codigo actual
+ESTADOS_ACTIVOS = ['Pendiente', 'Confirmada']
+CAMPOS = ('ocupado_hoy', 'proxima_fecha_libre', 'reservas_activas')
+
+
+def resumir(periodos, hoy):
+    """Igual que reservas.disponibilidad_actual.resumir al escribir esta migracion."""
+    libre = hoy
+    for inicio, fin in periodos:
+        if inicio > libre:
+            break
+        libre = max(libre, fin + timedelta(days=1))
+    return libre > hoy, libre, len(periodos)
+
+
+def calcular_disponibilidad(apps, schema_editor):
+    """Calcula la disponibilidad actual de los vehiculos desde sus reservas activas."""
+    Reserva = apps.get_model('reservas', 'Reserva')
+    Vehiculo = apps.get_model('vehiculos', 'Vehiculo')
+    hoy = django.utils.timezone.localdate()
+    periodos = {}
+    reservas = Reserva.objects.filter(estado__nombre__in=ESTADOS_ACTIVOS, fecha_fin__gte=hoy).order_by(
+        'vehiculo_id', 'fecha_inicio',
+    ).values_list('vehiculo_id', 'fecha_inicio', 'fecha_fin')
+    for vehiculo_id, inicio, fin in reservas:
+        periodos.setdefault(vehiculo_id, []).append((inicio, fin))
+    Vehiculo.objects.bulk_update(
+        [Vehiculo(pk=vehiculo_id, **dict(zip(CAMPOS, resumir(propios, hoy)))) for vehiculo_id, propios in periodos.items()],
+        CAMPOS, batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0005_vehiculo_disponibles_idx'),
+        ('reservas', '0008_reserva_actualizacion_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehiculo',
+            name='ocupado_hoy',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='proxima_fecha_libre',
+            field=models.DateField(default=django.utils.timezone.localdate, editable=False),
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='reservas_activas',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(fields=['ocupado_hoy', '-ano', 'marca', 'modelo', 'id'], name='vehiculo_libres_hoy_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(fields=['proxima_fecha_libre', '-ano', 'marca', 'modelo', 'id'], name='vehiculo_proxima_libre_idx'),
+        ),
+        migrations.RunPython(calcular_disponibilidad, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,28 @@
+from django.core.files.storage import default_storage
 from django.db import models
+from django.utils import timezone
 
-class TipoVehiculo(models.Model):
+from . import imagenes
+
+class ReferenciaDeVehiculo(models.Model):
+    """Catalogo que se muestra junto a cada vehiculo (marca, tipo, politica).
+
+    Al modificarlo cambia lo que se publica de sus vehiculos, asi que se les
+    actualiza fecha_actualizacion (la marca de agua de los ETag de la API).
+    """
+    
+    class Meta:
+        abstract = True
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.vehiculo_set.update(fecha_actualizacion=timezone.now())
+    
+    def delete(self, *args, **kwargs):
+        self.vehiculo_set.update(fecha_actualizacion=timezone.now())
+        return super().delete(*args, **kwargs)
+
+class TipoVehiculo(ReferenciaDeVehiculo):
     nombre = models.CharField(max_length=50)
     descripcion = models.TextField(blank=True, null=True)
     
@@ -11,7 +33,7 @@ class TipoVehiculo(models.Model):
         verbose_name = "Tipo de Vehiculo"
         verbose_name_plural = "Tipos de Vehiculos"
 
-class Marca(models.Model):
+class Marca(ReferenciaDeVehiculo):
     nombre = models.CharField(max_length=50)
     
     def __str__(self):
@@ -21,7 +43,7 @@ class Marca(models.Model):
         verbose_name = "Marca"
         verbose_name_plural = "Marcas"
 
-class PoliticaReembolso(models.Model):
+class PoliticaReembolso(ReferenciaDeVehiculo):
     nombre = models.CharField(max_length=50)  # Ejemplo: "100%", "20%", "Sin reembolso"
     porcentaje = models.PositiveIntegerField(help_text="Porcentaje de reembolso (0-100)")
     descripcion = models.TextField(blank=True, null=True)
@@ -45,12 +67,78 @@ class Vehiculo(models.Model):
     descripcion = models.TextField(blank=True, null=True)
     politica_reembolso = models.ForeignKey(PoliticaReembolso, on_delete=models.SET_NULL, null=True, blank=True)
     imagen = models.ImageField(upload_to='vehiculos/', blank=True, null=True)
+    # Hash del contenido de la imagen; vacio hasta que se generan sus variantes reducidas
+    imagen_hash = models.CharField(max_length=32, blank=True, default='', editable=False)
     disponible = models.BooleanField(default=True)
+    # Disponibilidad real segun las reservas activas; la mantiene reservas.disponibilidad_actual
+    ocupado_hoy = models.BooleanField(default=False, editable=False)
+    proxima_fecha_libre = models.DateField(default=timezone.localdate, editable=False)
+    reservas_activas = models.PositiveIntegerField(default=0, editable=False)
+    fecha_actualizacion = models.DateTimeField(auto_now=True, db_index=True)
+    
+    CAMPOS_DISPONIBILIDAD = ('ocupado_hoy', 'proxima_fecha_libre', 'reservas_activas')
     
     def __str__(self):
         return f"{self.marca} {self.modelo} ({self.ano}) - {self.patente}"
     
+    def save(self, *args, **kwargs):
+        # Una imagen recien subida todavia no fue escrita en el storage
+        imagen_nueva = bool(self.imagen) and not self.imagen._committed
+        if imagen_nueva or not self.imagen:
+            self.imagen_hash = ''
+        if (
+            not self._state.adding and self.pk is not None
+            and kwargs.get('update_fields') is None and not kwargs.get('force_insert')
+        ):
+            # La disponibilidad la escribe reservas.disponibilidad_actual con update():
+            # guardar un vehiculo leido antes (edicion, admin) no la pisa con valores viejos
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in self.CAMPOS_DISPONIBILIDAD
+            ]
+        super().save(*args, **kwargs)
+        if imagen_nueva:
+            imagenes.encolar(self)
+    
+    def url_imagen(self, variante='miniatura', extension='jpg'):
+        """URL de una variante reducida de la imagen; la original mientras no este generada."""
+        if not self.imagen:
+            return ''
+        if not self.imagen_hash:
+            return self.imagen.url
+        return default_storage.url(imagenes.ruta_variante(self.imagen_hash, variante, extension))
+    
+    @property
+    def miniatura_url(self):
+        return self.url_imagen('miniatura', 'jpg')
+    
+    @property
+    def miniatura_webp_url(self):
+        return self.url_imagen('miniatura', 'webp')
+    
+    @property
+    def mediana_url(self):
+        return self.url_imagen('mediana', 'jpg')
+    
+    @property
+    def mediana_webp_url(self):
+        return self.url_imagen('mediana', 'webp')
+    
     class Meta:
         verbose_name = "Vehiculo"
         verbose_name_plural = "Vehiculos"
-        ordering = ['-ano', 'marca', 'modelo']
\ No newline at end of file
+        ordering = ['-ano', 'marca', 'modelo']
+        indexes = [
+            # Catalogo paginado por cursor sobre (-ano, marca, modelo, id)
+            models.Index(fields=['-ano', 'marca', 'modelo', 'id'], name='vehiculo_catalogo_idx'),
+            # El mismo orden solo con los disponibles (?disponible=true, crear_reserva); indice parcial
+            models.Index(
+                fields=['-ano', 'marca', 'modelo', 'id'], condition=models.Q(disponible=True),
+                name='vehiculo_disponibles_idx',
+            ),
+            # Catalogo filtrado por libres hoy (?libre_hoy=on) y ordenado por proxima fecha libre (?orden=libre)
+            models.Index(fields=['ocupado_hoy', '-ano', 'marca', 'modelo', 'id'], name='vehiculo_libres_hoy_idx'),
+            models.Index(
+                fields=['proxima_fecha_libre', '-ano', 'marca', 'modelo', 'id'], name='vehiculo_proxima_libre_idx',
+            ),
+        ]
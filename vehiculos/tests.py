@@ -1,3 +1,417 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, RequestFactory, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from alquileres_maria.pruebas import DatosReservaMixin, PresupuestoConsultasMixin, plantillas_en_memoria
+from reservas.models import Reserva, EstadoReserva
+from . import api, catalogo, imagenes
+from .importacion import ImportadorFlota
+from .models import Marca, TipoVehiculo, Vehiculo, PoliticaReembolso
+from .views import VehiculoListView
+
+
+class BusquedaVehiculosTests(DatosReservaMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.toyota = cls.marca
+        cls.ford = Marca.objects.create(nombre='Ford')
+        cls.corolla = cls.crear_vehiculo()
+        cls.etios = cls.crear_vehiculo('BBB222', modelo='Etios', capacidad=4)
+        cls.ka = cls.crear_vehiculo('CCC333', marca=cls.ford, modelo='Ka')
+        cls.hoy = timezone.now().date()
+        Reserva.objects.create(
+            usuario=cls.usuario,
+            vehiculo=cls.corolla,
+            fecha_inicio=cls.hoy + timedelta(days=5),
+            fecha_fin=cls.hoy + timedelta(days=10),
+            estado=cls.confirmada,
+        )
+
+    def buscar(self, **parametros):
+        view = VehiculoListView()
+        view.setup(RequestFactory().get('/vehiculos/', parametros))
+        return set(view.get_queryset())
+
+    def test_excluye_vehiculos_reservados_en_el_rango(self):
+        encontrados = self.buscar(fecha_inicio=self.hoy + timedelta(days=8), fecha_fin=self.hoy + timedelta(days=12))
+        self.assertEqual(encontrados, {self.etios, self.ka})
+
+    def test_incluye_vehiculos_libres_fuera_del_rango(self):
+        encontrados = self.buscar(fecha_inicio=self.hoy + timedelta(days=11), fecha_fin=self.hoy + timedelta(days=12))
+        self.assertEqual(encontrados, {self.corolla, self.etios, self.ka})
+
+    def test_combina_fechas_marca_y_capacidad(self):
+        encontrados = self.buscar(
+            fecha_inicio=self.hoy + timedelta(days=6), fecha_fin=self.hoy + timedelta(days=7),
+            marca=self.toyota.id, capacidad_minima=4,
+        )
+        self.assertEqual(encontrados, {self.etios})
+
+    def test_rango_invertido_aplica_los_demas_filtros(self):
+        view = VehiculoListView()
+        view.setup(RequestFactory().get('/vehiculos/', {
+            'fecha_inicio': self.hoy + timedelta(days=7), 'fecha_fin': self.hoy + timedelta(days=6),
+            'marca': self.toyota.id,
+        }))
+        # Sin el filtro de fechas: el corolla reservado en esas fechas sigue apareciendo
+        self.assertEqual(set(view.get_queryset()), {self.corolla, self.etios})
+        self.assertIn('fecha_fin', view.form_busqueda.errors)
+
+    def test_una_sola_fecha_aplica_los_demas_filtros(self):
+        encontrados = self.buscar(fecha_inicio=self.hoy + timedelta(days=6), marca=self.ford.id)
+        self.assertEqual(encontrados, {self.ka})
+
+
+@plantillas_en_memoria({
+    'vehiculos/vehiculo_list.html': (
+        '{% for vehiculo in vehiculos %}{{ vehiculo }} {{ vehiculo.tipo }} {{ vehiculo.politica_reembolso }}'
+        ' {{ vehiculo.precio_por_dia }} {{ vehiculo.imagen }}{% endfor %}'
+        '{% for marca in marcas %}{{ marca }}{% endfor %}{% for tipo in tipos %}{{ tipo }}{% endfor %}'
+    ),
+})
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class VehiculoListViewConsultasTests(PresupuestoConsultasMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.marca = Marca.objects.create(nombre='Toyota')
+        cls.tipo = TipoVehiculo.objects.create(nombre='Sedan')
+        cls.politica = PoliticaReembolso.objects.create(nombre='Reembolso Completo', porcentaje=100)
+
+    def agregar_vehiculos(self, cantidad):
+        inicio = Vehiculo.objects.count()
+        Vehiculo.objects.bulk_create(
+            Vehiculo(
+                marca=self.marca, tipo=self.tipo, politica_reembolso=self.politica, modelo='Corolla', ano=2022,
+                patente=f'AAA{inicio + i:03d}', capacidad=5, precio_por_dia=Decimal('50.00'),
+            )
+            for i in range(cantidad)
+        )
+
+    def test_listado_de_vehiculos_con_presupuesto_fijo(self):
+        self.agregar_vehiculos(1)
+        # La pagina (sin COUNT: paginacion por cursor), marcas y tipos para los filtros
+        self.assertConsultasConstantes(
+            lambda: self.client.get(reverse('vehiculos:lista')),
+            lambda: self.agregar_vehiculos(VehiculoListView.paginate_by),
+            limite=3,
+        )
+
+
+@plantillas_en_memoria({
+    'vehiculos/vehiculo_list.html': '{% for vehiculo in vehiculos %}{{ vehiculo.patente }} {% endfor %}',
+    'vehiculos/vehiculo_detail.html': '{{ vehiculo.marca }} {{ vehiculo.modelo }}',
+})
+class CatalogoCacheTests(DatosReservaMixin, PresupuestoConsultasMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.corolla = cls.crear_vehiculo()
+        cls.hoy = timezone.now().date()
+        cls.fechas = {'fecha_inicio': cls.hoy + timedelta(days=5), 'fecha_fin': cls.hoy + timedelta(days=6)}
+
+    def setUp(self):
+        cache.clear()
+
+    def listado(self, **parametros):
+        return self.client.get(reverse('vehiculos:lista'), parametros).content.decode()
+
+    def test_segunda_visita_sin_consultas(self):
+        self.listado()
+        with self.assertPresupuestoConsultas(0):
+            self.assertIn('AAA111', self.listado())
+        # Los parametros que no son filtros no cambian la clave
+        with self.assertPresupuestoConsultas(0):
+            self.listado(utm_source='correo')
+
+    def test_modificar_un_vehiculo_invalida_listado_y_detalle(self):
+        detalle = reverse('vehiculos:vehiculo-detail', args=[self.corolla.pk])
+        self.listado()
+        self.client.get(detalle)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.corolla.modelo = 'Yaris'
+            self.corolla.patente = 'ZZZ999'
+            self.corolla.save()
+        self.assertIn('ZZZ999', self.listado())
+        self.assertContains(self.client.get(detalle), 'Yaris')
+
+    def test_modificar_una_marca_invalida_el_detalle(self):
+        detalle = reverse('vehiculos:vehiculo-detail', args=[self.corolla.pk])
+        self.client.get(detalle)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.marca.nombre = 'Lexus'
+            self.marca.save()
+        self.assertContains(self.client.get(detalle), 'Lexus')
+
+    def test_una_reserva_solo_invalida_los_listados_con_fechas(self):
+        self.listado()
+        self.listado(**self.fechas)
+        with self.captureOnCommitCallbacks(execute=True):
+            Reserva.objects.create(
+                usuario=self.usuario, vehiculo=self.corolla, estado=self.confirmada, **self.fechas,
+            )
+        with self.assertPresupuestoConsultas(0):
+            self.assertIn('AAA111', self.listado())
+        self.assertNotIn('AAA111', self.listado(**self.fechas))
+
+    def test_la_importacion_masiva_invalida_el_listado(self):
+        self.listado()
+        with self.captureOnCommitCallbacks(execute=True):
+            importador = ImportadorFlota().importar([
+                (1, {'marca': 'Ford', 'modelo': 'Ka', 'tipo': 'Sedan', 'ano': '2021', 'patente': 'BBB222',
+                     'capacidad': '4', 'precio_por_dia': '30.00', 'kilometraje': '100'}),
+            ])
+        self.assertEqual(importador.importadas, 1)
+        self.assertIn('BBB222', self.listado())
+
+    def test_sembrar_datos_invalida_el_listado(self):
+        self.listado()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('sembrar_datos', stdout=io.StringIO())
+        self.assertIn('ABC123', self.listado())
+
+    def test_version_perdida_no_reactiva_entradas_viejas(self):
+        [antes] = catalogo.versiones('flota')
+        cache.delete('catalogo:version:flota')
+        [despues] = catalogo.versiones('flota')
+        self.assertGreater(despues, antes)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+@plantillas_en_memoria({'vehiculos/vehiculo_list.html': ''})
+class CatalogoPaginadoTests(TestCase):
+    def test_orden_mixto_sin_repetir_ni_saltear(self):
+        marcas = [Marca.objects.create(nombre=nombre) for nombre in ['Toyota', 'Ford']]
+        tipo = TipoVehiculo.objects.create(nombre='Sedan')
+        for i in range(20):
+            Vehiculo.objects.create(
+                marca=marcas[i % 2], tipo=tipo, modelo=['Ka', 'Corolla'][i % 3 % 2], ano=2020 + i % 3,
+                patente=f'AAA{i:03d}', capacidad=5, precio_por_dia=Decimal('50.00'),
+            )
+        recorridos, cursor = [], None
+        while True:
+            pagina = self.client.get(reverse('vehiculos:lista'), {'cursor': cursor} if cursor else {}).context['page_obj']
+            recorridos += [vehiculo.id for vehiculo in pagina]
+            cursor = pagina.cursor_siguiente
+            if not cursor:
+                break
+        esperados = Vehiculo.objects.order_by('-ano', 'marca_id', 'modelo', 'id').values_list('id', flat=True)
+        self.assertEqual(recorridos, list(esperados))
+
+
+class ApiVehiculosTests(PresupuestoConsultasMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.toyota = Marca.objects.create(nombre='Toyota')
+        cls.sedan = TipoVehiculo.objects.create(nombre='Sedan')
+        cls.vehiculos = [
+            Vehiculo.objects.create(
+                marca=cls.toyota, tipo=cls.sedan, modelo='Corolla', ano=2020 + i, patente=f'AAA{i:03d}',
+                capacidad=5, precio_por_dia=Decimal('50.00'),
+            )
+            for i in range(3)
+        ]
+
+    def test_listado_paginado_por_cursor(self):
+        with mock.patch.object(api, 'POR_PAGINA', 2):
+            primera = self.client.get(reverse('vehiculos:api-lista')).json()
+            segunda = self.client.get(primera['siguiente']).json()
+        self.assertEqual([v['patente'] for v in primera['resultados']], ['AAA002', 'AAA001'])
+        self.assertEqual([v['patente'] for v in segunda['resultados']], ['AAA000'])
+        self.assertIsNone(segunda['siguiente'])
+        self.assertEqual(primera['resultados'][0]['marca'], 'Toyota')
+
+    def test_if_none_match_responde_304_sin_leer_las_filas(self):
+        url = reverse('vehiculos:api-lista')
+        version = self.client.get(url)['ETag']
+        # Solo la marca de agua (MAX y COUNT en una consulta)
+        with self.assertPresupuestoConsultas(1):
+            respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=version)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(respuesta['ETag'], version)
+
+    def test_if_none_match_con_fechas_no_lee_las_reservas(self):
+        url = reverse('vehiculos:api-lista')
+        estados = {nombre: EstadoReserva.objects.create(nombre=nombre) for nombre in ['Pendiente', 'Confirmada', 'Cancelada']}
+        manana = timezone.localdate() + timedelta(days=1)
+        periodo = {'fecha_inicio': manana, 'fecha_fin': manana + timedelta(days=2)}
+        version = self.client.get(url, periodo)['ETag']
+        # La marca de agua de los vehiculos; las reservas, por la version del catalogo
+        with self.assertPresupuestoConsultas(1):
+            respuesta = self.client.get(url, periodo, HTTP_IF_NONE_MATCH=version)
+        self.assertEqual(respuesta.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Reserva.objects.create(
+                usuario=User.objects.create_user('cliente'), vehiculo=self.vehiculos[0],
+                estado=estados['Cancelada'], fecha_inicio=manana, fecha_fin=manana,
+            )
+        self.assertEqual(self.client.get(url, periodo, HTTP_IF_NONE_MATCH=version).status_code, 200)
+
+    def test_el_etag_cambia_con_los_datos(self):
+        url = reverse('vehiculos:api-detalle', args=[self.vehiculos[0].pk])
+        version = self.client.get(url)['ETag']
+        self.vehiculos[0].precio_por_dia = Decimal('60.00')
+        self.vehiculos[0].save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=version).status_code, 200)
+
+        version = self.client.get(url)['ETag']
+        self.toyota.nombre = 'Lexus'
+        self.toyota.save()
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=version)
+        self.assertEqual(respuesta.json()['marca'], 'Lexus')
+
+        listado = self.client.get(reverse('vehiculos:api-lista'))['ETag']
+        self.vehiculos[2].delete()
+        self.assertEqual(self.client.get(reverse('vehiculos:api-lista'), HTTP_IF_NONE_MATCH=listado).status_code, 200)
+
+    def test_filtros_invalidos(self):
+        respuesta = self.client.get(reverse('vehiculos:api-lista'), {'capacidad_minima': 'muchos'})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('capacidad_minima', respuesta.json()['errores'])
+
+
+class ImportarFlotaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.toyota = Marca.objects.create(nombre='Toyota')
+        cls.sedan = TipoVehiculo.objects.create(nombre='Sedan')
+        cls.politica = PoliticaReembolso.objects.create(nombre='Reembolso Completo', porcentaje=100)
+        Vehiculo.objects.create(
+            marca=cls.toyota, tipo=cls.sedan, modelo='Corolla', ano=2020, patente='AAA111',
+            capacidad=5, precio_por_dia=Decimal('40.00'),
+        )
+
+    def importar(self, contenido, extension='csv'):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, f'flota.{extension}')
+            with open(ruta, 'w', encoding='utf-8') as archivo:
+                archivo.write(contenido)
+            salida, errores = io.StringIO(), io.StringIO()
+            call_command('importar_flota', ruta, '--lote', '2', stdout=salida, stderr=errores)
+        return salida.getvalue(), errores.getvalue()
+
+    def test_crea_actualiza_e_informa_errores(self):
+        salida, errores = self.importar(
+            "marca,modelo,tipo,ano,patente,capacidad,precio_por_dia,kilometraje,politica_reembolso,disponible\n"
+            "Toyota,Corolla,Sedan,2022,AAA111,5,55.00,1000,Reembolso Completo,si\n"
+            "Ford,Ka,Compacto,2021,BBB222,4,30.00,2000,,no\n"
+            "Ford,Ranger,Camioneta,2023,CCC333,5,abc,0,,si\n"
+            "Fiat,Uno,Compacto,2019,DDD444,4,20.00,500,Inexistente,si\n"
+            "Fiat,Cronos,Sedan,2024,EEE555,5,45.00,,,si\n"
+            "Fiat,Cronos,Sedan,2024,FFF666,5,45.00,10,,si\n"
+        )
+        self.assertIn("Filas procesadas: 6. Vehiculos importados: 3. Errores: 3.", salida)
+        self.assertIn("Fila 4:", errores)
+        self.assertIn("Fila 5: Politica de reembolso inexistente", errores)
+        self.assertIn("Fila 6: Faltan campos obligatorios: kilometraje.", errores)
+
+        corolla = Vehiculo.objects.get(patente='AAA111')
+        self.assertEqual((corolla.ano, corolla.precio_por_dia, corolla.politica_reembolso), (2022, Decimal('55.00'), self.politica))
+        ka = Vehiculo.objects.get(patente='BBB222')
+        self.assertEqual((ka.marca.nombre, ka.tipo.nombre, ka.disponible), ('Ford', 'Compacto', False))
+        self.assertEqual(Marca.objects.filter(nombre='Fiat').count(), 1)
+
+    def test_json_lines(self):
+        salida, errores = self.importar(
+            '{"marca": "Toyota", "modelo": "Hilux", "tipo": "Sedan", "ano": 2023, "patente": "GGG777",'
+            ' "capacidad": 5, "precio_por_dia": "80.00", "kilometraje": 0}\n'
+            'no es json\n',
+            extension='jsonl',
+        )
+        self.assertIn("Vehiculos importados: 1. Errores: 1.", salida)
+        self.assertEqual(Vehiculo.objects.get(patente='GGG777').marca, self.toyota)
+
+
+class SembrarDatosTests(TestCase):
+    def test_es_idempotente(self):
+        call_command('sembrar_datos', stdout=io.StringIO())
+        self.assertEqual(EstadoReserva.objects.count(), 6)
+        self.assertEqual(Vehiculo.objects.count(), 3)
+        self.assertEqual(Vehiculo.objects.get(patente='ABC123').politica_reembolso.porcentaje, 100)
+        self.assertTrue(User.objects.get(username='admin').is_superuser)
+
+        # Con todo cargado: una consulta de existencia por tabla, sin inserciones
+        salida = io.StringIO()
+        with self.assertNumQueries(12):
+            call_command('sembrar_datos', stdout=salida)
+        self.assertNotIn(": 1 creados", salida.getvalue())
+        self.assertEqual(Marca.objects.count(), 8)
+
+
+class VariantesImagenTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.marca = Marca.objects.create(nombre='Toyota')
+        cls.tipo = TipoVehiculo.objects.create(nombre='Sedan')
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        configuracion = override_settings(MEDIA_ROOT=directorio.name, IMAGENES_EN_SEGUNDO_PLANO=False)
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+
+    def foto(self, nombre='foto.jpg', tamano=(1600, 1000)):
+        """JPEG con EXIF (orientacion y modelo de camara), como las fotos de un celular."""
+        exif = Image.Exif()
+        exif[0x0110] = 'Camara de prueba'
+        contenido = io.BytesIO()
+        Image.new('RGB', tamano, 'red').save(contenido, 'JPEG', exif=exif)
+        return SimpleUploadedFile(nombre, contenido.getvalue(), content_type='image/jpeg')
+
+    def crear_vehiculo(self, **campos):
+        return Vehiculo.objects.create(
+            marca=self.marca, tipo=self.tipo, modelo='Corolla', ano=2022, patente='AAA111',
+            capacidad=5, precio_por_dia=Decimal('50.00'), **campos,
+        )
+
+    def test_genera_variantes_sin_exif_al_guardar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            vehiculo = self.crear_vehiculo(imagen=self.foto())
+        vehiculo.refresh_from_db()
+
+        self.assertEqual(len(vehiculo.imagen_hash), 32)
+        for variante, tamano in imagenes.VARIANTES.items():
+            for extension in imagenes.FORMATOS:
+                ruta = imagenes.ruta_variante(vehiculo.imagen_hash, variante, extension)
+                with default_storage.open(ruta) as archivo, Image.open(archivo) as reducida:
+                    self.assertEqual(reducida.size, tamano)
+                    self.assertEqual(len(reducida.getexif()), 0)
+        self.assertTrue(vehiculo.miniatura_webp_url.endswith(f'{vehiculo.imagen_hash}-miniatura.webp'))
+        # El original se conserva
+        self.assertTrue(default_storage.exists(vehiculo.imagen.name))
+
+    def test_usa_la_original_hasta_generar_variantes(self):
+        vehiculo = self.crear_vehiculo(imagen=self.foto())
+        self.assertEqual(vehiculo.imagen_hash, '')
+        self.assertEqual(vehiculo.miniatura_url, vehiculo.imagen.url)
+
+    def test_no_regenera_variantes_existentes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            vehiculo = self.crear_vehiculo(imagen=self.foto())
+        with mock.patch.object(imagenes.ImageOps, 'fit') as ajustar:
+            self.assertEqual(imagenes.generar_variantes(vehiculo.imagen.name), Vehiculo.objects.get().imagen_hash)
+        ajustar.assert_not_called()
+
+    def test_cambiar_la_imagen_invalida_el_hash(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            vehiculo = self.crear_vehiculo(imagen=self.foto())
+        vehiculo.refresh_from_db()
+        vehiculo.imagen = self.foto('otra.jpg', (900, 900))
+        with self.captureOnCommitCallbacks(execute=False):
+            vehiculo.save()
+        self.assertEqual(Vehiculo.objects.get().imagen_hash, '')
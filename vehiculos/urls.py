@@ -9,7 +9,7 @@
 # ]
 
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'vehiculos'
 
@@ -29,6 +29,10 @@ urlpatterns = [
     # Eliminar vehículo
     path('vehiculo/<int:pk>/eliminar/', views.VehiculoDeleteView.as_view(), name='vehiculo-delete'),
     
+    # API JSON de solo lectura
+    path('api/', api.lista, name='api-lista'),
+    path('api/<int:pk>/', api.detalle, name='api-detalle'),
+    
     # Búsqueda de vehículos
     #path('buscar/', views.buscar_vehiculos, name='vehiculo-search'),
 ]
\ No newline at end of file
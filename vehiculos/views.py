@@ -1,70 +1,3 @@
-# from django.shortcuts import render, get_object_or_404
-# from django.views.generic import ListView, DetailView
-# from .models import Vehiculo, TipoVehiculo, Marca
-# from .forms import BusquedaVehiculoForm
-# from reservas.models import Reserva
-# from django.db.models import Q
-
-# class VehiculoListView(ListView):
-#     model = Vehiculo
-#     template_name = 'vehiculos/vehiculo_list.html'
-#     context_object_name = 'vehiculos'
-#     paginate_by = 9
-    
-#     def get_queryset(self):
-#         queryset = Vehiculo.objects.filter(disponible=True)
-        
-#         # Aplicar filtros de busqueda
-#         form = BusquedaVehiculoForm(self.request.GET)
-#         if form.is_valid():
-#             fecha_inicio = form.cleaned_data.get('fecha_inicio')
-#             fecha_fin = form.cleaned_data.get('fecha_fin')
-#             tipo = form.cleaned_data.get('tipo')
-#             marca = form.cleaned_data.get('marca')
-#             capacidad_minima = form.cleaned_data.get('capacidad_minima')
-            
-#             # Filtrar por tipo de vehiculo
-#             if tipo:
-#                 queryset = queryset.filter(tipo=tipo)
-            
-#             # Filtrar por marca
-#             if marca:
-#                 queryset = queryset.filter(marca=marca)
-            
-#             # Filtrar por capacidad minima
-#             if capacidad_minima:
-#                 queryset = queryset.filter(capacidad__gte=capacidad_minima)
-            
-#             # Filtrar vehiculos disponibles en el rango de fechas
-#             if fecha_inicio and fecha_fin:
-#                 # Obtener IDs de vehiculos con reservas en el rango de fechas
-#                 reservas = Reserva.objects.filter(
-#                     Q(fecha_inicio__lte=fecha_fin) & Q(fecha_fin__gte=fecha_inicio),
-#                     estado__nombre__in=['Pendiente', 'Confirmada']
-#                 ).values_list('vehiculo_id', flat=True)
-                
-#                 # Excluir vehiculos con reservas en el rango de fechas
-#                 queryset = queryset.exclude(id__in=reservas)
-        
-#         return queryset
-    
-#     def get_context_data(self, **kwargs):
-#         context = super().get_context_data(**kwargs)
-#         context['form'] = BusquedaVehiculoForm(self.request.GET)
-#         return context
-
-# class VehiculoDetailView(DetailView):
-#     model = Vehiculo
-#     template_name = 'vehiculos/vehiculo_detail.html'
-#     context_object_name = 'vehiculo'
-    
-#     def get_context_data(self, **kwargs):
-#         context = super().get_context_data(**kwargs)
-#         # Anadir formulario de reserva
-#         from reservas.forms import ReservaForm
-#         context['form'] = ReservaForm(vehiculo=self.object, usuario=self.request.user)
-#         return context
-
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.urls import reverse_lazy, reverse
@@ -74,22 +7,44 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.http import HttpResponseRedirect
 
 from .models import Vehiculo, Marca, TipoVehiculo, PoliticaReembolso
-from .forms import VehiculoForm
+from .forms import VehiculoForm, BusquedaVehiculoForm
+from . import catalogo
+from alquileres_maria.paginacion import PaginacionCursorMixin
+from alquileres_maria.replicas import solo_lectura
 
 # Función auxiliar para comprobar si el usuario es staff
 def es_staff(user):
     return user.is_staff
 
-class VehiculoListView(ListView):
+# Columnas que usa la tarjeta de un vehiculo en el listado
+CAMPOS_TARJETA_VEHICULO = [
+    'modelo', 'ano', 'patente', 'capacidad', 'precio_por_dia', 'imagen', 'imagen_hash', 'disponible',
+    'marca__nombre', 'tipo__nombre', 'politica_reembolso__nombre', 'politica_reembolso__porcentaje',
+    'ocupado_hoy', 'proxima_fecha_libre',
+]
+
+@solo_lectura
+class VehiculoListView(PaginacionCursorMixin, ListView):
     """Vista para listar todos los vehículos."""
     model = Vehiculo
     template_name = 'vehiculos/vehiculo_list.html'
     context_object_name = 'vehiculos'
     paginate_by = 9  # Mostrar 9 vehículos por página
+    # Orden del catálogo (el de Vehiculo.Meta más el id), sobre el índice vehiculo_catalogo_idx
+    ordenamiento = ['-ano', 'marca', 'modelo', 'id']
+    # Con ?orden=libre, primero los que se liberan antes (índice vehiculo_proxima_libre_idx)
+    ordenamiento_libre = ['proxima_fecha_libre', '-ano', 'marca', 'modelo', 'id']
     
     def get_queryset(self):
         """Personalizar la consulta para filtrar los vehículos."""
-        queryset = super().get_queryset()
+        if self.request.GET.get('orden') == 'libre':
+            self.ordenamiento = self.ordenamiento_libre
+        # Marca, tipo y politica se muestran en cada tarjeta: cargarlos con la misma consulta
+        queryset = (
+            super().get_queryset()
+            .select_related('marca', 'tipo', 'politica_reembolso')
+            .only(*CAMPOS_TARJETA_VEHICULO)
+        )
         
         # Filtrar por disponibilidad (si se especifica en la URL)
         disponible = self.request.GET.get('disponible')
@@ -98,30 +53,46 @@ class VehiculoListView(ListView):
         elif disponible == 'false':
             queryset = queryset.filter(disponible=False)
             
-        # Filtrar por marca (si se especifica en la URL)
-        marca_id = self.request.GET.get('marca')
-        if marca_id:
-            queryset = queryset.filter(marca_id=marca_id)
-            
-        # Filtrar por tipo (si se especifica en la URL)
-        tipo_id = self.request.GET.get('tipo')
-        if tipo_id:
-            queryset = queryset.filter(tipo_id=tipo_id)
+        # Aplicar filtros de búsqueda; todos se combinan en una sola consulta.
+        # Con fechas invalidas se aplican los demas y el error se muestra en el formulario
+        self.form_busqueda = BusquedaVehiculoForm(self.request.GET)
+        self.form_busqueda.is_valid()
+        queryset = self.form_busqueda.filtrar(queryset)
             
         return queryset
     
+    def obtener_pagina(self, paginador, cursor):
+        """Tomar la página de la cache del catálogo, según los filtros y el cursor."""
+        def calcular():
+            pagina = paginador.pagina(cursor)
+            catalogo.anotar_versiones(pagina.object_list)
+            return pagina
+        return catalogo.obtener(catalogo.clave_listado(self.request.GET), calcular)
+    
     def get_context_data(self, **kwargs):
         """Añadir datos adicionales al contexto."""
         context = super().get_context_data(**kwargs)
-        context['marcas'] = Marca.objects.all()
-        context['tipos'] = TipoVehiculo.objects.all()
+        context['form'] = self.form_busqueda
+        context['marcas'] = catalogo.obtener(catalogo.clave_referencias('marcas'), lambda: list(Marca.objects.all()))
+        context['tipos'] = catalogo.obtener(catalogo.clave_referencias('tipos'), lambda: list(TipoVehiculo.objects.all()))
         return context
 
+@solo_lectura
 class VehiculoDetailView(DetailView):
     """Vista para ver los detalles de un vehículo específico."""
     model = Vehiculo
     template_name = 'vehiculos/vehiculo_detail.html'
     context_object_name = 'vehiculo'
+    
+    def get_queryset(self):
+        return super().get_queryset().select_related('marca', 'tipo', 'politica_reembolso')
+    
+    def get_object(self, queryset=None):
+        """Tomar el vehículo de la cache del catálogo; se invalida al modificarlo."""
+        return catalogo.obtener(
+            catalogo.clave_vehiculo(self.kwargs['pk']),
+            lambda: super(VehiculoDetailView, self).get_object(queryset),
+        )
 
 class VehiculoCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
     """Vista para crear un nuevo vehículo (solo staff)."""